@@ -0,0 +1,14 @@
+from ia.janggi_network import JanggiNetwork
+from ia.utils import generate_games_batched
+from janggi.parameters import N_ITERATIONS, DEFAULT_N_SIMULATIONS, N_PARALLEL_GAMES, N_EPISODES
+from janggi.utils import DEVICE
+
+
+# Example of command:
+#    python3 game_generation_batched.py --n_iterations 200 --number_simulations 800 --n_parallel_games 128 --mcts_batch_size 4 --n_episodes 128
+
+if __name__ == "__main__":
+    predictor = JanggiNetwork()
+    predictor.to(DEVICE)
+    predictor.eval()
+    generate_games_batched(predictor, DEFAULT_N_SIMULATIONS, N_ITERATIONS, N_PARALLEL_GAMES, N_EPISODES)
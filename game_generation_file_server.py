@@ -3,9 +3,12 @@ import urllib.request
 
 import torch
 
-from ia.utils import generate_games
+from ia.async_predictors import AsyncFileServerPredictor
+from ia.utils import generate_games, generate_games_async
 
 WITH_POOL = False
+# All the games in one process, with an asyncio MCTS
+ASYNC_SEARCH = False
 
 N_POOLS = 64
 N_SIMULATIONS = 800
@@ -32,6 +35,9 @@ class FileServerPredictor:
 
 
 if __name__ == "__main__":
-    predictor = FileServerPredictor()
-
-    generate_games(predictor, N_SIMULATIONS, ITER_MAX, WITH_POOL, N_POOLS, N_EPISODES)
+    if ASYNC_SEARCH:
+        predictor = AsyncFileServerPredictor(HOSTNAME, PORT)
+        generate_games_async(predictor, N_SIMULATIONS, ITER_MAX, N_POOLS, N_EPISODES)
+    else:
+        predictor = FileServerPredictor()
+        generate_games(predictor, N_SIMULATIONS, ITER_MAX, WITH_POOL, N_POOLS, N_EPISODES)
@@ -1,5 +1,6 @@
+from ia.async_predictors import AsyncFilePredictor
 from ia.predictors import FilePredictor
-from ia.utils import generate_games
+from ia.utils import generate_games, generate_games_async
 from janggi.parameters import N_ITERATIONS, DEFAULT_N_SIMULATIONS, N_PROCESSUS, N_EPISODES
 
 
@@ -7,7 +8,13 @@ from janggi.parameters import N_ITERATIONS, DEFAULT_N_SIMULATIONS, N_PROCESSUS,
 #    python3 game_generation_files.py --root_file_inference /tmp --n_iterations 200 --number_simulations 800 --n_processus 64 --n_episodes 128
 
 WITH_POOL = False
+# All the games in one process, with an asyncio MCTS
+ASYNC_SEARCH = False
 
 if __name__ == "__main__":
-    predictor = FilePredictor()
-    generate_games(predictor, DEFAULT_N_SIMULATIONS, N_ITERATIONS, WITH_POOL, N_PROCESSUS, N_EPISODES)
+    if ASYNC_SEARCH:
+        predictor = AsyncFilePredictor()
+        generate_games_async(predictor, DEFAULT_N_SIMULATIONS, N_ITERATIONS, N_PROCESSUS, N_EPISODES)
+    else:
+        predictor = FilePredictor()
+        generate_games(predictor, DEFAULT_N_SIMULATIONS, N_ITERATIONS, WITH_POOL, N_PROCESSUS, N_EPISODES)
@@ -5,7 +5,8 @@ import urllib.request
 
 import torch
 
-from ia.utils import generate_games
+from ia.async_predictors import AsyncServicePredictorSocket, AsyncServicePredictorWeb
+from ia.utils import generate_games, generate_games_async
 
 
 WITH_POOL = False
@@ -14,6 +15,8 @@ N_SIMULATIONS = 10
 ITER_MAX = 10
 N_EPISODES = 20
 WEB_SERVICE = False
+# All the games in one process, with an asyncio MCTS
+ASYNC_SEARCH = False
 
 
 class ServicePredictorWeb:
@@ -64,8 +67,15 @@ class ServicePredictorSocket:
 
 
 if __name__ == "__main__":
-    if WEB_SERVICE:
-        predictor = ServicePredictorWeb()
+    if ASYNC_SEARCH:
+        if WEB_SERVICE:
+            predictor = AsyncServicePredictorWeb()
+        else:
+            predictor = AsyncServicePredictorSocket()
+        generate_games_async(predictor, N_SIMULATIONS, ITER_MAX, N_POOLS, N_EPISODES)
     else:
-        predictor = ServicePredictorSocket()
-    generate_games(predictor, N_SIMULATIONS, ITER_MAX, WITH_POOL, N_POOLS, N_EPISODES)
+        if WEB_SERVICE:
+            predictor = ServicePredictorWeb()
+        else:
+            predictor = ServicePredictorSocket()
+        generate_games(predictor, N_SIMULATIONS, ITER_MAX, WITH_POOL, N_POOLS, N_EPISODES)
@@ -0,0 +1,113 @@
+import asyncio
+import json
+import os
+import pickle
+import random
+import time
+
+import torch
+
+from ia.predictors import NEW_DIR, OLD_DIR
+
+# Same protocol as inference_service.run_server: the length of the message on HEADERSIZE bytes, then the message
+HEADERSIZE = 10
+
+
+async def read_message(reader):
+    header = await reader.readexactly(HEADERSIZE)
+    return await reader.readexactly(int(header))
+
+
+def make_message(data):
+    return bytes(f"{len(data):<{HEADERSIZE}}", 'utf-8') + data
+
+
+async def post(hostname, port, path, body, content_type):
+    # Minimal HTTP POST for the Flask services, the connection being closed after the answer
+    reader, writer = await asyncio.open_connection(hostname, port)
+    header = ("POST " + path + " HTTP/1.1\r\n"
+              "Host: " + hostname + ":" + str(port) + "\r\n"
+              "Content-Type: " + content_type + "\r\n"
+              "Content-Length: " + str(len(body)) + "\r\n"
+              "Connection: close\r\n\r\n")
+    writer.write(header.encode("utf-8") + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    await writer.wait_closed()
+    status, _, content = response.partition(b"\r\n\r\n")
+    status = status.split(b"\r\n", 1)[0]
+    if status.split()[1:2] != [b"200"]:
+        raise IOError("Prediction failed: " + status.decode("utf-8", "replace"))
+    return content
+
+
+class AsyncFilePredictor:
+    # Awaitable version of FilePredictor, for AsyncMCTS: the other searches run while waiting for the answer
+
+    def __init__(self, polling_interval=0.01):
+        self.polling_interval = polling_interval
+
+    async def __call__(self, features):
+        filename = '{:010.6f}'.format(time.time()) + '{:01.10f}'.format(random.random())
+        with open(NEW_DIR + filename + ".tmp", "wb") as f:
+            pickle.dump(features, f)
+        os.rename(NEW_DIR + filename + ".tmp", NEW_DIR + filename)
+        while True:
+            await asyncio.sleep(self.polling_interval)
+            if os.path.isfile(OLD_DIR + filename):
+                try:
+                    with open(OLD_DIR + filename, "rb") as f:
+                        policy, value = pickle.load(f)
+                    os.remove(OLD_DIR + filename)
+                    policy = torch.unsqueeze(policy, dim=0)
+                    value = torch.unsqueeze(value, dim=0)
+                    return policy, value
+                except PermissionError:
+                    continue
+
+
+class AsyncServicePredictorSocket:
+    # Awaitable version of ServicePredictorSocket, for AsyncMCTS
+
+    def __init__(self, hostname="127.0.0.1", port=5000):
+        self.connexion_info = (hostname, port)
+
+    async def __call__(self, features):
+        reader, writer = await asyncio.open_connection(*self.connexion_info)
+        writer.write(make_message(pickle.dumps(features)))
+        await writer.drain()
+        json_data = pickle.loads(await read_message(reader))
+        writer.close()
+        await writer.wait_closed()
+        return json_data["policy"], json_data["value"]
+
+
+class AsyncServicePredictorWeb:
+    # Awaitable version of ServicePredictorWeb, for AsyncMCTS
+
+    def __init__(self, hostname="127.0.0.1", port=5000):
+        self.hostname = hostname
+        self.port = port
+
+    async def __call__(self, features):
+        data = json.dumps({"features": features.tolist()}).encode('utf-8')
+        response = await post(self.hostname, self.port, "/predict", data, "application/json; charset=utf-8")
+        json_result = json.loads(response)
+        return torch.tensor(json_result["policy"]), torch.tensor(json_result["value"])
+
+
+class AsyncFileServerPredictor:
+    # Awaitable version of FileServerPredictor, for AsyncMCTS
+
+    def __init__(self, hostname="127.0.0.1", port=5000):
+        self.hostname = hostname
+        self.port = port
+
+    async def __call__(self, features):
+        response = await post(self.hostname, self.port, "/predict", pickle.dumps(features),
+                              "application/octet-stream")
+        policy, value = pickle.loads(response)
+        policy = torch.unsqueeze(policy, dim=0)
+        value = torch.unsqueeze(value, dim=0)
+        return policy, value
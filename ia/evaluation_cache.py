@@ -0,0 +1,77 @@
+from collections import OrderedDict
+from threading import Lock
+
+import numpy as np
+
+from janggi.parameters import EVALUATION_CACHE_SIZE
+
+
+class EvaluationCache:
+    # Network evaluations keyed by (position hash, side to move, round, model version), with a least recently
+    # used eviction. The round is in the key as it is a plane of the input of the network. An entry is
+    # (action ids, priors of these actions, value).
+
+    def __init__(self, max_size=EVALUATION_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, zobrist_hash, color, n_round, model_version):
+        key = (zobrist_hash, color, n_round, model_version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+        return entry
+
+    def put(self, zobrist_hash, color, n_round, model_version, probabilities, value):
+        # probabilities is a dict action -> prior, as returned by NNPlayer.predict
+        if self.max_size <= 0:
+            return
+        action_ids = np.array([action.get_id() for action in probabilities], dtype=np.uint16)
+        priors = np.array(list(probabilities.values()), dtype=np.float32)
+        with self._lock:
+            self._entries[(zobrist_hash, color, n_round, model_version)] = (action_ids, priors, value)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    @staticmethod
+    def get_prediction(entry, actions):
+        # Priors of actions, normalized again if some of the cached actions are not there
+        action_ids, priors, value = entry
+        priors = dict(zip(action_ids.tolist(), priors.tolist()))
+        values_policy = [priors.get(action.get_id(), 0.0) for action in actions]
+        total = sum(values_policy)
+        if total != 0:
+            return {action: value_policy / total for action, value_policy in zip(actions, values_policy)}, value
+        return dict(zip(actions, values_policy)), value
+
+    def clear(self):
+        # The invalidation hook of the predictors without a model version, to call when their model changes
+        with self._lock:
+            self._entries.clear()
+
+    def get_hit_rate(self):
+        total = self.hits + self.misses
+        if total == 0:
+            return 0.0
+        return self.hits / total
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __str__(self):
+        return "Evaluation cache: size %d/%d, hits %d, misses %d, hit rate %.3f, evictions %d" % (
+            len(self), self.max_size, self.hits, self.misses, self.get_hit_rate(), self.evictions)
+
+
+# Cache of the self-play of a worker process, given to its NNPlayer by the trainer so that the two players of a
+# game and the following games reuse the evaluations
+EVALUATION_CACHE = EvaluationCache()
@@ -1,3 +1,6 @@
+import itertools
+import os
+
 import torch
 from torch import nn
 
@@ -11,6 +14,14 @@ STRIDE_SIZE = 3
 OUT_CONV_POLICY = 2
 OUT_LINEAR_VALUE = 256
 
+# Identifies the weights of a network for the evaluation cache, with the process id as the networks are also
+# created in the worker processes
+MODEL_VERSIONS = itertools.count()
+
+
+def get_new_model_version():
+    return os.getpid(), next(MODEL_VERSIONS)
+
 
 class JanggiNetwork(nn.Module):
 
@@ -21,6 +32,11 @@ class JanggiNetwork(nn.Module):
         self.residuals = nn.ModuleList([ResidualBlock() for _ in range(n_residual)])
         self.policy_network = PolicyNetwork()
         self.value_network = ValueNetwork()
+        self.model_version = get_new_model_version()
+
+    def update_version(self):
+        # To call when the weights change, so that the cached evaluations are not used anymore
+        self.model_version = get_new_model_version()
 
     def forward(self, x):
         x = self.first_layer(x)
@@ -1,74 +1,359 @@
 import _queue
+import asyncio
 import math
 import random
+import sys
 import threading
+from collections import OrderedDict
+from contextlib import nullcontext
 from queue import Queue
 from threading import Lock
 
 import torch
 import numpy as np
 
-from janggi.action import Action
-from janggi.parameters import DIRICHLET_ALPHA, DIRICHLET_EPSILON, PARALLEL_MCTS, N_THREADS_MCTS
-from janggi.utils import get_symmetries
+from janggi.action import get_action_ids_policy_indexes, INTERNED_ACTIONS, PASS_ACTION_ID
+from janggi.parameters import DIRICHLET_ALPHA, DIRICHLET_EPSILON, PARALLEL_MCTS, N_THREADS_MCTS, MCTS_BATCH_SIZE, \
+    MCTS_ASYNC_TASKS, TRANSPOSITION_TABLE_SIZE, MCTS_MAX_NODES
 
 
 class MCTSNode:
+    # The statistics of the children are stored in arrays, in the order of action_ids.
+    # The child nodes are created on their first visit.
+
+    __slots__ = ("action_ids", "priors", "visits", "value_sums", "virtual_losses", "children", "current_player",
+                 "is_initial", "is_shared", "transposition_key", "n_parents", "in_pool", "total_N", "predicted_value",
+                 "lock")
 
     def __init__(self, is_initial=False):
-        self.probabilities = None
+        self.action_ids = None
+        self.priors = None
+        self.visits = None
+        self.value_sums = None
+        self.virtual_losses = None
+        # Child nodes by action, None until the first one is created
+        self.children = None
         self.current_player = None
-        self.q = dict()
-        self.N = dict()
-        self.next_nodes = dict()
         self.is_initial = is_initial
+        # In a TranspositionTable, possibly with several parents, under the key transposition_key
+        self.is_shared = False
+        self.transposition_key = None
+        # Number of nodes having this node as a child, more than one only for the shared nodes
+        self.n_parents = 1
+        # Counted by a NodePool
+        self.in_pool = False
         self.total_N = 0
         self.predicted_value = 0
-        self.virtual_loss = dict()
         self.lock = Lock()
 
-    def set_up(self, probabiliies, current_player, actions, predicted_value):
+    @classmethod
+    def from_visits(cls, visits, total_N):
+        # Node with only the visit counts, from a dict action -> number of visits
+        node = MCTSNode()
+        node._set_actions(list(visits))
+        node.visits[:] = list(visits.values())
+        node.total_N = total_N
+        return node
+
+    def _set_actions(self, actions):
+        n_actions = len(actions)
+        self.action_ids = np.array([action.get_id() for action in actions], dtype=np.uint16)
+        self.priors = np.zeros(n_actions, dtype=np.float64)
+        self.visits = np.zeros(n_actions, dtype=np.int32)
+        self.value_sums = np.zeros(n_actions, dtype=np.float64)
+        self.virtual_losses = np.zeros(n_actions, dtype=np.int32)
+
+    def is_expanded(self):
+        return self.action_ids is not None
+
+    def set_up(self, probabilities, current_player, actions, predicted_value):
         self.predicted_value = predicted_value
-        self.probabilities = probabiliies
-        if self.is_initial:
-            dirichlet_noise = np.random.dirichlet([DIRICHLET_ALPHA] * len(self.probabilities))
-            for i, action in enumerate(self.probabilities):
-                self.probabilities[action] = (1 - DIRICHLET_EPSILON) * self.probabilities[action] + \
-                                             DIRICHLET_EPSILON * dirichlet_noise[i]
+        self._set_actions(actions)
+        self.priors[:] = [probabilities[action] for action in actions]
+        if self.is_initial and actions:
+            dirichlet_noise = np.random.dirichlet([DIRICHLET_ALPHA] * len(actions))
+            self.priors[:] = (1 - DIRICHLET_EPSILON) * self.priors + DIRICHLET_EPSILON * dirichlet_noise
         self.current_player = current_player
-        self.q = dict()
-        self.N = dict()
-        self.next_nodes = dict()
-        for action in actions:
-            self.q[action] = 0
-            self.N[action] = 0
-            self.virtual_loss[action] = 0
-        if not actions:
-            self.q[None] = 0
-            self.N[None] = 0
-            self.virtual_loss[None] = 0
+
+    def get_action(self, index):
+        return INTERNED_ACTIONS[self.action_ids[index]]
+
+    def get_q(self):
+        return self.value_sums / np.maximum(self.visits, 1)
+
+    def get_child(self, action):
+        if self.children is None:
+            return None
+        return self.children.get(action)
+
+    def get_or_create_child(self, action):
+        if self.children is None:
+            self.children = dict()
+        child = self.children.get(action)
+        if child is None:
+            child = MCTSNode()
+            self.children[action] = child
+        return child
+
+    def prune(self, action):
+        # Keeps only the child of the action played, so that the subtrees of the other actions can be freed
+        child = self.get_or_create_child(action)
+        self.children = {action: child}
+        return child
+
+    def set_child(self, action, child):
+        if self.children is None:
+            self.children = dict()
+        self.children[action] = child
 
     def get_policy(self, current_player, data_augmentation=False):
         policy = torch.zeros((58, 10, 9))
-        symmetry_x, symmetry_y = get_symmetries(current_player, data_augmentation)
-        for action, value in self.N.items():
-            if action is None or action.is_pass():
-                continue
-            total_temp = self.total_N
-            if total_temp != 0:
-                policy[action.get_features(symmetry_x, symmetry_y),
-                       action.get_x_from(symmetry_x), action.get_y_from(symmetry_y)] = value / total_temp
+        if self.total_N == 0 or self.action_ids is None:
+            return policy
+        is_move = self.action_ids != PASS_ACTION_ID
+        indexes = get_action_ids_policy_indexes(self.action_ids[is_move], current_player, data_augmentation)
+        policy.view(-1)[torch.from_numpy(indexes)] = torch.from_numpy(self.visits[is_move].astype(np.float32)) \
+            / self.total_N
         return policy
 
 
+class TranspositionTable:
+    # Nodes by (position hash, side to move, round), so that the move orders leading to the same position share its
+    # evaluation and its statistics. The round is in the key as it is an input of the network and decides when the
+    # game stops at iter_max. It also makes the shared nodes a DAG: a node can never be reached again from its
+    # children. Least recently used eviction: an evicted node stays in the trees using it.
+    # The positions with repetitions are not shared, as their legal moves depend on the moves played before.
+    # The nodes count their parents, so that a shared node is released with its last parent.
+
+    def __init__(self, max_size=TRANSPOSITION_TABLE_SIZE):
+        self.max_size = max_size
+        self._nodes = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_create_node(self, game, new_node=MCTSNode):
+        # new_node creates the node when the position is not in the table, and can return None.
+        # The node returned is made the child of one more parent.
+        if self.max_size <= 0 or game.board.has_repetitions():
+            return new_node()
+        key = (game.board.zobrist_hash, game.current_player, game.round)
+        with self._lock:
+            node = self._nodes.get(key)
+            if node is None:
+                self.misses += 1
+                node = new_node()
+                if node is None:
+                    return None
+                node.is_shared = True
+                node.transposition_key = key
+                self._nodes[key] = node
+                while len(self._nodes) > self.max_size:
+                    self._nodes.popitem(last=False)
+            else:
+                self.hits += 1
+                self._nodes.move_to_end(key)
+                node.n_parents += 1
+        return node
+
+    def remove_parent(self, node):
+        # One parent of the shared node is released. True when it was the last one, the node leaving the table.
+        with self._lock:
+            node.n_parents -= 1
+            if node.n_parents > 0:
+                return False
+            self._remove(node)
+        return True
+
+    def remove(self, node):
+        # The node is not in the trees anymore
+        with self._lock:
+            self._remove(node)
+
+    def _remove(self, node):
+        # The position can be in the table with another node, after the eviction of this one
+        if self._nodes.get(node.transposition_key) is node:
+            del self._nodes[node.transposition_key]
+
+    def clear(self):
+        with self._lock:
+            self._nodes.clear()
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def __str__(self):
+        return "Transposition table: size %d/%d, hits %d, misses %d" % (len(self), self.max_size, self.hits,
+                                                                         self.misses)
+
+
+class NodePool:
+    # Nodes created by the searches, up to max_nodes (0 for no limit), with an approximation of their memory.
+    # When the pool is full, the searches stop expanding. The nodes of the subtrees released after a move are reset
+    # and reused, up to max_nodes of them.
+
+    def __init__(self, max_nodes=MCTS_MAX_NODES):
+        self.max_nodes = max_nodes
+        self.n_nodes = 0
+        self.n_bytes = 0
+        self._free_nodes = []
+        # Without a limit, the counts are only informative and the threads update them without a lock
+        self._lock = Lock() if max_nodes > 0 else nullcontext()
+
+    def is_full(self):
+        return 0 < self.max_nodes <= self.n_nodes
+
+    def allocate(self):
+        # None when the pool is full
+        with self._lock:
+            if self.is_full():
+                return None
+            self.n_nodes += 1
+            self.n_bytes += NODE_BYTES
+            node = self._free_nodes.pop() if self._free_nodes else MCTSNode()
+        node.in_pool = True
+        return node
+
+    def add_expanded(self, node):
+        # The arrays of the node, once set up
+        if node.in_pool:
+            with self._lock:
+                self.n_bytes += get_arrays_bytes(node)
+
+    def forget(self, node):
+        # The node is not counted anymore, but it can still be used
+        if node.in_pool:
+            node.in_pool = False
+            with self._lock:
+                self.n_nodes -= 1
+                self.n_bytes -= NODE_BYTES + get_arrays_bytes(node)
+
+    def release(self, node):
+        # The node must not be used anymore: it is reset and kept for the next allocations
+        if node.in_pool:
+            self.forget(node)
+            node.__init__()
+            with self._lock:
+                if len(self._free_nodes) < self.max_nodes:
+                    self._free_nodes.append(node)
+
+    def __str__(self):
+        return "Node pool: %d/%d nodes, %.1f MB" % (self.n_nodes, self.max_nodes, self.n_bytes / 1e6)
+
+
+def get_arrays_bytes(node):
+    if node.action_ids is None:
+        return 0
+    return ARRAY_BYTES * 5 + node.action_ids.nbytes + node.priors.nbytes + node.visits.nbytes \
+        + node.value_sums.nbytes + node.virtual_losses.nbytes
+
+
+# Approximate sizes of a node without its arrays and of an empty numpy array
+NODE_BYTES = sys.getsizeof(MCTSNode()) + sys.getsizeof(Lock())
+ARRAY_BYTES = sys.getsizeof(np.zeros(0))
+
+
 class MCTS:
 
-    def __init__(self, c_puct, n_simulations, temperature_start=1, temperature_threshold=30, temperature_end=1):
+    def __init__(self, c_puct, n_simulations, temperature_start=1, temperature_threshold=30, temperature_end=1,
+                 batch_size=MCTS_BATCH_SIZE, transpositions=None, pool=None):
+        # The searches sharing a tree share its transpositions and its pool
         self.c_puct = c_puct
         self.n_simulations = n_simulations
         self.temperature_start = temperature_start
         self.temperature_threshold = temperature_threshold
         self.temperature_end = temperature_end
+        self.batch_size = batch_size
+        if transpositions is None and TRANSPOSITION_TABLE_SIZE > 0:
+            transpositions = TranspositionTable()
+        self.transpositions = transpositions
+        self.pool = pool or NodePool()
+
+    def get_child(self, node, action, game):
+        # Child of node reached with action, game being already in the position of the child.
+        # None when the child has to be created and the pool is full.
+        old_child = node.get_child(action)
+        if old_child is not None and (self.transpositions is None or not game.board.has_repetitions()
+                                      or self._has_legal_moves(old_child, game)):
+            return old_child
+        if self.transpositions is None:
+            child = self.pool.allocate()
+        else:
+            child = self.transpositions.get_or_create_node(game, self.pool.allocate)
+        if child is not None:
+            if old_child is not None:
+                # Replaced as its moves are not the ones of this history. The searches in progress can still go
+                # through it, so its nodes are not reused.
+                self.release_tree(old_child, reuse=False)
+            node.set_child(action, child)
+        return child
+
+    def get_root(self, node, action, game):
+        # Child from which the next search starts, created outside of the pool when it is full
+        child = self.get_child(node, action, game)
+        if child is None:
+            child = MCTSNode()
+            node.set_child(action, child)
+        return child
+
+    def prune(self, node, action):
+        # MCTSNode.prune, the other subtrees going back to the pool. The node is not used by the searches anymore.
+        if node.children is not None:
+            for other_action, child in node.children.items():
+                if other_action != action:
+                    self.release_tree(child)
+        self.pool.forget(node)
+        if node.is_shared:
+            self.transpositions.remove(node)
+        return node.prune(action)
+
+    def release_tree(self, node, reuse=True):
+        # A parent of node is released. The nodes left without parent leave the pool and the transposition table,
+        # and are reused when reuse is set. The shared nodes with other parents are kept with their children.
+        nodes = [node]
+        while nodes:
+            node = nodes.pop()
+            if node.is_shared and not self.transpositions.remove_parent(node):
+                continue
+            if node.children is not None:
+                nodes.extend(node.children.values())
+            if reuse:
+                self.pool.release(node)
+            else:
+                self.pool.forget(node)
+
+    def _set_up(self, node, probabilities, current_player, actions, predicted_value):
+        node.set_up(probabilities, current_player, actions, predicted_value)
+        self.pool.add_expanded(node)
+
+    @staticmethod
+    def _has_legal_moves(node, game):
+        # With repetitions, the legal moves depend on the path, which is not unique once nodes are shared.
+        # A shared node is never kept there, otherwise a cycle could lead back to it.
+        if node.is_shared:
+            return False
+        if node.action_ids is None:
+            return True
+        return sorted(node.action_ids.tolist()) == sorted(action.get_id() for action in game.get_current_actions())
+
+    def _select(self, node):
+        # Child with the best PUCT score, ties broken at random. None when there is no child.
+        if len(node.action_ids) == 0:
+            return None
+        visits = node.visits
+        scores = np.maximum(visits, 1).astype(np.float64)
+        np.divide(node.value_sums, scores, out=scores)
+        exploration = visits + 1.0
+        np.divide(node.priors, exploration, out=exploration)
+        exploration *= self.c_puct * math.sqrt(node.total_N)
+        scores += exploration
+        scores -= node.virtual_losses
+        best_index = scores.argmax()
+        is_best = scores == scores[best_index]
+        if np.count_nonzero(is_best) == 1:
+            return int(best_index)
+        best_indexes = np.flatnonzero(is_best)
+        return int(best_indexes[random.randrange(len(best_indexes))])
 
     def run_simulation(self, current_node, game, predictor):
         if game.is_finished():
@@ -76,65 +361,136 @@ class MCTS:
             return -reward
 
         current_node.lock.acquire()
-        if current_node.probabilities is None:
+        if current_node.action_ids is None:
             possible_actions = game.get_current_actions()
             probabilities, predicted_value = predictor.predict(game, possible_actions)
-            current_node.set_up(probabilities, game.current_player, possible_actions, predicted_value)
+            self._set_up(current_node, probabilities, game.current_player, possible_actions, predicted_value)
             current_node.lock.release()
             return -predicted_value
-        else:
-            possible_actions = list(current_node.q.keys())
-
-        random.shuffle(possible_actions)
 
-        u_max, best_action = -float("inf"), None
-        for action in possible_actions:
-            if action is None:
-                continue
-            try:
-                u = current_node.q[action] + \
-                    self.c_puct * current_node.probabilities[action] * \
-                    math.sqrt(current_node.total_N) / (1 + current_node.N[action]) - current_node.virtual_loss[action]
-            except:
-                print(current_node.probabilities)
-                print(repr(game.board))
-                print(current_node.total_N)
-                raise
-            if u > u_max:
-                u_max = u
-                best_action = action
+        best_index = self._select(current_node)
         # Best action is None when there is no legal move
-
-        if best_action is not None:
-            # We have to duplicate it in case of multithreading as apply_action modifies the action (eaten)
-            best_action = Action(best_action.x_from, best_action.y_from, best_action.x_to, best_action.y_to)
+        if best_index is None:
+            best_action = None
+        else:
+            best_action = current_node.get_action(best_index)
 
         game.apply_action(best_action, invalidate_cache=False)
-        if best_action not in current_node.next_nodes:
-            next_node = MCTSNode()
-            current_node.next_nodes[best_action] = next_node
-        else:
-            next_node = current_node.next_nodes[best_action]
+        next_node = self.get_child(current_node, best_action, game)
 
-        current_node.virtual_loss[best_action] += 1
+        if best_index is not None:
+            current_node.virtual_losses[best_index] += 1
         current_node.lock.release()
 
-        value = self.run_simulation(next_node, game, predictor)
+        if next_node is None and not game.is_finished():
+            # The pool is full: the value predicted for the current node stands for the one of the child
+            value = current_node.predicted_value
+        else:
+            value = self.run_simulation(next_node, game, predictor)
         game.reverse_action()
 
         current_node.lock.acquire()
-        # Might be a problem if not enough simulations
-        current_node.q[best_action] = (current_node.N[best_action] * current_node.q[best_action] + value) \
-                                      / (current_node.N[best_action] + 1)
-        current_node.N[best_action] += 1
+        if best_index is not None:
+            current_node.value_sums[best_index] += value
+            current_node.visits[best_index] += 1
+            current_node.virtual_losses[best_index] -= 1
         current_node.total_N += 1
-        current_node.virtual_loss[best_action] -= 1
         current_node.lock.release()
 
         return -value
 
+    def run_batch(self, current_node, game, predictor, batch_size):
+        # Descends up to batch_size times, the virtual losses spreading the descents over different leaves.
+        # The new leaves are evaluated together with predictor.predict_batch. Returns the number of simulations.
+        descents, leaves = self.collect_leaves(current_node, game, predictor, batch_size)
+        if leaves:
+            leaf_inputs, actions_list, current_players = zip(*leaves)
+            predictions = predictor.predict_batch(leaf_inputs, actions_list, current_players)
+        else:
+            predictions = []
+        self.back_up(descents, leaves, predictions)
+        return len(descents)
+
+    def collect_leaves(self, current_node, game, predictor, batch_size):
+        # First half of run_batch: the descents, and for each new leaf (leaf input, actions, current player).
+        # The leaves of several trees can then be evaluated in one call before calling back_up on each tree.
+        descents = []
+        leaves = []
+        pending_leaves = set()
+        for _ in range(batch_size):
+            path = []
+            node = current_node
+            is_full = False
+            while not game.is_finished() and node.action_ids is not None:
+                index = self._select(node)
+                if index is None:
+                    action = None
+                else:
+                    action = node.get_action(index)
+                    node.virtual_losses[index] += 1
+                path.append((node, index))
+                game.apply_action(action, invalidate_cache=False)
+                child = self.get_child(node, action, game)
+                if child is None:
+                    is_full = True
+                    break
+                node = child
+            if game.is_finished():
+                leaf_value = game.get_reward()
+                descents.append((path, None, leaf_value))
+            elif is_full:
+                # The pool is full: the value predicted for the last node stands for the one of its child
+                descents.append((path, None, -node.predicted_value))
+            elif node in pending_leaves:
+                # Already waiting for its evaluation: the virtual losses are not enough to find another leaf
+                self._remove_virtual_losses(path)
+                self._reverse_path(game, path)
+                break
+            else:
+                pending_leaves.add(node)
+                leaves.append(self._get_leaf(node, game, predictor))
+                descents.append((path, node, None))
+            self._reverse_path(game, path)
+        return descents, leaves
+
+    @staticmethod
+    def _get_leaf(node, game, predictor):
+        # (leaf input, actions, current player) of a new leaf, with the game in its position
+        return predictor.get_leaf_input(game), game.get_current_actions(), game.current_player
+
+    def back_up(self, descents, leaves, predictions):
+        # Second half of run_batch, predictions being in the order of the leaves
+        predictions = iter(zip(predictions, leaves))
+        for path, node, leaf_value in descents:
+            if node is not None:
+                (probabilities, leaf_value), (_, actions, current_player) = next(predictions)
+                self._set_up(node, probabilities, current_player, actions, leaf_value)
+            value = -leaf_value
+            for parent, index in reversed(path):
+                if index is not None:
+                    parent.value_sums[index] += value
+                    parent.visits[index] += 1
+                    parent.virtual_losses[index] -= 1
+                parent.total_N += 1
+                value = -value
+
+    @staticmethod
+    def _remove_virtual_losses(path):
+        for node, index in path:
+            if index is not None:
+                node.virtual_losses[index] -= 1
+
+    @staticmethod
+    def _reverse_path(game, path):
+        for _ in range(len(path)):
+            game.reverse_action()
+
     def choose_action(self, current_node, game, predictor):
-        if PARALLEL_MCTS:
+        if self.batch_size > 1:
+            n_simulations = self.n_simulations - current_node.total_N + 1
+            while n_simulations > 0:
+                n_simulations -= self.run_batch(current_node, game, predictor, min(self.batch_size, n_simulations))
+        elif PARALLEL_MCTS:
             queue = Queue()
             [queue.put(i) for i in range(self.n_simulations - current_node.total_N + 1)]
             games = [game.fake_copy() for _ in range(N_THREADS_MCTS)]
@@ -145,32 +501,98 @@ class MCTS:
         else:
             for _ in range(self.n_simulations - current_node.total_N + 1):
                 self.run_simulation(current_node, game, predictor)
-        items = list(current_node.N.items())
+        return self.pick_action(current_node, game)
+
+    def pick_action(self, current_node, game):
+        # Move played once the simulations are done, depending on the visits and the temperature
         total = current_node.total_N
         if game.round > self.temperature_threshold:
             inv_temperature = 1.0 / self.temperature_end
         else:
             inv_temperature = 1.0 / self.temperature_start
-        if items:
+        if current_node.action_ids is not None and len(current_node.action_ids) > 0:
+            visits = current_node.visits.tolist()
             if inv_temperature > 100:
-                best_score = -1
-                best_action = None
-                for action, score in items:
-                    if score > best_score:
-                        best_score = score
-                        best_action = action
-                action = best_action
+                best_index = int(np.argmax(current_node.visits))
             else:
-                proba = [(x[1] / total) ** inv_temperature for x in items]
+                proba = [(x / total) ** inv_temperature for x in visits]
                 total = sum(proba)
                 for i in range(len(proba)):
                     proba[i] /= total
-                action = random.choices([x[0] for x in items], proba)[0]
+                best_index = random.choices(range(len(visits)), proba)[0]
+            action = current_node.get_action(best_index)
         else:
             action = None
         return action
 
 
+class AsyncMCTS(MCTS):
+    # MCTS for the asyncio predictors: up to n_tasks simulations wait for their leaf at the same time.
+    # The descents do not await, so the simulations can share the game and the virtual losses keep them apart.
+
+    def __init__(self, c_puct, n_simulations, temperature_start=1, temperature_threshold=30, temperature_end=1,
+                 batch_size=MCTS_BATCH_SIZE, transpositions=None, pool=None, n_tasks=MCTS_ASYNC_TASKS):
+        super().__init__(c_puct, n_simulations, temperature_start, temperature_threshold, temperature_end,
+                         batch_size, transpositions, pool)
+        self.n_tasks = n_tasks
+        # Leaves whose evaluation is awaited, with the future of their value
+        self._pending_leaves = dict()
+
+    def _get_leaf(self, node, game, predictor):
+        # None when another simulation already waits for the evaluation of the leaf
+        if node in self._pending_leaves:
+            return None
+        return super()._get_leaf(node, game, predictor)
+
+    async def run_simulation(self, current_node, game, predictor):
+        descents, leaves = self.collect_leaves(current_node, game, predictor, 1)
+        path, node, leaf_value = descents[0]
+        try:
+            if node in self._pending_leaves:
+                # Reached by another simulation too: both use the same evaluation
+                leaf_value = await self._pending_leaves[node]
+            elif node is not None:
+                leaf_value = await self._evaluate(node, leaves[0], predictor)
+        except BaseException:
+            self._remove_virtual_losses(path)
+            raise
+        self.back_up([(path, None, leaf_value)], [], [])
+
+    async def _evaluate(self, node, leaf, predictor):
+        leaf_input, actions, current_player = leaf
+        future = asyncio.get_running_loop().create_future()
+        self._pending_leaves[node] = future
+        try:
+            (probabilities, leaf_value), = await predictor.predict_batch_async([leaf_input], [actions],
+                                                                                [current_player])
+        except BaseException as exception:
+            future.set_exception(exception)
+            # The other simulations waiting for this leaf raise too
+            future.exception()
+            raise
+        finally:
+            del self._pending_leaves[node]
+        self._set_up(node, probabilities, current_player, actions, leaf_value)
+        future.set_result(leaf_value)
+        return leaf_value
+
+    async def choose_action(self, current_node, game, predictor):
+        n_simulations = self.n_simulations - current_node.total_N + 1
+        if current_node.action_ids is None and n_simulations > 0:
+            # The root is expanded alone, the next simulations can then go down different children
+            await self.run_simulation(current_node, game, predictor)
+            n_simulations -= 1
+
+        async def search():
+            nonlocal n_simulations
+            while n_simulations > 0:
+                n_simulations -= 1
+                await self.run_simulation(current_node, game, predictor)
+
+        await asyncio.gather(*[search() for _ in range(min(self.n_tasks, n_simulations))])
+        return self.pick_action(current_node, game)
+
+
 class ThreadRunSimulation(threading.Thread):
 
     def __init__(self, mcts, current_node, game, predictor, queue):
@@ -1,14 +1,18 @@
+import asyncio
+import inspect
 import threading
 
+import numpy as np
 import torch
 
 from ia.janggi_network import JanggiNetwork
 from ia.mcts import MCTS, MCTSNode
+from janggi.action import get_policy_indexes
 from janggi.game import Game
 from janggi.parameters import DEFAULT_TEMPERATURE_END, DEFAULT_TEMPERATURE_THRESHOLD, DEFAULT_TEMPERATURE_START, \
     DEFAULT_N_SIMULATIONS, DEFAULT_C_PUCT, N_THREADS_MCTS
 from janggi.player import Player
-from janggi.utils import Color, DEVICE, get_symmetries, get_random_board
+from janggi.utils import Color, DEVICE, get_random_board
 
 
 class RandomMCTSPlayer(Player):
@@ -24,29 +28,31 @@ class RandomMCTSPlayer(Player):
             print("Current Predicted Value:", self.current_node.predicted_value)
             print("Action Played:", action.to_uci_usi())
             print("Number Simulations:", self.current_node.total_N)
+            print(self.mcts.pool)
             print("Top Probabilities:")
-            best_actions = sorted(self.current_node.N.items(), key=lambda x: -x[1])[:10]
-            for best_action, score in best_actions:
-                if self.current_node.total_N != 0:
-                    print(best_action.to_uci_usi(), score / self.current_node.total_N, self.current_node.q[best_action], sep="\t")
+            if self.current_node.total_N != 0:
+                q = self.current_node.get_q()
+                for index in np.argsort(-self.current_node.visits, kind="stable")[:10]:
+                    print(self.current_node.get_action(index).to_uci_usi(),
+                          self.current_node.visits[index] / self.current_node.total_N, q[index], sep="\t")
         return action
 
     def _apply_latest_actions(self):
-        for i in range(self.last_action_index, len(self.game.actions)):
-            action = self.game.actions[i]
-            if action in self.current_node.next_nodes:
-                self.current_node = self.current_node.next_nodes[action]
-            else:
-                node = MCTSNode()
-                self.current_node.next_nodes[action] = node
-                self.current_node = node
+        for i in range(self.last_action_index, len(self.game.actions) - 1):
+            self.current_node = self.current_node.get_or_create_child(self.game.actions[i])
+        if self.last_action_index < len(self.game.actions):
+            # The game is in the position of the last child, which can be taken from the transposition table
+            self.current_node = self.mcts.get_root(self.current_node, self.game.actions[-1], self.game)
         self.last_action_index = len(self.game.actions)
 
     def __init__(self, color, c_puct=DEFAULT_C_PUCT, n_simulations=DEFAULT_N_SIMULATIONS, current_node=None,
                  temperature_start=DEFAULT_TEMPERATURE_START, temperature_threshold=DEFAULT_TEMPERATURE_THRESHOLD,
-                 temperature_end=DEFAULT_TEMPERATURE_END, think_when_other=False, print_info=False):
+                 temperature_end=DEFAULT_TEMPERATURE_END, think_when_other=False, print_info=False,
+                 transpositions=None, pool=None):
+        # Players sharing current_node give the transpositions and the pool of the other player
         super().__init__(color)
-        self.mcts = MCTS(c_puct, n_simulations, temperature_start, temperature_threshold, temperature_end)
+        self.mcts = MCTS(c_puct, n_simulations, temperature_start, temperature_threshold, temperature_end,
+                         transpositions=transpositions, pool=pool)
         self.current_node = current_node or MCTSNode()
         self.last_action_index = 0
         self.think_when_other = think_when_other
@@ -55,10 +61,22 @@ class RandomMCTSPlayer(Player):
         self.print_info = print_info
 
     def predict(self, game, actions):
+        return self.predict_batch([self.get_leaf_input(game)], [actions], [game.current_player])[0]
+
+    def get_leaf_input(self, game):
+        # What predict_batch needs to know about a leaf, taken before the game moves on
         diff_score = (game.board.get_score(Color.BLUE) - game.board.get_score(Color.RED)) / 73.5 / 2
         if game.current_player == Color.RED:
             diff_score *= -1
-        return {action: 1 / len(actions) for action in actions}, diff_score
+        return diff_score
+
+    def predict_batch(self, leaf_inputs, actions_list, current_players):
+        return [({action: 1 / len(actions) for action in actions}, diff_score)
+                for diff_score, actions in zip(leaf_inputs, actions_list)]
+
+    async def predict_batch_async(self, leaf_inputs, actions_list, current_players):
+        # Used by AsyncMCTS, the same as predict_batch unless the predictor can be awaited
+        return self.predict_batch(leaf_inputs, actions_list, current_players)
 
     def think(self):
         if self.think_when_other:
@@ -84,41 +102,94 @@ class NNPlayer(RandomMCTSPlayer):
     def __init__(self, color, c_puct=DEFAULT_C_PUCT, n_simulations=DEFAULT_N_SIMULATIONS, current_node=None,
                  janggi_net=None,
                  temperature_start=DEFAULT_TEMPERATURE_START, temperature_threshold=DEFAULT_TEMPERATURE_THRESHOLD,
-                 temperature_end=DEFAULT_TEMPERATURE_END, think_when_other=False, print_info=False):
+                 temperature_end=DEFAULT_TEMPERATURE_END, think_when_other=False, print_info=False,
+                 evaluation_cache=None, transpositions=None, pool=None):
         super().__init__(color, c_puct, n_simulations, current_node,
-                         temperature_start, temperature_threshold, temperature_end, think_when_other, print_info)
+                         temperature_start, temperature_threshold, temperature_end, think_when_other, print_info,
+                         transpositions, pool)
         self.janggi_net = janggi_net or JanggiNetwork()
         if isinstance(self.janggi_net, JanggiNetwork):
             self._is_predictor = True
         else:
             self._is_predictor = False
-
-    def predict(self, game, actions):
-        features = game.get_features()
-        features = torch.unsqueeze(features, 0)
-        if self._is_predictor:
-            features = features.to(DEVICE)
-        symm_x, symm_y = get_symmetries(game.current_player)
-        with torch.no_grad():
-            policy, value = self.janggi_net(features)
-            actions_proba = dict()
-            total = 0
-            for action in actions:
-                value_policy_action = policy[0, action.get_features(symm_x, symm_y), action.get_x_from(symm_x),
-                                             action.get_y_from(symm_y)].detach().item()
-                total += value_policy_action
+        self._is_async = inspect.iscoroutinefunction(getattr(self.janggi_net, "__call__", None))
+        # The remote predictors have no model_version: the owner of the cache clears it when their model changes
+        self.evaluation_cache = evaluation_cache
+
+    def get_leaf_input(self, game):
+        # (cache key, cached evaluation, features), the features being computed only when not in the cache.
+        # With repetitions, the legal moves depend on the history, so the position is not cached.
+        if self.evaluation_cache is None or game.board.has_repetitions():
+            return None, None, game.get_features()
+        key = (game.board.zobrist_hash, game.current_player, game.round,
+               getattr(self.janggi_net, "model_version", None))
+        evaluation = self.evaluation_cache.get(*key)
+        if evaluation is None:
+            return key, None, game.get_features()
+        return key, evaluation, None
+
+    def predict_batch(self, leaf_inputs, actions_list, current_players):
+        missing = [i for i, leaf_input in enumerate(leaf_inputs) if leaf_input[1] is None]
+        policy, value = None, None
+        if missing and self._is_predictor:
+            with torch.no_grad():
+                policy, value = self.janggi_net(torch.stack([leaf_inputs[i][2] for i in missing]).to(DEVICE))
+        elif missing:
+            # The remote predictors answer one position at a time
+            predictions = [self.janggi_net(torch.unsqueeze(leaf_inputs[i][2], 0)) for i in missing]
+            policy = torch.cat([prediction[0] for prediction in predictions])
+            value = torch.cat([prediction[1] for prediction in predictions])
+        return self._merge_predictions(leaf_inputs, actions_list, current_players, missing, policy, value)
+
+    async def predict_batch_async(self, leaf_inputs, actions_list, current_players):
+        if not self._is_async:
+            return self.predict_batch(leaf_inputs, actions_list, current_players)
+        missing = [i for i, leaf_input in enumerate(leaf_inputs) if leaf_input[1] is None]
+        policy, value = None, None
+        if missing:
+            predictions = await asyncio.gather(*[self.janggi_net(torch.unsqueeze(leaf_inputs[i][2], 0))
+                                                 for i in missing])
+            policy = torch.cat([prediction[0] for prediction in predictions])
+            value = torch.cat([prediction[1] for prediction in predictions])
+        return self._merge_predictions(leaf_inputs, actions_list, current_players, missing, policy, value)
+
+    def _merge_predictions(self, leaf_inputs, actions_list, current_players, missing, policy, value):
+        # The network evaluated the leaves in missing, the others are in the cache
+        predictions = [None] * len(leaf_inputs)
+        if missing:
+            new_predictions = self._get_predictions(policy, value, [actions_list[i] for i in missing],
+                                                    [current_players[i] for i in missing])
+            for i, prediction in zip(missing, new_predictions):
+                predictions[i] = prediction
+                key = leaf_inputs[i][0]
+                if key is not None:
+                    self.evaluation_cache.put(*key, *prediction)
+        for i, (_, evaluation, _) in enumerate(leaf_inputs):
+            if evaluation is not None:
+                predictions[i] = self.evaluation_cache.get_prediction(evaluation, actions_list[i])
+        return predictions
+
+    @staticmethod
+    def _get_predictions(policy, value, actions_list, current_players):
+        # One gather for all the leaves, with the offset of each leaf in the flattened policies
+        policy = policy.reshape(len(actions_list), -1)
+        policy_indexes = [get_policy_indexes(actions, current_player) + i * policy.shape[1]
+                          for i, (actions, current_player) in enumerate(zip(actions_list, current_players))]
+        values_policy = policy.reshape(-1)[torch.from_numpy(np.concatenate(policy_indexes)).to(policy.device)].tolist()
+        values = value[:, 0].tolist()
+        predictions = []
+        begin = 0
+        for actions, value_leaf in zip(actions_list, values):
+            values_policy_actions = values_policy[begin:begin + len(actions)]
+            begin += len(actions)
+            total = sum(values_policy_actions)
             if total != 0:
-                for action in actions:
-                    value_policy_action = policy[0, action.get_features(symm_x, symm_y), action.get_x_from(symm_x),
-                                                 action.get_y_from(symm_y)].detach().item()
-                    actions_proba[action] = value_policy_action / total
+                actions_proba = {action: value_policy_action / total
+                                 for action, value_policy_action in zip(actions, values_policy_actions)}
             else:
-                for action in actions:
-                    value_policy_action = policy[0, action.get_features(symm_x, symm_y), action.get_x_from(symm_x),
-                                                 action.get_y_from(symm_y)].detach().item()
-                    actions_proba[action] = value_policy_action
-            value = value[0, 0].detach().item()
-        return actions_proba, value
+                actions_proba = dict(zip(actions, values_policy_actions))
+            predictions.append((actions_proba, value_leaf))
+        return predictions
 
 
 class ThreadKeepThinking(threading.Thread):
@@ -132,7 +203,8 @@ class ThreadKeepThinking(threading.Thread):
         self.event = event
 
     def run(self) -> None:
-        while not self.event.is_set():
+        # A full pool stops the thinking, the tree cannot grow anymore
+        while not self.event.is_set() and not self.mcts.pool.is_full():
             self.mcts.run_simulation(self.current_node, self.game, self.predictor)
 
 
@@ -0,0 +1,123 @@
+import asyncio
+import time
+
+from ia.mcts import MCTS, MCTSNode, AsyncMCTS
+from ia.random_mcts_player import NNPlayer
+from janggi.action_cache import ACTION_CACHE
+from janggi.game import Game
+from janggi.parameters import DEFAULT_C_PUCT, MCTS_BATCH_SIZE
+from janggi.player import RandomPlayer
+from janggi.utils import Color, get_random_board
+
+
+class SelfPlayGame:
+    # One game of run_episodes_batched, with the same tree and temperatures as run_episode_raw.
+    # The moves are played by the worker, the players are only there for the Game.
+
+    def __init__(self, n_simulations, iter_max, mcts_class=MCTS):
+        self.game = Game(RandomPlayer(Color.BLUE), RandomPlayer(Color.RED), get_random_board())
+        self.current_node = MCTSNode(is_initial=True)
+        self.mcts = mcts_class(DEFAULT_C_PUCT, n_simulations,
+                               temperature_start=1,
+                               temperature_threshold=30,
+                               temperature_end=0.01)
+        self.iter_max = iter_max
+        self.n_simulations_left = n_simulations + 1
+
+    def collect_leaves(self, predictor, batch_size):
+        return self.mcts.collect_leaves(self.current_node, self.game, predictor,
+                                        min(batch_size, self.n_simulations_left))
+
+    def back_up(self, descents, leaves, predictions):
+        # Plays a move when the simulations of the current one are done
+        self.mcts.back_up(descents, leaves, predictions)
+        self.n_simulations_left -= len(descents)
+        if self.n_simulations_left <= 0:
+            self._play_action(self.mcts.pick_action(self.current_node, self.game))
+
+    def _play_action(self, action):
+        # As in run_game with prune_tree, only the current search is kept
+        self.game.record_statistics(self.current_node)
+        self.mcts.prune(self.current_node, action)
+        self.game.apply_action(action)
+        self.current_node = self.mcts.get_root(self.current_node, action, self.game)
+        self.n_simulations_left = self.mcts.n_simulations - self.current_node.total_N + 1
+
+    async def play_async(self, predictor):
+        # Whole game with an AsyncMCTS
+        while not self.is_finished():
+            self._play_action(await self.mcts.choose_action(self.current_node, self.game, predictor))
+        return self.to_json()
+
+    def is_finished(self):
+        return self.game.is_finished(self.iter_max)
+
+    def to_json(self):
+        return self.game.to_json()
+
+
+def run_episodes_batched(predictor, n_simulations, iter_max, n_games, n_episodes, batch_size=MCTS_BATCH_SIZE,
+                         evaluation_cache=None):
+    # Plays n_episodes games, n_games at a time in this process. At each step, the MCTS of every game goes down
+    # to its next leaves and all the leaves are evaluated in one call to the network.
+    # Returns the games in the format of run_episode_raw.
+    begin_time = time.time()
+    evaluator = NNPlayer(Color.BLUE, janggi_net=predictor, evaluation_cache=evaluation_cache)
+    games = [SelfPlayGame(n_simulations, iter_max) for _ in range(min(n_games, n_episodes))]
+    n_started = len(games)
+    episodes = []
+    n_steps = 0
+    n_leaves = 0
+    while games:
+        collected = [game.collect_leaves(evaluator, batch_size) for game in games]
+        leaves = [leaf for _, game_leaves in collected for leaf in game_leaves]
+        if leaves:
+            predictions = evaluator.predict_batch(*zip(*leaves))
+        else:
+            predictions = []
+        n_steps += 1
+        n_leaves += len(leaves)
+        begin = 0
+        next_games = []
+        for game, (descents, game_leaves) in zip(games, collected):
+            game.back_up(descents, game_leaves, predictions[begin:begin + len(game_leaves)])
+            begin += len(game_leaves)
+            if not game.is_finished():
+                next_games.append(game)
+                continue
+            episodes.append(game.to_json())
+            if n_started < n_episodes:
+                next_games.append(SelfPlayGame(n_simulations, iter_max))
+                n_started += 1
+        games = next_games
+    print("Time Episodes: ", time.time() - begin_time, "Mean batch size:", n_leaves / max(n_steps, 1))
+    print(ACTION_CACHE)
+    if evaluation_cache is not None:
+        print(evaluation_cache)
+    return episodes
+
+
+def run_episodes_async(predictor, n_simulations, iter_max, n_games, n_episodes, evaluation_cache=None):
+    # Same as run_episodes_batched with an AsyncMCTS for each game, for the predictors that can be awaited.
+    # The n_games games and their searches wait for the predictor together in one event loop.
+    begin_time = time.time()
+    evaluator = NNPlayer(Color.BLUE, janggi_net=predictor, evaluation_cache=evaluation_cache)
+    episodes = []
+    n_started = 0
+
+    async def play_games():
+        nonlocal n_started
+        while n_started < n_episodes:
+            n_started += 1
+            game = SelfPlayGame(n_simulations, iter_max, AsyncMCTS)
+            episodes.append(await game.play_async(evaluator))
+
+    async def run():
+        await asyncio.gather(*[play_games() for _ in range(n_games)])
+
+    asyncio.run(run())
+    print("Time Episodes: ", time.time() - begin_time)
+    print(ACTION_CACHE)
+    if evaluation_cache is not None:
+        print(evaluation_cache)
+    return episodes
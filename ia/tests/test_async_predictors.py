@@ -0,0 +1,94 @@
+import asyncio
+import json
+import os
+import pickle
+import unittest
+
+import torch
+
+from ia.async_predictors import AsyncServicePredictorSocket, AsyncServicePredictorWeb, AsyncFileServerPredictor, \
+    AsyncFilePredictor, read_message, make_message
+from ia.predictors import NEW_DIR, OLD_DIR
+
+
+def get_prediction(features):
+    return torch.ones(features.shape[0], 58, 10, 9), torch.full((features.shape[0], 1), 0.5)
+
+
+async def answer_socket(reader, writer):
+    features = pickle.loads(await read_message(reader))
+    policy, value = get_prediction(features)
+    writer.write(make_message(pickle.dumps({"policy": policy, "value": value})))
+    await writer.drain()
+    writer.close()
+
+
+async def answer_files(n_answers):
+    # Same as inference_service_files, which renames the answers into OLD_DIR
+    while n_answers > 0:
+        for filename in os.listdir(NEW_DIR):
+            if filename.endswith(".tmp"):
+                continue
+            with open(NEW_DIR + filename, "rb") as f:
+                policy, value = get_prediction(pickle.load(f))
+            os.remove(NEW_DIR + filename)
+            with open(OLD_DIR + filename + ".tmp", "wb") as f:
+                pickle.dump((policy[0], value[0]), f)
+            os.rename(OLD_DIR + filename + ".tmp", OLD_DIR + filename)
+            n_answers -= 1
+        await asyncio.sleep(0.001)
+
+
+async def answer_http(reader, writer):
+    header = await reader.readuntil(b"\r\n\r\n")
+    length = int([line for line in header.split(b"\r\n") if line.startswith(b"Content-Length")][0].split(b":")[1])
+    body = await reader.readexactly(length)
+    if b"application/json" in header:
+        policy, value = get_prediction(torch.tensor(json.loads(body)["features"]))
+        content = json.dumps({"policy": policy.tolist(), "value": value.tolist()}).encode("utf-8")
+    else:
+        policy, value = get_prediction(pickle.loads(body))
+        content = pickle.dumps((policy[0], value[0]))
+    writer.write(b"HTTP/1.0 200 OK\r\nContent-Length: " + str(len(content)).encode("utf-8") + b"\r\n\r\n" + content)
+    await writer.drain()
+    writer.close()
+
+
+class TestAsyncPredictors(unittest.TestCase):
+
+    def _predict_all(self, answer, predictor_class):
+        async def run():
+            server = await asyncio.start_server(answer, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            predictor = predictor_class("127.0.0.1", port)
+            async with server:
+                return await asyncio.gather(*[predictor(torch.zeros(1, 16, 10, 9)) for _ in range(5)])
+        return asyncio.run(run())
+
+    def test_file_predictor(self):
+        async def run():
+            predictor = AsyncFilePredictor(polling_interval=0.001)
+            answers = asyncio.ensure_future(answer_files(5))
+            predictions = await asyncio.gather(*[predictor(torch.zeros(1, 16, 10, 9)) for _ in range(5)])
+            await answers
+            return predictions
+        predictions = asyncio.run(run())
+        self.assertEqual(len(predictions), 5)
+        for policy, value in predictions:
+            self.assertEqual(tuple(policy.shape), (1, 58, 10, 9))
+            self.assertAlmostEqual(float(value[0, 0]), 0.5)
+
+    def test_predictors(self):
+        for answer, predictor_class in [(answer_socket, AsyncServicePredictorSocket),
+                                        (answer_http, AsyncServicePredictorWeb),
+                                        (answer_http, AsyncFileServerPredictor)]:
+            predictions = self._predict_all(answer, predictor_class)
+            self.assertEqual(len(predictions), 5)
+            for policy, value in predictions:
+                self.assertEqual(tuple(policy.shape), (1, 58, 10, 9))
+                self.assertEqual(tuple(value.shape), (1, 1))
+                self.assertAlmostEqual(float(value[0, 0]), 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,13 +1,41 @@
+import asyncio
+import json
+import math
+import random
 import unittest
 
+import torch
+
+from ia.evaluation_cache import EvaluationCache
 from ia.janggi_network import JanggiNetwork
-from ia.mcts import MCTSNode
+from ia.mcts import MCTS, MCTSNode, AsyncMCTS, TranspositionTable, NodePool
 from ia.random_mcts_player import RandomMCTSPlayer, fight, NNPlayer
+from ia.self_play import run_episodes_batched, run_episodes_async
+from ia.trainer import run_game
+from janggi.action import Action
+from janggi.board import Board
 from janggi.game import Game
 from janggi.player import RandomPlayer
 from janggi.utils import Color, get_random_board
 
 
+def get_nodes(node):
+    # The nodes reachable from node, once each even when shared
+    nodes = {id(node): node}
+    to_visit = [node]
+    while to_visit:
+        node = to_visit.pop()
+        for child in (node.children or dict()).values():
+            if id(child) not in nodes:
+                nodes[id(child)] = child
+                to_visit.append(child)
+    return list(nodes.values())
+
+
+def count_nodes(node):
+    return len(get_nodes(node))
+
+
 class TestIA(unittest.TestCase):
 
     def test_mcts_vs_random(self):
@@ -28,6 +56,358 @@ class TestIA(unittest.TestCase):
         self.assertIn(winner, [Color.BLUE, Color.RED])
         print(game.to_json(node))
 
+    def test_node_arrays(self):
+        node = MCTSNode()
+        player_blue = RandomMCTSPlayer(Color.BLUE, n_simulations=100, current_node=node)
+        player_red = RandomMCTSPlayer(Color.RED, n_simulations=100, current_node=node)
+        game = Game(player_blue, player_red, get_random_board())
+        action = game.get_next_action()
+        self.assertEqual(len(node.action_ids), len(game.get_current_actions()))
+        self.assertEqual(int(node.visits.sum()), node.total_N)
+        self.assertIn(action, node.children)
+        self.assertEqual(len(node.children), int((node.visits > 0).sum()))
+        self.assertAlmostEqual(node.get_policy(Color.BLUE).sum().item(), 1, places=5)
+        visits = {node.get_action(index): int(node.visits[index]) for index in range(len(node.action_ids))}
+        node_copy = MCTSNode.from_visits(visits, node.total_N)
+        self.assertTrue(torch.equal(node_copy.get_policy(Color.BLUE, True), node.get_policy(Color.BLUE, True)))
+        game.apply_action(action)
+        moves = json.loads(game.to_json(node))["moves"]
+        self.assertEqual(moves[0]["total_N"], node.total_N)
+        self.assertEqual(moves[0]["N"][action.to_uci_usi()], visits[action])
+
+    def test_select(self):
+        board = get_random_board()
+        actions = board.get_actions(Color.BLUE)
+        node = MCTSNode()
+        node.set_up({action: 1 / len(actions) for action in actions}, Color.BLUE, actions, 0)
+        mcts = MCTS(c_puct=2, n_simulations=10)
+        # No visit: every child has the same score, and any of them can be chosen
+        self.assertEqual({mcts._select(node) for _ in range(500)}, set(range(len(actions))))
+        random.seed(0)
+        for _ in range(20):
+            node.visits[:] = [random.randint(0, 5) for _ in actions]
+            node.value_sums[:] = [random.uniform(-1, 1) * visits for visits in node.visits]
+            node.virtual_losses[:] = [random.randint(0, 1) for _ in actions]
+            node.total_N = int(node.visits.sum())
+            scores = [node.value_sums[i] / max(node.visits[i], 1)
+                      + 2 * node.priors[i] * math.sqrt(node.total_N) / (1 + node.visits[i])
+                      - node.virtual_losses[i] for i in range(len(actions))]
+            self.assertAlmostEqual(scores[mcts._select(node)], max(scores))
+
+    def test_batched_search(self):
+        for player_class, arguments in [(RandomMCTSPlayer, dict()), (NNPlayer, dict(janggi_net=JanggiNetwork(2)))]:
+            node = MCTSNode()
+            player_blue = player_class(Color.BLUE, n_simulations=100, current_node=node, **arguments)
+            player_red = player_class(Color.RED, n_simulations=100, current_node=node, **arguments)
+            player_blue.mcts.batch_size = 8
+            game = Game(player_blue, player_red, get_random_board())
+            initial = str(game.board)
+            action = game.get_next_action()
+            self.assertIn(action, node.children)
+            self.assertEqual(str(game.board), initial)
+            # The first simulation expands the root
+            self.assertEqual(node.total_N, 100)
+            self.assertEqual(int(node.visits.sum()), 100)
+            nodes = [node]
+            while nodes:
+                current = nodes.pop()
+                if current.virtual_losses is not None:
+                    self.assertFalse(current.virtual_losses.any())
+                nodes.extend((current.children or dict()).values())
+
+    def test_run_episodes_batched(self):
+        network = JanggiNetwork(2)
+        network.eval()
+        episodes = run_episodes_batched(network, n_simulations=10, iter_max=12, n_games=2, n_episodes=3,
+                                        batch_size=4)
+        self.assertEqual(len(episodes), 3)
+        for episode in episodes:
+            episode = json.loads(episode)
+            self.assertIn(episode["winner"], ["BLUE", "RED"])
+            self.assertLessEqual(len(episode["moves"]), 12)
+            for move in episode["moves"]:
+                self.assertIn(move["played"], move["N"])
+                self.assertEqual(sum(move["N"].values()), move["total_N"])
+
+    def test_async_search(self):
+        network = JanggiNetwork(2)
+        network.eval()
+
+        class AsyncPredictor:
+            def __init__(self):
+                self.n_calls = 0
+
+            async def __call__(self, features):
+                self.n_calls += 1
+                await asyncio.sleep(0.001)
+                with torch.no_grad():
+                    return network(features)
+
+        class CountingPlayer(RandomMCTSPlayer):
+            def __init__(self):
+                super().__init__(Color.BLUE)
+                self.n_leaf_inputs = 0
+                self.n_leaves = 0
+
+            def get_leaf_input(self, game):
+                self.n_leaf_inputs += 1
+                return super().get_leaf_input(game)
+
+            async def predict_batch_async(self, leaf_inputs, actions_list, current_players):
+                self.n_leaves += len(leaf_inputs)
+                await asyncio.sleep(0.001)
+                return self.predict_batch(leaf_inputs, actions_list, current_players)
+
+        async_predictor = AsyncPredictor()
+        counting_player = CountingPlayer()
+        for predictor in [counting_player, NNPlayer(Color.BLUE, janggi_net=async_predictor)]:
+            node = MCTSNode()
+            game = Game(RandomPlayer(Color.BLUE), RandomPlayer(Color.RED), get_random_board())
+            initial = str(game.board)
+            mcts = AsyncMCTS(1, 60, temperature_start=0.01, temperature_end=0.01, n_tasks=48)
+            action = asyncio.run(mcts.choose_action(node, game, predictor))
+            self.assertIn(action, node.children)
+            self.assertEqual(str(game.board), initial)
+            self.assertEqual(node.total_N, 60)
+            self.assertEqual(int(node.visits.sum()), 60)
+            self.assertFalse(node.virtual_losses.any())
+        self.assertGreater(async_predictor.n_calls, 0)
+        self.assertLessEqual(async_predictor.n_calls, 61)
+        # The leaves already awaited by another simulation are not prepared again
+        self.assertEqual(counting_player.n_leaf_inputs, counting_player.n_leaves)
+
+    def test_run_episodes_async(self):
+        network = JanggiNetwork(2)
+        network.eval()
+        episodes = run_episodes_async(network, n_simulations=10, iter_max=12, n_games=2, n_episodes=3)
+        self.assertEqual(len(episodes), 3)
+        for episode in episodes:
+            episode = json.loads(episode)
+            self.assertLessEqual(len(episode["moves"]), 12)
+            for move in episode["moves"]:
+                self.assertEqual(sum(move["N"].values()), move["total_N"])
+
+    def test_transpositions(self):
+        mcts = MCTS(1, 100, transpositions=TranspositionTable(100))
+        game = Game(RandomPlayer(Color.BLUE), RandomPlayer(Color.RED), Board("yang", "yang"))
+        root = MCTSNode()
+        # Two blue soldiers around a red one, in the two orders
+        blue_first, blue_second, red_move = Action(3, 0, 4, 0), Action(3, 8, 4, 8), Action(6, 0, 5, 0)
+        nodes = []
+        for first, second in [(blue_first, blue_second), (blue_second, blue_first)]:
+            node = root
+            for action in [first, red_move, second]:
+                self.assertIn(action, game.get_current_actions())
+                game.apply_action(action)
+                node = mcts.get_child(node, action, game)
+            nodes.append(node)
+            for _ in range(3):
+                game.reverse_action()
+        self.assertIs(nodes[0], nodes[1])
+        self.assertTrue(nodes[0].is_shared)
+        self.assertEqual(len(mcts.transpositions), 5)
+        # Back to an earlier position: the node is not shared, its moves depend on the history
+        node = root
+        for action in [Action(1, 4, 2, 4), Action(8, 4, 7, 4), Action(2, 4, 1, 4), Action(7, 4, 8, 4)]:
+            game.apply_action(action)
+            node = mcts.get_child(node, action, game)
+        self.assertFalse(node.is_shared)
+        self.assertEqual(len(mcts.transpositions), 8)
+
+    def test_replaced_child(self):
+        mcts = MCTS(1, 100, transpositions=TranspositionTable(100))
+        game = Game(RandomPlayer(Color.BLUE), RandomPlayer(Color.RED), Board("yang", "yang"))
+        root = MCTSNode()
+        soldier, general, general_back = Action(3, 0, 4, 0), Action(1, 4, 2, 4), Action(2, 4, 1, 4)
+        red_general, red_general_back = Action(8, 4, 7, 4), Action(7, 4, 8, 4)
+        # The same position in two orders, the general going back being a repetition only in the second one
+        children = []
+        for actions in [[general, red_general, soldier, red_general_back],
+                        [soldier, red_general, general, red_general_back]]:
+            node = root
+            for action in actions + [general_back]:
+                game.apply_action(action)
+                node = mcts.get_child(node, action, game)
+            children.append(node)
+            for _ in range(5):
+                game.reverse_action()
+        self.assertTrue(children[0].is_shared)
+        self.assertFalse(children[1].is_shared)
+        # The first child has no parent anymore
+        self.assertFalse(children[0].in_pool)
+        self.assertEqual(len(mcts.transpositions), sum(node.is_shared for node in get_nodes(root)))
+        self.assertEqual(mcts.pool.n_nodes, count_nodes(root) - 1)
+
+    def test_search_with_transpositions(self):
+        for batch_size in [1, 8]:
+            node = MCTSNode()
+            player_blue = RandomMCTSPlayer(Color.BLUE, n_simulations=200, current_node=node)
+            player_red = RandomMCTSPlayer(Color.RED, n_simulations=200, current_node=node)
+            player_blue.mcts.transpositions = TranspositionTable(1000)
+            player_blue.mcts.batch_size = batch_size
+            game = Game(player_blue, player_red, get_random_board())
+            action = game.get_next_action()
+            self.assertIn(action, node.children)
+            self.assertEqual(node.total_N, 200)
+            self.assertEqual(int(node.visits.sum()), 200)
+            self.assertGreater(len(player_blue.mcts.transpositions), 0)
+            self.assertFalse(node.virtual_losses.any())
+
+    def test_transpositions_merge_visits(self):
+        random.seed(5)
+        player = RandomMCTSPlayer(Color.BLUE, n_simulations=3000, transpositions=TranspositionTable(10000))
+        root = player.current_node
+        Game(player, RandomPlayer(Color.RED), Board()).get_next_action()
+        self.assertGreater(player.mcts.transpositions.hits, 0)
+        # Visits of each node through each of its parents
+        parent_visits = dict()
+        nodes = [root]
+        while nodes:
+            node = nodes.pop()
+            for action, child in (node.children or dict()).items():
+                index = node.action_ids.tolist().index(action.get_id())
+                if id(child) not in parent_visits:
+                    parent_visits[id(child)] = (child, [])
+                    nodes.append(child)
+                parent_visits[id(child)][1].append(int(node.visits[index]))
+        shared = [(child, visits) for child, visits in parent_visits.values() if len(visits) > 1]
+        self.assertGreater(len(shared), 0)
+        # A position reached by several move orders is evaluated once, then the visits of all the orders go on below
+        for child, visits in shared:
+            self.assertEqual(child.total_N + 1, sum(visits))
+
+    def test_predict_batch(self):
+        player = NNPlayer(Color.BLUE, janggi_net=JanggiNetwork(2))
+        player.janggi_net.eval()
+        game = Game(player, RandomPlayer(Color.RED), get_random_board())
+        blue_actions = game.get_current_actions()
+        blue_input = player.get_leaf_input(game)
+        game.apply_action(blue_actions[0])
+        red_actions = game.get_current_actions()
+        predictions = player.predict_batch([blue_input, player.get_leaf_input(game)],
+                                           [blue_actions, red_actions], [Color.BLUE, Color.RED])
+        probabilities, value = player.predict(game, red_actions)
+        self.assertAlmostEqual(predictions[1][1], value, places=5)
+        for action in red_actions:
+            self.assertAlmostEqual(predictions[1][0][action], probabilities[action], places=5)
+        self.assertAlmostEqual(sum(predictions[0][0].values()), 1, places=5)
+
+    def test_node_pool(self):
+        for batch_size in [1, 8]:
+            node = MCTSNode()
+            player_blue = RandomMCTSPlayer(Color.BLUE, n_simulations=300, current_node=node)
+            player_red = RandomMCTSPlayer(Color.RED, n_simulations=300, current_node=node)
+            player_blue.mcts.pool = NodePool(max_nodes=50)
+            player_blue.mcts.batch_size = batch_size
+            game = Game(player_blue, player_red, get_random_board())
+            action = game.get_next_action()
+            # The search goes on without new nodes
+            self.assertTrue(player_blue.mcts.pool.is_full())
+            self.assertEqual(player_blue.mcts.pool.n_nodes, 50)
+            self.assertGreater(player_blue.mcts.pool.n_bytes, 0)
+            self.assertEqual(node.total_N, 300)
+            self.assertEqual(int(node.visits.sum()), 300)
+            self.assertFalse(node.virtual_losses.any())
+            self.assertIn(action, node.children)
+            # The nodes of the moves not played go back to the pool
+            child = player_blue.mcts.prune(node, action)
+            self.assertEqual(list(node.children), [action])
+            self.assertEqual(player_blue.mcts.pool.n_nodes, count_nodes(child) - (0 if child.in_pool else 1))
+            self.assertFalse(player_blue.mcts.pool.is_full())
+
+    def test_prune_with_transpositions(self):
+        random.seed(0)
+        root = MCTSNode(is_initial=True)
+        transpositions = TranspositionTable(100000)
+        player_blue = RandomMCTSPlayer(Color.BLUE, n_simulations=1500, current_node=root,
+                                       transpositions=transpositions)
+        player_red = RandomMCTSPlayer(Color.RED, n_simulations=1500, current_node=root,
+                                      transpositions=transpositions, pool=player_blue.mcts.pool)
+        game = Game(player_blue, player_red, get_random_board())
+        for _ in range(6):
+            action = game.get_next_action()
+            player = player_blue if game.current_player == Color.BLUE else player_red
+            node = player.mcts.prune(player.current_node, action)
+            game.apply_action(action)
+            # The shared nodes of the moves not played leave the table and the pool with their last parent
+            nodes = get_nodes(node)
+            self.assertEqual(len(transpositions), sum(node.is_shared for node in nodes))
+            self.assertEqual(player_blue.mcts.pool.n_nodes, sum(node.in_pool for node in nodes))
+        self.assertGreater(transpositions.hits, 0)
+
+    def test_node_pool_after_game(self):
+        # With a small table, the nodes evicted from it are released with their last parent
+        random.seed(0)
+        root = MCTSNode(is_initial=True)
+        transpositions = TranspositionTable(500)
+        pool = NodePool(max_nodes=3000)
+        player_blue = RandomMCTSPlayer(Color.BLUE, n_simulations=1500, current_node=root,
+                                       transpositions=transpositions, pool=pool)
+        player_red = RandomMCTSPlayer(Color.RED, n_simulations=1500, current_node=root,
+                                      transpositions=transpositions, pool=pool)
+        game = run_game(get_random_board(), player_blue, player_red, 12, prune_tree=True)
+        self.assertGreater(transpositions.hits, 0)
+        node = root
+        for action in game.actions:
+            node = node.get_child(action)
+        self.assertEqual(pool.n_nodes, sum(node.in_pool for node in get_nodes(node)))
+        self.assertFalse(pool.is_full())
+
+    def test_evaluation_cache(self):
+        cache = EvaluationCache(max_size=2)
+        player = NNPlayer(Color.BLUE, janggi_net=JanggiNetwork(2), evaluation_cache=cache)
+        player.janggi_net.eval()
+        game = Game(player, RandomPlayer(Color.RED), get_random_board())
+        actions = game.get_current_actions()
+        probabilities, value = player.predict(game, actions)
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+        cached_probabilities, cached_value = player.predict(game, actions)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertAlmostEqual(cached_value, value, places=5)
+        for action in actions:
+            self.assertAlmostEqual(cached_probabilities[action], probabilities[action], places=5)
+        # A subset of the moves, as with repetitions, is normalized again
+        cached_probabilities, _ = player.predict(game, actions[:2])
+        self.assertAlmostEqual(sum(cached_probabilities.values()), 1, places=5)
+        # Another model version is another entry
+        player.janggi_net.update_version()
+        player.predict(game, actions)
+        self.assertEqual((cache.hits, cache.misses), (2, 2))
+        game.apply_action(actions[0])
+        player.predict(game, game.get_current_actions())
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.evictions, 1)
+        # The round is an input of the network
+        game.round += 2
+        player.predict(game, game.get_current_actions())
+        self.assertEqual((cache.hits, cache.misses), (2, 4))
+
+    def test_evaluation_cache_remote(self):
+        # A predictor without a model version is cached until the cache is cleared
+        network = JanggiNetwork(2)
+        network.eval()
+
+        class RemotePredictor:
+            def __init__(self):
+                self.n_calls = 0
+
+            def __call__(self, features):
+                self.n_calls += 1
+                with torch.no_grad():
+                    return network(features)
+
+        cache = EvaluationCache()
+        predictor = RemotePredictor()
+        player = NNPlayer(Color.BLUE, janggi_net=predictor, evaluation_cache=cache)
+        game = Game(player, RandomPlayer(Color.RED), get_random_board())
+        actions = game.get_current_actions()
+        player.predict(game, actions)
+        player.predict(game, actions)
+        self.assertEqual(predictor.n_calls, 1)
+        cache.clear()
+        player.predict(game, actions)
+        self.assertEqual(predictor.n_calls, 2)
+
     def test_single_action_random(self):
         n_simulations = 800
         node = MCTSNode()
@@ -1,9 +1,11 @@
+import json
 import unittest
 
 from ia.janggi_network import JanggiNetwork
-from ia.random_mcts_player import fight, NNPlayer
-from ia.trainer import Trainer
-from janggi.utils import Color
+from ia.mcts import MCTSNode
+from ia.random_mcts_player import fight, NNPlayer, RandomMCTSPlayer
+from ia.trainer import Trainer, run_game
+from janggi.utils import Color, get_random_board
 
 
 class TestTrainer(unittest.TestCase):
@@ -15,6 +17,27 @@ class TestTrainer(unittest.TestCase):
         for example in examples:
             self.assertIn(example[2], [-1, 1])
 
+    def test_prune_tree(self):
+        root = MCTSNode(is_initial=True)
+        player_blue = RandomMCTSPlayer(Color.BLUE, n_simulations=50, current_node=root)
+        player_red = RandomMCTSPlayer(Color.RED, n_simulations=50, current_node=root)
+        game = run_game(get_random_board(), player_blue, player_red, 10, prune_tree=True)
+        self.assertEqual(len(game.statistics), len(game.actions))
+        episode = json.loads(game.to_json())
+        # Only the moves played are left in the tree, with the same visits as the recorded ones
+        node = root
+        for action in game.actions:
+            self.assertEqual(list(node.children), [action])
+            node = node.get_child(action)
+        statistics = game.statistics
+        game.statistics = []
+        self.assertEqual(json.loads(game.to_json(root)), episode)
+        # The statistics of the first moves, the tree for the next ones
+        game.statistics = statistics[:3]
+        self.assertEqual(json.loads(game.to_json(root)), episode)
+        for move in episode["moves"]:
+            self.assertEqual(sum(move["N"].values()), move["total_N"])
+
     def test_learn(self):
         trainer = Trainer(JanggiNetwork(), n_simulations=100, iter_max=30, n_simulation_opponent=10)
         trainer.learn_policy(n_iterations=1, n_episodes=10)
@@ -7,18 +7,19 @@ import time
 import torch
 from torch.utils.data import Dataset, DataLoader
 
+from ia.evaluation_cache import EVALUATION_CACHE
 from ia.janggi_network import JanggiLoss, JanggiNetwork
 from ia.mcts import MCTSNode
 from ia.random_mcts_player import NNPlayer, fight, RandomMCTSPlayer
 from janggi.action import Action, get_none_action_policy
-from janggi.board import Board
+from janggi.action_cache import ACTION_CACHE
 from janggi.game import Game
 from janggi.parameters import PROP_POPULATION_FOR_LEARNING, N_LAST_GAME_TO_CONSIDER, LEARNING_RATE, EPOCH_NUMBER, \
     EPOCH_NUMBER_CONTINUOUS, WAINTING_TIME_IF_NO_EPISODE, N_FIGHTS, VICTORY_THRESHOLD, LOG_PRINT_FREQ, BATCH_SIZE, \
     TRAIN_ON_ALL, TRAIN_NEW_MODEL
 from janggi.player import RandomPlayer
 from janggi.stockfish_player import StockfishPlayer
-from janggi.utils import Color, DEVICE, get_random_board, get_process_stockfish
+from janggi.utils import Color, DEVICE, get_random_board, get_process_stockfish, get_board_class
 
 from multiprocessing import current_process
 
@@ -43,7 +44,7 @@ def json_to_examples(line, examples, proba=None):
         print("Problem with", line)
         return
 
-    board = Board.from_fen(game_json["initial_fen"])
+    board = get_board_class().from_fen(game_json["initial_fen"])
     is_blue = True
     round = 0
     if game_json["winner"] == "BLUE":
@@ -52,10 +53,8 @@ def json_to_examples(line, examples, proba=None):
         winner = -1
     for move in game_json["moves"]:
         played = Action.from_uci_usi(move["played"])
-        node = MCTSNode()
-        node.total_N = move["total_N"]
-        for action_uci_usi, value in move["N"].items():
-            node.N[Action.from_uci_usi(action_uci_usi)] = value
+        node = MCTSNode.from_visits({Action.from_uci_usi(action_uci_usi): value
+                                     for action_uci_usi, value in move["N"].items()}, move["total_N"])
         update_examples(board, examples, node.get_policy, is_blue, proba, round, winner=winner)
         board.apply_action(played)
         round += 1
@@ -106,9 +105,9 @@ def _raw_to_examples(line_iterator, proba=None):
         else:
             if board is None:
                 if fen_starting is None:
-                    board = Board(start_blue=blue_starting, start_red=red_starting)
+                    board = get_board_class()(start_blue=blue_starting, start_red=red_starting)
                 else:
-                    board = Board.from_fen(fen_starting)
+                    board = get_board_class().from_fen(fen_starting)
             if line == "XXXX":
                 action = None
                 get_policy = get_none_action_policy
@@ -184,14 +183,18 @@ class Trainer:
                                janggi_net=self.predictor,
                                temperature_start=1,
                                temperature_threshold=30,
-                               temperature_end=0.01)
+                               temperature_end=0.01,
+                               evaluation_cache=EVALUATION_CACHE)
         player_red = NNPlayer(Color.RED,
                               n_simulations=self.n_simulations,
                               current_node=initial_node,
                               janggi_net=self.predictor,
                               temperature_start=1,
                               temperature_threshold=30,
-                              temperature_end=0.01)
+                              temperature_end=0.01,
+                              evaluation_cache=EVALUATION_CACHE,
+                              transpositions=player_blue.mcts.transpositions,
+                              pool=player_blue.mcts.pool)
         game = Game(player_blue, player_red, board)
         while not game.is_finished(self.iter_max):
             new_action = game.get_next_action()
@@ -369,6 +372,7 @@ class Trainer:
                           (epoch + 1, i + 1, running_loss / LOG_PRINT_FREQ))
                     running_loss = 0.0
         self.predictor.eval()
+        self.predictor.update_version()
 
 
 class ExampleDataset(Dataset):
@@ -473,6 +477,8 @@ class ModelSaver:
         if optimizer is not None:
             optimizer.load_state_dict(checkpoint['optimizer_state_dict'])
         model.eval()
+        if isinstance(model, JanggiNetwork):
+            model.update_version()
 
     def load_random_model(self, model, optimizer=None):
         last_index = self.get_last_weight_index()
@@ -565,6 +571,7 @@ def run_episode(trainer):
     begin_time = time.time()
     examples = trainer.run_episode()
     print("Time Episode: ", time.time() - begin_time)
+    print(ACTION_CACHE)
     return examples
 
 
@@ -580,14 +587,18 @@ def run_episode_independant(args):
                            janggi_net=predictor,
                            temperature_start=1,
                            temperature_threshold=30,
-                           temperature_end=0.01)
+                           temperature_end=0.01,
+                           evaluation_cache=EVALUATION_CACHE)
     player_red = NNPlayer(Color.RED,
                           n_simulations=n_simulations,
                           current_node=initial_node,
                           janggi_net=predictor,
                           temperature_start=1,
                           temperature_threshold=30,
-                          temperature_end=0.01)
+                          temperature_end=0.01,
+                          evaluation_cache=EVALUATION_CACHE,
+                          transpositions=player_blue.mcts.transpositions,
+                          pool=player_blue.mcts.pool)
     game = Game(player_blue, player_red, board)
     while not game.is_finished(iter_max):
         new_action = game.get_next_action()
@@ -613,6 +624,7 @@ def run_episode_independant(args):
     winner = game.get_winner()
     set_winner(examples, winner)
     print("Time Episode: ", time.time() - begin_time)
+    print(ACTION_CACHE)
     return examples
 
 
@@ -620,24 +632,35 @@ def run_episode_raw(args):
     print("Starting episode", current_process().name)
     begin_time = time.time()
     predictor, n_simulations, iter_max = args
+    if getattr(predictor, "model_version", None) is None:
+        # The model of a remote predictor can change between two games
+        EVALUATION_CACHE.clear()
     board = get_random_board()
-    initial_node = MCTSNode(is_initial=True)
     player_blue = NNPlayer(Color.BLUE, n_simulations=n_simulations,
-                           current_node=initial_node,
+                           current_node=MCTSNode(is_initial=True),
                            janggi_net=predictor,
                            temperature_start=1,
                            temperature_threshold=30,
-                           temperature_end=0.01)
+                           temperature_end=0.01,
+                           evaluation_cache=EVALUATION_CACHE)
     player_red = NNPlayer(Color.RED,
                           n_simulations=n_simulations,
-                          current_node=initial_node,
+                          current_node=player_blue.current_node,
                           janggi_net=predictor,
                           temperature_start=1,
                           temperature_threshold=30,
-                          temperature_end=0.01)
-    game = run_game(board, player_blue, player_red, iter_max)
+                          temperature_end=0.01,
+                          evaluation_cache=EVALUATION_CACHE,
+                          transpositions=player_blue.mcts.transpositions,
+                          pool=player_blue.mcts.pool)
+    game = run_game(board, player_blue, player_red, iter_max, prune_tree=True)
     print("Time Episode: ", time.time() - begin_time)
-    return game.to_json(initial_node)
+    print(ACTION_CACHE)
+    print(EVALUATION_CACHE)
+    print(player_blue.mcts.pool)
+    if player_blue.mcts.transpositions is not None:
+        print(player_blue.mcts.transpositions)
+    return game.to_json()
 
 
 def run_episode_raw_loop(predictor, n_simulations, iter_max, queue):
@@ -652,21 +675,23 @@ def run_episode_raw_not_nn(args):
     begin_time = time.time()
     n_simulations, iter_max = args
     board = get_random_board()
-    initial_node = MCTSNode(is_initial=True)
     player_blue = RandomMCTSPlayer(Color.BLUE, n_simulations=n_simulations,
-                                   current_node=initial_node,
+                                   current_node=MCTSNode(is_initial=True),
                                    temperature_start=1,
                                    temperature_threshold=30,
                                    temperature_end=0.01)
     player_red = RandomMCTSPlayer(Color.RED,
                                   n_simulations=n_simulations,
-                                  current_node=initial_node,
+                                  current_node=player_blue.current_node,
                                   temperature_start=1,
                                   temperature_threshold=30,
-                                  temperature_end=0.01)
-    game = run_game(board, player_blue, player_red, iter_max)
+                                  temperature_end=0.01,
+                                  transpositions=player_blue.mcts.transpositions,
+                                  pool=player_blue.mcts.pool)
+    game = run_game(board, player_blue, player_red, iter_max, prune_tree=True)
     print("Time Episode: ", time.time() - begin_time)
-    return game.to_json(initial_node)
+    print(ACTION_CACHE)
+    return game.to_json()
 
 
 def run_episode_stockfish(args):
@@ -679,16 +704,19 @@ def run_episode_stockfish(args):
     player_red = StockfishPlayer(Color.RED, process, think_time=2)
     game = run_game(board, player_blue, player_red, iter_max)
     print("Time Episode: ", time.time() - begin_time)
+    print(ACTION_CACHE)
     return game.dumps()
 
 
-def run_game(board, player_blue, player_red, iter_max):
+def run_game(board, player_blue, player_red, iter_max, prune_tree=False):
+    # prune_tree is for MCTS players sharing their tree: the visits of each move are recorded during the game and
+    # only the subtree of the move played is kept, so that the memory used is the one of the current search
     game = Game(player_blue, player_red, board)
     while not game.is_finished(iter_max):
         new_action = game.get_next_action()
-        game.actions.append(new_action)
-        game.board.apply_action(new_action)
-        game.switch_player()
-        game.board.invalidate_action_cache(new_action)  # Try to reduce memory usage
-        game.round += 1
+        if prune_tree:
+            player = player_blue if game.current_player == Color.BLUE else player_red
+            game.record_statistics(player.current_node)
+            player.mcts.prune(player.current_node, new_action)
+        game.apply_action(new_action)
     return game
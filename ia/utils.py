@@ -1,7 +1,11 @@
 import multiprocessing as mp
 import time
 
+from ia.evaluation_cache import EvaluationCache
+from ia.janggi_network import JanggiNetwork
+from ia.self_play import run_episodes_batched, run_episodes_async
 from ia.trainer import ModelSaver, run_episode_raw, run_episode_raw_loop
+from janggi.utils import DEVICE
 
 
 def generate_games(predictor, n_simulations, iter_max, with_pool, n_processes, n_episodes):
@@ -29,6 +33,39 @@ def generate_games(predictor, n_simulations, iter_max, with_pool, n_processes, n
                 process.join()
 
 
+def generate_games_batched(predictor, n_simulations, iter_max, n_games, n_episodes):
+    # One process playing n_games at a time, the leaves of all the games evaluated together by predictor
+    model_saver = ModelSaver()
+    evaluation_cache = EvaluationCache()
+    while True:
+        begin_time = time.time()
+        if isinstance(predictor, JanggiNetwork):
+            # The network is in this process, so it follows the training directly
+            model_saver.load_latest_model(predictor)
+            predictor.to(DEVICE)
+        else:
+            # The model of a remote predictor can change between two calls
+            evaluation_cache.clear()
+        episodes = run_episodes_batched(predictor, n_simulations, iter_max, n_games, n_episodes,
+                                        evaluation_cache=evaluation_cache)
+        model_saver.save_episodes_raw(episodes)
+        print("Total time:", time.time() - begin_time)
+
+
+def generate_games_async(predictor, n_simulations, iter_max, n_games, n_episodes):
+    # One process playing n_games at a time with an awaitable remote predictor
+    model_saver = ModelSaver()
+    evaluation_cache = EvaluationCache()
+    while True:
+        begin_time = time.time()
+        # The model of a remote predictor can change between two calls
+        evaluation_cache.clear()
+        episodes = run_episodes_async(predictor, n_simulations, iter_max, n_games, n_episodes,
+                                      evaluation_cache=evaluation_cache)
+        model_saver.save_episodes_raw(episodes)
+        print("Total time:", time.time() - begin_time)
+
+
 def save_queue_process(queue, n_episodes):
     model_saver = ModelSaver()
     begin_time = time.time()
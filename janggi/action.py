@@ -1,5 +1,8 @@
+import numpy as np
 import torch
 
+from janggi.move_tables import N_SQUARES, RAYS, DIAGONALS, HORSE_MOVES, ELEPHANT_MOVES, FORTRESS_MOVES, \
+    SOLDIER_MOVES, SQUARE_TO_XY
 from janggi.utils import BOARD_HEIGHT, BOARD_WIDTH, get_symmetries, DEVICE
 
 SYMMETRY_X = [9, 10, 11, 12, 13, 14, 15, 16, 17,  # North
@@ -72,15 +75,21 @@ UCI_USI_Y = {
 
 class Action(object):
 
-    __slots__ = ('x_from', 'y_from', "x_to", "y_to", "eaten", "_hash")
+    # Immutable, so that the same action can be shared between boards, threads and search trees
+    __slots__ = ('x_from', 'y_from', "x_to", "y_to", "_hash")
 
     def __init__(self, x_from, y_from, x_to, y_to):
-        self.x_from = x_from
-        self.y_from = y_from
-        self.x_to = x_to
-        self.y_to = y_to
-        self.eaten = None
-        self._hash = hash((self.x_from, self.y_from, self.x_to, self.y_to))
+        object.__setattr__(self, "x_from", x_from)
+        object.__setattr__(self, "y_from", y_from)
+        object.__setattr__(self, "x_to", x_to)
+        object.__setattr__(self, "y_to", y_to)
+        object.__setattr__(self, "_hash", hash((x_from, y_from, x_to, y_to)))
+
+    def __setattr__(self, key, value):
+        raise AttributeError("Action is immutable")
+
+    def __delattr__(self, key):
+        raise AttributeError("Action is immutable")
 
     @classmethod
     def from_uci_usi(cls, move):
@@ -95,6 +104,16 @@ class Action(object):
         y_to = move[2]
         return Action(int(x_from), int(y_from), int(x_to), int(y_to))
 
+    @classmethod
+    def from_id(cls, action_id):
+        return INTERNED_ACTIONS[action_id]
+
+    def get_id(self):
+        if self.is_pass():
+            return PASS_ACTION_ID
+        return SQUARES_TO_ACTION_ID[(self.x_from * BOARD_WIDTH + self.y_from) * N_SQUARES
+                                    + self.x_to * BOARD_WIDTH + self.y_to]
+
     def to_uci_usi(self):
         return UCI_USI_Y[self.y_from] + \
                UCI_USI_X[self.x_from] + \
@@ -139,6 +158,16 @@ class Action(object):
             and self.x_to == other.x_to and self.y_to == other.y_to
 
     def get_features(self, symmetry_x=False, symmetry_y=False):
+        # Policy plane, None when no piece can make this move
+        return POLICY_PLANES[((symmetry_x * 2 + symmetry_y) * N_SQUARES + self.x_from * BOARD_WIDTH + self.y_from)
+                             * N_SQUARES + self.x_to * BOARD_WIDTH + self.y_to]
+
+    def get_policy_index(self, symmetry_x=False, symmetry_y=False):
+        # Index in the flattened 58x10x9 policy, -1 when no piece can make this move
+        return POLICY_INDEXES[((symmetry_x * 2 + symmetry_y) * N_SQUARES + self.x_from * BOARD_WIDTH + self.y_from)
+                              * N_SQUARES + self.x_to * BOARD_WIDTH + self.y_to]
+
+    def _compute_features(self):
         res = None
         if self.y_from == self.y_to:
             # Vertical move
@@ -225,21 +254,113 @@ class Action(object):
                 res = 56
             else:
                 res = 57
-        if symmetry_x:
-            res = SYMMETRY_X[res]
-        if symmetry_y:
-            res = SYMMETRY_Y[res]
         return res
 
     def get_policy(self, current_player, data_augmentation=False):
         policy = torch.zeros((58, 10, 9))
         symmetry_x, symmetry_y = get_symmetries(current_player, data_augmentation)
-        policy[self.get_features(symmetry_x, symmetry_y),
-               self.get_x_from(symmetry_x), self.get_y_from(symmetry_y)] = 1.0
+        policy.view(-1)[self.get_policy_index(symmetry_x, symmetry_y)] = 1.0
         # return policy.to(DEVICE)
         return policy
 
 
+def _build_policy_tables():
+    # Indexed by ((symmetry_x * 2 + symmetry_y) * N_SQUARES + square_from) * N_SQUARES + square_to
+    planes = [None] * (4 * N_SQUARES * N_SQUARES)
+    indexes = [-1] * (4 * N_SQUARES * N_SQUARES)
+    for square_from in range(N_SQUARES):
+        x_from, y_from = SQUARE_TO_XY[square_from]
+        for square_to in range(N_SQUARES):
+            x_to, y_to = SQUARE_TO_XY[square_to]
+            plane = Action(x_from, y_from, x_to, y_to)._compute_features()
+            if plane is None:
+                continue
+            for symmetry_x in [False, True]:
+                for symmetry_y in [False, True]:
+                    plane_symmetry = plane
+                    if symmetry_x:
+                        plane_symmetry = SYMMETRY_X[plane_symmetry]
+                    if symmetry_y:
+                        plane_symmetry = SYMMETRY_Y[plane_symmetry]
+                    x = BOARD_HEIGHT - 1 - x_from if symmetry_x else x_from
+                    y = BOARD_WIDTH - 1 - y_from if symmetry_y else y_from
+                    index = ((symmetry_x * 2 + symmetry_y) * N_SQUARES + square_from) * N_SQUARES + square_to
+                    planes[index] = plane_symmetry
+                    indexes[index] = (plane_symmetry * BOARD_HEIGHT + x) * BOARD_WIDTH + y
+    return planes, indexes
+
+
+POLICY_PLANES, POLICY_INDEXES = _build_policy_tables()
+# POLICY_INDEX_TABLE[symmetry_x, symmetry_y, square_from, square_to], for vectorized lookups
+POLICY_INDEX_TABLE = np.array(POLICY_INDEXES, dtype=np.int64).reshape((2, 2, N_SQUARES, N_SQUARES))
+
+
+def get_policy_indexes(actions, current_player, data_augmentation=False):
+    # Indexes in the flattened policy of a list of actions, to gather or scatter the policy in one call
+    symmetry_x, symmetry_y = get_symmetries(current_player, data_augmentation)
+    squares = np.array([(action.x_from * BOARD_WIDTH + action.y_from, action.x_to * BOARD_WIDTH + action.y_to)
+                        for action in actions], dtype=np.int64).reshape((-1, 2))
+    return POLICY_INDEX_TABLE[int(symmetry_x), int(symmetry_y), squares[:, 0], squares[:, 1]]
+
+
+def _build_action_catalogue():
+    # Every move the move tables can produce, ordered by squares. The pass comes first.
+    squares_to = [set() for _ in range(N_SQUARES)]
+    for square in range(N_SQUARES):
+        for ray in RAYS[square]:
+            squares_to[square].update(ray)
+        for square_next, square_after in DIAGONALS[square]:
+            squares_to[square].add(square_next)
+            if square_after is not None:
+                squares_to[square].add(square_after)
+        for _, square_to in HORSE_MOVES[square]:
+            squares_to[square].add(square_to)
+        for _, _, square_to in ELEPHANT_MOVES[square]:
+            squares_to[square].add(square_to)
+        for moves in list(FORTRESS_MOVES.values()) + list(SOLDIER_MOVES.values()):
+            squares_to[square].update(moves[square])
+    actions = [(0, 0, 0, 0)]
+    for square_from in range(N_SQUARES):
+        for square_to in sorted(squares_to[square_from]):
+            actions.append(SQUARE_TO_XY[square_from] + SQUARE_TO_XY[square_to])
+    return actions
+
+
+# ACTIONS[action_id] = (x_from, y_from, x_to, y_to)
+ACTIONS = _build_action_catalogue()
+N_ACTIONS = len(ACTIONS)
+PASS_ACTION_ID = 0
+# Indexed by square_from * N_SQUARES + square_to, -1 when no piece can make the move
+SQUARES_TO_ACTION_ID = [-1] * (N_SQUARES * N_SQUARES)
+for _action_id, (_x_from, _y_from, _x_to, _y_to) in enumerate(ACTIONS[1:], 1):
+    SQUARES_TO_ACTION_ID[(_x_from * BOARD_WIDTH + _y_from) * N_SQUARES + _x_to * BOARD_WIDTH + _y_to] = _action_id
+# Actions are immutable, so one shared instance per id is enough
+INTERNED_ACTIONS = [Action(*action) for action in ACTIONS]
+ACTION_TO_UCI_USI = [action.to_uci_usi() for action in INTERNED_ACTIONS]
+UCI_USI_TO_ACTION_ID = {uci_usi: action_id for action_id, uci_usi in enumerate(ACTION_TO_UCI_USI)}
+# Squares of each action id, the pass being from 0 to 0
+ACTION_SQUARES_FROM = np.array([x_from * BOARD_WIDTH + y_from for x_from, y_from, _, _ in ACTIONS], dtype=np.int64)
+ACTION_SQUARES_TO = np.array([x_to * BOARD_WIDTH + y_to for _, _, x_to, y_to in ACTIONS], dtype=np.int64)
+# ACTION_ID_POLICY_INDEX_TABLE[symmetry_x, symmetry_y, action_id], index in the flattened policy
+ACTION_ID_POLICY_INDEX_TABLE = POLICY_INDEX_TABLE[:, :, ACTION_SQUARES_FROM, ACTION_SQUARES_TO]
+# ACTION_POLICY_INDEX[symmetry_x][symmetry_y][action_id] = (plane, x, y) in the policy
+ACTION_POLICY_INDEX = [[[(action.get_features(symmetry_x, symmetry_y),
+                          action.get_x_from(symmetry_x),
+                          action.get_y_from(symmetry_y)) for action in INTERNED_ACTIONS]
+                        for symmetry_y in [False, True]]
+                       for symmetry_x in [False, True]]
+
+
+def get_action_policy_index(action_id, current_player, data_augmentation=False):
+    symmetry_x, symmetry_y = get_symmetries(current_player, data_augmentation)
+    return ACTION_POLICY_INDEX[symmetry_x][symmetry_y][action_id]
+
+
+def get_action_ids_policy_indexes(action_ids, current_player, data_augmentation=False):
+    symmetry_x, symmetry_y = get_symmetries(current_player, data_augmentation)
+    return ACTION_ID_POLICY_INDEX_TABLE[int(symmetry_x), int(symmetry_y), action_ids]
+
+
 def get_none_action_policy(current_player, data_augmentation=False):
     policy = torch.zeros((58, 10, 9))
     # return policy.to(DEVICE)
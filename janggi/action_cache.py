@@ -0,0 +1,58 @@
+from collections import OrderedDict
+from threading import Lock
+
+from janggi.parameters import ACTION_CACHE_SIZE
+
+
+class ActionCache:
+    # Legal moves keyed by (position hash, side to move), with a least recently used eviction.
+    # The values must not be modified, so that they can be shared between boards.
+
+    def __init__(self, max_size=ACTION_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, zobrist_hash, color):
+        key = (zobrist_hash, color)
+        with self._lock:
+            actions = self._entries.get(key)
+            if actions is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+        return actions
+
+    def put(self, zobrist_hash, color, actions):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[(zobrist_hash, color)] = actions
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_hit_rate(self):
+        total = self.hits + self.misses
+        if total == 0:
+            return 0.0
+        return self.hits / total
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __str__(self):
+        return "Action cache: size %d/%d, hits %d, misses %d, hit rate %.3f, evictions %d" % (
+            len(self), self.max_size, self.hits, self.misses, self.get_hit_rate(), self.evictions)
+
+
+# Shared by all the boards of a process, which bounds the memory used for the legal moves
+ACTION_CACHE = ActionCache()
@@ -1,84 +1,138 @@
 import itertools
 import math
+from array import array
 
+import numpy as np
 import torch
 
 from janggi.action import Action
-from janggi.parameters import MAX_REPETITIONS
+from janggi.action_cache import ACTION_CACHE
+from janggi.move_tables import N_SQUARES, is_attacked, get_sensitive_squares
 from janggi.piece import Soldier, Cannon, General, Chariot, Elephant, Horse, Guard
+from janggi.position import encode_position, decode_position
+from janggi.repetitions import RepetitionHistory
 from janggi.utils import BOARD_HEIGHT, BOARD_WIDTH, Color
+from janggi.zobrist import ZOBRIST_KEYS
+
+# Offset of the occupancy plane of each signed piece code, blue pieces first. Negative codes use negative indexing.
+CODE_TO_PLANE = [0] * 15
+for _code in range(1, 8):
+    CODE_TO_PLANE[_code] = (_code - 1) * N_SQUARES
+    CODE_TO_PLANE[-_code] = (_code + 6) * N_SQUARES
+
+# Piece class of each code minus one, and index of each lower case character of the string representation
+PIECE_CLASSES = [Soldier, Cannon, General, Chariot, Elephant, Horse, Guard]
+CHAR_TO_INDEX = {char: index for index, char in enumerate("sckrehg")}
 
 
 UCI_USI_REPR = True
 
+# From the FEN letters to the ones of the string representation, and from the digits to empty squares
+FEN_TRANSLATION = str.maketrans({**{str(i): "." * i for i in range(10)},
+                                 "p": "s", "P": "S", "b": "e", "B": "E", "n": "h", "N": "H", "a": "g", "A": "G"})
+
 
 class Board:
 
     def __init__(self, start_blue="yang", start_red="yang"):
         self.board = [[None for _ in range(BOARD_WIDTH)] for _ in range(BOARD_HEIGHT)]
-        self._str = [["." for _ in range(BOARD_WIDTH)] for _ in range(BOARD_HEIGHT)]
-        self._str_sub = ["".join(x) for x in self._str]
+        # Flat copy of the piece codes, used by the attack tables
+        self._codes = [0] * N_SQUARES
+        # Occupancy planes viewed from blue, kept up to date by set through a flat memoryview
+        self._planes = np.zeros((7 * 2, BOARD_HEIGHT, BOARD_WIDTH), dtype=np.float32)
+        self._planes_flat = memoryview(self._planes.reshape(-1))
+        self.zobrist_hash = 0
         self._blue_general = None
         self._red_general = None
         self.start_blue = start_blue
         self.start_red = start_red
         self._initialize_pieces()
-        self._current_action_cache_node = ActionCacheNode(None)
+        # Piece captured by each applied action, None when nothing was captured
+        self._undo_stack = []
         self._blue_pieces = []
         self._red_pieces = []
         self._initialise_pieces_per_color()
-        self.previous_boards = dict()
-        self.previous_boards[str(self)] = 1
+        self._history = RepetitionHistory(self.zobrist_hash)
+
+    def clone(self):
+        # Copies the position, its history and the captured pieces
+        board = Board.__new__(Board)
+        copies = dict()
+
+        def copy_piece(piece):
+            if piece is None:
+                return None
+            if piece not in copies:
+                piece_copy = type(piece)(piece.x, piece.y, piece.color, board)
+                piece_copy.is_alive = piece.is_alive
+                copies[piece] = piece_copy
+            return copies[piece]
+
+        board.start_blue = self.start_blue
+        board.start_red = self.start_red
+        board.board = [[copy_piece(piece) for piece in line] for line in self.board]
+        board._codes = list(self._codes)
+        board._planes = self._planes.copy()
+        board._planes_flat = memoryview(board._planes.reshape(-1))
+        board.zobrist_hash = self.zobrist_hash
+        board._blue_pieces = [copy_piece(piece) for piece in self._blue_pieces]
+        board._red_pieces = [copy_piece(piece) for piece in self._red_pieces]
+        board._blue_general = copy_piece(self._blue_general)
+        board._red_general = copy_piece(self._red_general)
+        board._scores = dict(self._scores)
+        board._undo_stack = [copy_piece(piece) for piece in self._undo_stack]
+        board._history = self._history.copy()
+        return board
 
     @classmethod
     def from_string(cls, string):
-        board = Board()
-        board.board = [[None for _ in range(BOARD_WIDTH)] for _ in range(BOARD_HEIGHT)]
-        board._str = [["." for _ in range(BOARD_WIDTH)] for _ in range(BOARD_HEIGHT)]
+        codes = [0] * N_SQUARES
         string = string.strip()
         for x, line in enumerate(string.splitlines()):
             line = line.strip()
             for y, char in enumerate(line):
                 if char == ".":
                     continue
+                code = CHAR_TO_INDEX[char.lower()] + 1
                 if char.islower():
-                    color = Color.RED
-                else:
-                    color = Color.BLUE
-                char = char.lower()
-                if char == "k":
-                    board.set(x, y, General(x, y, color, board))
-                elif char == "c":
-                    board.set(x, y, Cannon(x, y, color, board))
-                elif char == "r":
-                    board.set(x, y, Chariot(x, y, color, board))
-                elif char == "h":
-                    board.set(x, y, Horse(x, y, color, board))
-                elif char == "e":
-                    board.set(x, y, Elephant(x, y, color, board))
-                elif char == "g":
-                    board.set(x, y, Guard(x, y, color, board))
-                elif char == "s":
-                    board.set(x, y, Soldier(x, y, color, board))
+                    code = -code
+                codes[x * BOARD_WIDTH + y] = code
+        return Board._from_codes(codes)
+
+    @classmethod
+    def from_bytes(cls, data):
+        codes, _, _, start_blue, start_red = decode_position(data)
+        return Board._from_codes(codes, start_blue, start_red)
+
+    def to_bytes(self, current_player, n_rounds):
+        return encode_position(array("b", self._codes), current_player, n_rounds, self.start_blue, self.start_red)
+
+    @classmethod
+    def _from_codes(cls, codes, start_blue="yang", start_red="yang"):
+        # Builds a board without history from the piece codes, without placing the starting pieces first
+        board = Board.__new__(Board)
+        board.board = [[None for _ in range(BOARD_WIDTH)] for _ in range(BOARD_HEIGHT)]
+        board._codes = [0] * N_SQUARES
+        board._planes = np.zeros((7 * 2, BOARD_HEIGHT, BOARD_WIDTH), dtype=np.float32)
+        board._planes_flat = memoryview(board._planes.reshape(-1))
+        board.zobrist_hash = 0
+        board._blue_general = None
+        board._red_general = None
+        board.start_blue = start_blue
+        board.start_red = start_red
+        for square, code in enumerate(codes):
+            if code != 0:
+                x, y = divmod(square, BOARD_WIDTH)
+                color = Color.BLUE if code > 0 else Color.RED
+                board.set(x, y, PIECE_CLASSES[abs(code) - 1](x, y, color, board))
+        board._undo_stack = []
         board._initialise_pieces_per_color()
+        board._history = RepetitionHistory(board.zobrist_hash)
         return board
 
     @classmethod
     def from_fen(cls, fen):
-        fen = fen.replace("--", "- -")
-        string = fen.split(" ")[0].strip()
-        string = "\n".join(string.split("/")[::-1])
-        string = string.replace("p", "s")
-        string = string.replace("P", "S")
-        string = string.replace("b", "e")
-        string = string.replace("B", "E")
-        string = string.replace("n", "h")
-        string = string.replace("N", "H")
-        string = string.replace("a", "g")
-        string = string.replace("A", "G")
-        for i in range(10):
-            string = string.replace(str(i), "." * i)
-        return Board.from_string(string)
+        return Board.from_string(fen_to_string(fen))
 
     def to_fen(self, current_player, n_rounds):
         board = []
@@ -121,12 +175,22 @@ class Board:
                         self._red_pieces.append(value)
                         if isinstance(value, General):
                             self._red_general = value
+        # Material of each side, kept up to date on captures. Red starts with 1.5 points of compensation.
+        self._scores = {Color.BLUE: sum(piece.get_points() for piece in self._blue_pieces),
+                        Color.RED: 1.5 + sum(piece.get_points() for piece in self._red_pieces)}
+
+    def count_repetitions(self, zobrist_hash=None):
+        if zobrist_hash is None:
+            zobrist_hash = self.zobrist_hash
+        return self._history.count(zobrist_hash)
+
+    def has_repetitions(self):
+        # When False, the legal moves do not depend on the moves played before
+        return self._history.has_repetitions()
 
     def invalidate_action_cache(self, action=None):
-        if action is None:
-            self._current_action_cache_node = ActionCacheNode(None)
-        else:
-            self._current_action_cache_node.parent = None
+        # The legal moves are kept in ACTION_CACHE, which is bounded, so there is nothing to free
+        pass
 
     def _initialize_pieces(self):
         self._initialize_soldiers()
@@ -206,7 +270,10 @@ class Board:
             self.set(6, y, Soldier(6, y, Color.RED, self))
 
     def __str__(self):
-        return "\n".join(self._str_sub) + "\n"
+        rows = []
+        for x in range(BOARD_HEIGHT):
+            rows.append("".join(["." if value is None else repr(value) for value in self.board[x]]))
+        return "\n".join(rows) + "\n"
 
     def __repr__(self):
         if UCI_USI_REPR:
@@ -227,24 +294,42 @@ class Board:
         return "\n".join(representation) + "\n"
 
     def __hash__(self):
-        return hash(str(self))
+        return self.zobrist_hash
 
     def __eq__(self, other):
-        return str(self) == str(other)
+        return self.zobrist_hash == other.zobrist_hash
 
     @staticmethod
     def is_in(x, y):
         return 0 <= x < BOARD_HEIGHT and 0 <= y < BOARD_WIDTH
 
     def get_actions(self, color):
-        # Check if in cache
-        if color == Color.RED:
-            if self._current_action_cache_node.next_actions_red is not None:
-                return self._current_action_cache_node.next_actions_red
-        else:
-            if self._current_action_cache_node.next_actions_blue is not None:
-                return self._current_action_cache_node.next_actions_blue
+        # The cached moves ignore the repetitions, which depend on the history and not only on the position
+        actions = ACTION_CACHE.get(self.zobrist_hash, color)
+        if actions is None:
+            actions = self._get_legal_actions(color)
+            ACTION_CACHE.put(self.zobrist_hash, color, actions)
+        repeated_hashes = self._history.get_repeated_hashes()
+        if repeated_hashes:
+            actions = self._filter_repetitions(actions, repeated_hashes)
+        if not actions:
+            return [Action(0, 0, 0, 0)]
+        return actions
 
+    def _filter_repetitions(self, actions, repeated_hashes):
+        codes = self._codes
+        zobrist_hash = self.zobrist_hash
+        filtered_actions = []
+        for action in actions:
+            square_from = action.x_from * BOARD_WIDTH + action.y_from
+            square_to = action.x_to * BOARD_WIDTH + action.y_to
+            keys = ZOBRIST_KEYS[codes[square_from]]
+            next_hash = zobrist_hash ^ keys[square_from] ^ keys[square_to] ^ ZOBRIST_KEYS[codes[square_to]][square_to]
+            if next_hash not in repeated_hashes:
+                filtered_actions.append(action)
+        return filtered_actions
+
+    def _get_legal_actions(self, color):
         if color == Color.BLUE:
             pieces = self._blue_pieces
         else:
@@ -257,115 +342,90 @@ class Board:
         unfiltered_actions = list(itertools.chain(*actions_list))
 
         if color == Color.BLUE:
-            other_pieces = self._red_pieces
             general = self._blue_general
         else:
-            other_pieces = self._blue_pieces
             general = self._red_general
-        potential_threads = [piece
-                             for piece in other_pieces
-                             if piece.is_potentially_threatening(general.x, general.y)]
-        # Exclude actions creating a check
-        filtered_actions = []
+        other_color = Color(-color.value)
+        general_square = general.x * BOARD_WIDTH + general.y
+        # Computed once: a move touching none of the sensitive squares keeps the check status of the position
+        is_in_check = is_attacked(self._codes, general_square, other_color)
+        sensitive_squares = get_sensitive_squares(self._codes, general_square, other_color)
+        # Moves are probed on the code mirror only, without touching the pieces
+        codes = self._codes
+        actions = []
         for action in unfiltered_actions:
-            self.apply_action(action)
-            if self.previous_boards.get(str(self), 0) >= MAX_REPETITIONS:
-                self.reverse_action(action)
-                continue
-            if action.x_to == general.x and action.y_to == general.y:
-                # If we are the general, we have no choice
-                if not self.is_check(color):
-                    filtered_actions.append(action)
+            square_from = action.x_from * BOARD_WIDTH + action.y_from
+            square_to = action.x_to * BOARD_WIDTH + action.y_to
+            is_general_move = square_from == general_square
+            is_sensitive = sensitive_squares[square_from] or sensitive_squares[square_to]
+            if is_general_move or is_sensitive:
+                value = codes[square_from]
+                eaten = codes[square_to]
+                codes[square_to] = value
+                codes[square_from] = 0
+                if is_general_move:
+                    # If we are the general, we have no choice
+                    is_legal = not is_attacked(codes, square_to, other_color)
+                else:
+                    is_legal = not is_attacked(codes, general_square, other_color)
+                codes[square_from] = value
+                codes[square_to] = eaten
             else:
-                found = False
-                for potential_thread in potential_threads:
-                    if not potential_thread.is_alive:
-                        continue
-                    other_actions = potential_thread.get_actions()
-                    for other_action in other_actions:
-                        if other_action.x_to == general.x and other_action.y_to == general.y:
-                            found = True
-                            break
-                    if found:
-                        break
-                if not found:
-                    filtered_actions.append(action)
-
-            self.reverse_action(action)
-        actions = filtered_actions
-        if not actions:
-            actions.append(Action(0, 0, 0, 0))
-
-        # Put in cache
-        if color == Color.RED:
-            self._current_action_cache_node.next_actions_red = actions
-        else:
-            self._current_action_cache_node.next_actions_blue = actions
-
+                is_legal = not is_in_check
+            if is_legal:
+                actions.append(action)
         return actions
 
     def is_finished(self, color, last_action=None):
         score = self.get_score(color)
+        last_is_capture = bool(self._undo_stack) and self._undo_stack[-1] is not None
         return score == 0 or \
-               (score < 20 and last_action is not None and last_action.eaten is None) or \
+               (score < 20 and last_action is not None and not last_is_capture) or \
                not self._blue_general.is_alive or \
                not self._red_general.is_alive
 
+    def get_action_ids(self, color):
+        return array("H", [action.get_id() for action in self.get_actions(color)])
+
     def is_check(self, color):
         if color == Color.BLUE:
-            king_x = self._blue_general.x
-            king_y = self._blue_general.y
-            other_pieces = self._red_pieces
+            general = self._blue_general
         else:
-            king_x = self._red_general.x
-            king_y = self._red_general.y
-            other_pieces = self._blue_pieces
-        for piece in other_pieces:
-            if not piece.is_alive or not piece.is_potentially_threatening(king_x, king_y):
-                continue
-            actions = piece.get_actions()
-            for action in actions:
-                if action.x_to == king_x and action.y_to == king_y:
-                    return True
-        return False
+            general = self._red_general
+        return is_attacked(self._codes, general.x * BOARD_WIDTH + general.y, Color(-color.value))
 
     def apply_action(self, action):
-        self._set_current_action_cache_node_from_next(action)
-
         if action is None:
             # We do nothing
+            self._undo_stack.append(None)
             return
 
-        self._apply_move(action)
-        board_str = str(self)
-        self.previous_boards[board_str] = self.previous_boards.get(board_str, 0) + 1
+        eaten = self._apply_move(action)
+        self._undo_stack.append(eaten)
+        self._history.push(self.zobrist_hash, eaten is not None)
 
     def _apply_move(self, action):
+        # Returns the captured piece
         if action.is_pass():
-            return
+            return None
         piece_from = self.get(action.x_from, action.y_from)
         piece_from.x = action.x_to
         piece_from.y = action.y_to
-        action.eaten = self.get(action.x_to, action.y_to)
-        if action.eaten is not None:
-            action.eaten.is_alive = False
+        eaten = self.get(action.x_to, action.y_to)
+        if eaten is not None:
+            eaten.is_alive = False
+            self._scores[eaten.color] -= eaten.get_points()
         self.set(action.x_to, action.y_to, piece_from)
         self.set(action.x_from, action.y_from, None)
-
-    def _set_current_action_cache_node_from_next(self, action):
-        if action not in self._current_action_cache_node.next_nodes:
-            temp = ActionCacheNode(self._current_action_cache_node)
-            self._current_action_cache_node.next_nodes[action] = temp
-            self._current_action_cache_node = temp
-        else:
-            self._current_action_cache_node = self._current_action_cache_node.next_nodes[action]
+        return eaten
 
     def reverse_action(self, action):
-        board_str = str(self)
-        self.previous_boards[board_str] = self.previous_boards.get(board_str, 0) - 1
-        self._current_action_cache_node = self._current_action_cache_node.parent
+        eaten = self._undo_stack.pop()
+        if action is None:
+            return
+        self._history.pop()
 
-        if action is None or action.is_pass():
+        if action.is_pass():
             # We do nothing
             return
 
@@ -373,22 +433,13 @@ class Board:
         dest_value.x = action.x_from
         dest_value.y = action.y_from
         self.set(action.x_from, action.y_from, dest_value)
-        self.set(action.x_to, action.y_to, action.eaten)
-        if action.eaten is not None:
-            action.eaten.is_alive = True
-        action.eaten = None
+        self.set(action.x_to, action.y_to, eaten)
+        if eaten is not None:
+            eaten.is_alive = True
+            self._scores[eaten.color] += eaten.get_points()
 
     def get_score(self, color):
-        if color == Color.BLUE:
-            score = 0
-            pieces = self._blue_pieces
-        else:
-            score = 1.5
-            pieces = self._red_pieces
-        for piece in pieces:
-            if piece.is_alive:
-                score += piece.get_points()
-        return score
+        return self._scores[color]
 
     def get(self, x, y, reverse=False):
         if reverse:
@@ -398,32 +449,42 @@ class Board:
         return self.board[x][y]
 
     def set(self, x, y, new_value):
-        self.board[x][y] = new_value
-        if new_value is None:
-            self._str[x][y] = "."
+        old_value = self.board[x][y]
+        square = x * BOARD_WIDTH + y
+        if old_value is not None:
+            self.zobrist_hash ^= ZOBRIST_KEYS[old_value.code][square]
+            self._planes_flat[CODE_TO_PLANE[old_value.code] + square] = 0.0
+        if new_value is not None:
+            self.zobrist_hash ^= ZOBRIST_KEYS[new_value.code][square]
+            self._planes_flat[CODE_TO_PLANE[new_value.code] + square] = 1.0
+            self._codes[square] = new_value.code
         else:
-            self._str[x][y] = repr(new_value)
-        self._str_sub[x] = "".join(self._str[x])
+            self._codes[square] = 0
+        self.board[x][y] = new_value
 
     def get_features(self, color, n_round, data_augmentation=False):
-        is_reversed = color != Color.BLUE
         # 7 pieces, for two colors, + one plan color + one plan number played
-        features = torch.zeros((7 * 2 + 2, BOARD_HEIGHT, BOARD_WIDTH))
-        for x in range(BOARD_HEIGHT):
-            for y in range(BOARD_WIDTH):
-                if data_augmentation:
-                    new_y = BOARD_WIDTH - 1 - y
-                else:
-                    new_y = y
-                current = self.get(x, new_y, is_reversed)
-                if current is None:
-                    continue
-                features[current.get_index() + 7 * (current.color != color), x, y] = 1
-        if color == Color.RED:
-            features[7 * 2, :, :] = 1
-        features[7 * 2 + 1, :, :] = n_round
-        # features = features.to(DEVICE)
-        return features
+        if color == Color.BLUE:
+            own_planes = self._planes[:7]
+            other_planes = self._planes[7:]
+        else:
+            own_planes = self._planes[7:, ::-1, ::-1]
+            other_planes = self._planes[:7, ::-1, ::-1]
+        if data_augmentation:
+            own_planes = own_planes[:, :, ::-1]
+            other_planes = other_planes[:, :, ::-1]
+        features = np.empty((7 * 2 + 2, BOARD_HEIGHT, BOARD_WIDTH), dtype=np.float32)
+        features[:7] = own_planes
+        features[7:14] = other_planes
+        features[7 * 2] = color == Color.RED
+        features[7 * 2 + 1] = n_round
+        return torch.from_numpy(features)
+
+
+def fen_to_string(fen):
+    fen = fen.replace("--", "- -")
+    rows = fen.split(" ")[0].strip().split("/")[::-1]
+    return "\n".join(rows).translate(FEN_TRANSLATION)
 
 
 def get_action_piece(piece):
@@ -436,13 +497,3 @@ def is_repetition(previous_actions, current_action):
            current_action == previous_actions[-8] and \
            previous_actions[-1] == previous_actions[-5] and \
            previous_actions[-5] == previous_actions[-9]
-
-
-class ActionCacheNode:
-
-    def __init__(self, parent, next_actions_blue=None,
-                 next_actions_red=None):
-        self.parent = parent
-        self.next_nodes = dict()
-        self.next_actions_blue = next_actions_blue
-        self.next_actions_red = next_actions_red
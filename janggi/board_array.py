@@ -0,0 +1,315 @@
+import math
+from array import array
+
+import numpy as np
+
+from janggi.action import SQUARES_TO_ACTION_ID, PASS_ACTION_ID, INTERNED_ACTIONS
+from janggi.board import fen_to_string
+from janggi.grid import POINTS, compute_features, get_pseudo_moves, get_legal_moves
+from janggi.move_tables import N_SQUARES, EMPTY, SOLDIER, CANNON, GENERAL, CHARIOT, ELEPHANT, HORSE, GUARD, \
+    PIECE_TYPES, to_square, is_in, is_attacked
+from janggi.position import encode_position, decode_position
+from janggi.repetitions import RepetitionHistory
+from janggi.utils import BOARD_HEIGHT, BOARD_WIDTH, Color
+from janggi.zobrist import ZOBRIST_KEYS
+
+
+UCI_USI_REPR = True
+
+CODE_TO_CHAR = {0: "."}
+for _code, _char in zip(PIECE_TYPES, "SCKREHG"):
+    CODE_TO_CHAR[_code] = _char
+    CODE_TO_CHAR[-_code] = _char.lower()
+CHAR_TO_CODE = {char: code for code, char in CODE_TO_CHAR.items()}
+
+CODE_TO_FEN = {}
+for _code, _char in zip(PIECE_TYPES, "PCKRBNA"):
+    CODE_TO_FEN[_code] = _char
+    CODE_TO_FEN[-_code] = _char.lower()
+
+
+class ArrayBoard:
+    # Same interface as janggi.board.Board, but the position is a flat int8 grid of piece codes with the squares of
+    # each piece type, the moves being generated by janggi.grid as for MultiBoard
+
+    def __init__(self, start_blue="yang", start_red="yang"):
+        self._grid = array("b", bytes(N_SQUARES))
+        self._pieces = {Color.BLUE: [[] for _ in range(len(PIECE_TYPES) + 1)],
+                        Color.RED: [[] for _ in range(len(PIECE_TYPES) + 1)]}
+        self._undo_stack = []
+        # Material of each side, red starts with 1.5 points of compensation
+        self._scores = {Color.BLUE: 0, Color.RED: 1.5}
+        self.zobrist_hash = 0
+        self.start_blue = start_blue
+        self.start_red = start_red
+        self._initialize_pieces()
+        self._history = RepetitionHistory(self.zobrist_hash)
+
+    def clone(self):
+        board = ArrayBoard.__new__(ArrayBoard)
+        board._grid = array("b", self._grid)
+        board._pieces = {color: [list(squares) for squares in pieces] for color, pieces in self._pieces.items()}
+        board._undo_stack = list(self._undo_stack)
+        board._scores = dict(self._scores)
+        board.zobrist_hash = self.zobrist_hash
+        board.start_blue = self.start_blue
+        board.start_red = self.start_red
+        board._history = self._history.copy()
+        return board
+
+    @classmethod
+    def from_string(cls, string):
+        board = ArrayBoard()
+        for x in range(BOARD_HEIGHT):
+            for y in range(BOARD_WIDTH):
+                board.set(x, y, EMPTY)
+        string = string.strip()
+        for x, line in enumerate(string.splitlines()):
+            line = line.strip()
+            for y, char in enumerate(line):
+                if char != ".":
+                    board.set(x, y, CHAR_TO_CODE[char])
+        board._history = RepetitionHistory(board.zobrist_hash)
+        return board
+
+    @classmethod
+    def from_fen(cls, fen):
+        return ArrayBoard.from_string(fen_to_string(fen))
+
+    @classmethod
+    def from_bytes(cls, data):
+        codes, _, _, start_blue, start_red = decode_position(data)
+        board = ArrayBoard(start_blue, start_red)
+        for square in range(N_SQUARES):
+            if board._grid[square] != codes[square]:
+                x, y = divmod(square, BOARD_WIDTH)
+                board.set(x, y, codes[square])
+        board._history = RepetitionHistory(board.zobrist_hash)
+        return board
+
+    def to_bytes(self, current_player, n_rounds):
+        return encode_position(self._grid, current_player, n_rounds, self.start_blue, self.start_red)
+
+    def to_fen(self, current_player, n_rounds):
+        board = []
+        for x in range(BOARD_HEIGHT - 1, -1, -1):
+            empty_squares = 0
+            res_temp = ""
+            for y in range(BOARD_WIDTH):
+                current = self._grid[to_square(x, y)]
+                if current == EMPTY:
+                    empty_squares += 1
+                else:
+                    if empty_squares != 0:
+                        res_temp += str(empty_squares)
+                        empty_squares = 0
+                    res_temp += CODE_TO_FEN[current]
+            if empty_squares != 0:
+                res_temp += str(empty_squares)
+            board.append(res_temp)
+        res = "/".join(board) + " "
+        if current_player == Color.BLUE:
+            res += "w"
+        else:
+            res += "b"
+        n_rounds_final = 1 + int(math.ceil(n_rounds / 2))
+        res += " - - 0 " + str(n_rounds_final)
+        return res
+
+    def _initialize_pieces(self):
+        for y in range(0, BOARD_WIDTH, 2):
+            self.set(3, y, SOLDIER)
+            self.set(6, y, -SOLDIER)
+        for y in [1, 7]:
+            self.set(2, y, CANNON)
+            self.set(7, y, -CANNON)
+        self.set(1, 4, GENERAL)
+        self.set(8, 4, -GENERAL)
+        for y in [0, 8]:
+            self.set(0, y, CHARIOT)
+            self.set(9, y, -CHARIOT)
+        for y in [3, 5]:
+            self.set(0, y, GUARD)
+            self.set(9, y, -GUARD)
+        if self.start_blue == "won" or self.start_blue == "sang":
+            self.set(0, 1, HORSE)
+            self.set(0, 2, ELEPHANT)
+        else:
+            self.set(0, 1, ELEPHANT)
+            self.set(0, 2, HORSE)
+        if self.start_blue == "won" or self.start_blue == "gwee":
+            self.set(0, 6, ELEPHANT)
+            self.set(0, 7, HORSE)
+        else:
+            self.set(0, 6, HORSE)
+            self.set(0, 7, ELEPHANT)
+        if self.start_red == "won" or self.start_red == "gwee":
+            self.set(9, 1, -HORSE)
+            self.set(9, 2, -ELEPHANT)
+        else:
+            self.set(9, 1, -ELEPHANT)
+            self.set(9, 2, -HORSE)
+        if self.start_red == "won" or self.start_red == "sang":
+            self.set(9, 6, -ELEPHANT)
+            self.set(9, 7, -HORSE)
+        else:
+            self.set(9, 6, -HORSE)
+            self.set(9, 7, -ELEPHANT)
+
+    def invalidate_action_cache(self, action=None):
+        # There is no action cache on this board
+        pass
+
+    def __str__(self):
+        rows = []
+        for x in range(BOARD_HEIGHT):
+            rows.append("".join([CODE_TO_CHAR[code] for code in self._grid[x * BOARD_WIDTH:(x + 1) * BOARD_WIDTH]]))
+        return "\n".join(rows) + "\n"
+
+    def __repr__(self):
+        if UCI_USI_REPR:
+            representation = ["-- " + " ".join(["a", "b", "c", "d", "e", "f", "g", "h", "i"])]
+        else:
+            representation = ["-" + " " + " ".join([str(x) for x in range(9)])]
+        for x in range(BOARD_HEIGHT - 1, -1, -1):
+            to_print = [CODE_TO_CHAR[self.get(x, y)] for y in range(BOARD_WIDTH)]
+            if UCI_USI_REPR:
+                representation.append(str(x + 1).zfill(2) + " " + " ".join(to_print))
+            else:
+                representation.append(str(x) + " " + " ".join(to_print))
+        return "\n".join(representation) + "\n"
+
+    def __hash__(self):
+        return self.zobrist_hash
+
+    def __eq__(self, other):
+        return self.zobrist_hash == other.zobrist_hash
+
+    @staticmethod
+    def is_in(x, y):
+        return is_in(x, y)
+
+    def get(self, x, y, reverse=False):
+        if reverse:
+            x = BOARD_HEIGHT - 1 - x
+            y = BOARD_WIDTH - 1 - y
+        return self._grid[to_square(x, y)]
+
+    def set(self, x, y, new_value):
+        square = to_square(x, y)
+        old_value = self._grid[square]
+        if old_value != EMPTY:
+            color = Color.BLUE if old_value > 0 else Color.RED
+            self._pieces[color][abs(old_value)].remove(square)
+            self._scores[color] -= POINTS[abs(old_value)]
+        if new_value != EMPTY:
+            color = Color.BLUE if new_value > 0 else Color.RED
+            self._pieces[color][abs(new_value)].append(square)
+            self._scores[color] += POINTS[abs(new_value)]
+        self._grid[square] = new_value
+        self.zobrist_hash ^= ZOBRIST_KEYS[old_value][square] ^ ZOBRIST_KEYS[new_value][square]
+
+    def get_general_square(self, color):
+        generals = self._pieces[color][GENERAL]
+        if generals:
+            return generals[0]
+        return None
+
+    def _get_pseudo_moves(self, color):
+        return get_pseudo_moves(self._grid, self._pieces[color], color)
+
+    def _get_legal_moves(self, color):
+        return get_legal_moves(self._grid, self._pieces[color], color, self.zobrist_hash,
+                               self._history.get_repeated_hashes())
+
+    def get_actions(self, color):
+        actions = [INTERNED_ACTIONS[SQUARES_TO_ACTION_ID[square_from * N_SQUARES + square_to]]
+                   for square_from, square_to in self._get_legal_moves(color)]
+        if not actions:
+            actions.append(INTERNED_ACTIONS[PASS_ACTION_ID])
+        return actions
+
+    def get_action_ids(self, color):
+        action_ids = array("H", [SQUARES_TO_ACTION_ID[square_from * N_SQUARES + square_to]
+                                 for square_from, square_to in self._get_legal_moves(color)])
+        if not action_ids:
+            action_ids.append(PASS_ACTION_ID)
+        return action_ids
+
+    def is_check(self, color):
+        general = self.get_general_square(color)
+        if general is None:
+            return False
+        return is_attacked(self._grid, general, Color(-color.value))
+
+    def is_finished(self, color, last_action=None):
+        score = self.get_score(color)
+        last_is_capture = bool(self._undo_stack) and self._undo_stack[-1] != EMPTY
+        return score == 0 or \
+               (score < 20 and last_action is not None and not last_is_capture) or \
+               not self._pieces[Color.BLUE][GENERAL] or \
+               not self._pieces[Color.RED][GENERAL]
+
+    def count_repetitions(self, zobrist_hash=None):
+        if zobrist_hash is None:
+            zobrist_hash = self.zobrist_hash
+        return self._history.count(zobrist_hash)
+
+    def has_repetitions(self):
+        # When False, the legal moves do not depend on the moves played before
+        return self._history.has_repetitions()
+
+    def get_score(self, color):
+        return self._scores[color]
+
+    def apply_action(self, action):
+        if action is None or action.is_pass():
+            self._undo_stack.append(EMPTY)
+        else:
+            self._undo_stack.append(self._move(to_square(action.x_from, action.y_from),
+                                               to_square(action.x_to, action.y_to)))
+        if action is None:
+            return
+        self._history.push(self.zobrist_hash, self._undo_stack[-1] != EMPTY)
+
+    def reverse_action(self, action):
+        if action is not None:
+            self._history.pop()
+        eaten = self._undo_stack.pop()
+        if action is None or action.is_pass():
+            return
+        self._unmove(to_square(action.x_from, action.y_from), to_square(action.x_to, action.y_to), eaten)
+
+    def _move(self, square_from, square_to):
+        grid = self._grid
+        value = grid[square_from]
+        eaten = grid[square_to]
+        if eaten != EMPTY:
+            color = Color.BLUE if eaten > 0 else Color.RED
+            self._pieces[color][abs(eaten)].remove(square_to)
+            self._scores[color] -= POINTS[abs(eaten)]
+        squares = self._pieces[Color.BLUE if value > 0 else Color.RED][abs(value)]
+        squares[squares.index(square_from)] = square_to
+        grid[square_to] = value
+        grid[square_from] = EMPTY
+        keys = ZOBRIST_KEYS[value]
+        self.zobrist_hash ^= keys[square_from] ^ keys[square_to] ^ ZOBRIST_KEYS[eaten][square_to]
+        return eaten
+
+    def _unmove(self, square_from, square_to, eaten):
+        grid = self._grid
+        value = grid[square_to]
+        squares = self._pieces[Color.BLUE if value > 0 else Color.RED][abs(value)]
+        squares[squares.index(square_to)] = square_from
+        grid[square_from] = value
+        grid[square_to] = eaten
+        if eaten != EMPTY:
+            color = Color.BLUE if eaten > 0 else Color.RED
+            self._pieces[color][abs(eaten)].append(square_to)
+            self._scores[color] += POINTS[abs(eaten)]
+        keys = ZOBRIST_KEYS[value]
+        self.zobrist_hash ^= keys[square_from] ^ keys[square_to] ^ ZOBRIST_KEYS[eaten][square_to]
+
+    def get_features(self, color, n_round, data_augmentation=False):
+        grid = np.frombuffer(self._grid, dtype=np.int8).reshape(BOARD_HEIGHT, BOARD_WIDTH)
+        return compute_features(grid, color, n_round, data_augmentation)
@@ -31,6 +31,12 @@ class BoardFish:
                                                                                            left_blue, right_blue)
         self.previous_moves = []
 
+    @classmethod
+    def from_fen(cls, fen):
+        board = BoardFish()
+        board.initial_fen = fen
+        return board
+
     def get_actions(self, color):
         moves = pyffish.legal_moves("janggi", self.initial_fen, self.previous_moves)
         return [Action.from_uci_usi(move) for move in moves]
@@ -48,6 +54,9 @@ class BoardFish:
         else:
             self.previous_moves.append(None)
 
+    def reverse_action(self, action):
+        self.previous_moves.pop()
+
     def get_features(self, color):
         self.previous_moves.pop()
 
@@ -0,0 +1,148 @@
+from array import array
+
+import numpy as np
+import torch
+
+from janggi.action import INTERNED_ACTIONS, PASS_ACTION_ID, SQUARES_TO_ACTION_ID, ACTION_SQUARES_FROM, \
+    ACTION_SQUARES_TO
+from janggi.board import Board
+from janggi.grid import POINTS, PLANE_CODES, get_legal_moves
+from janggi.move_tables import N_SQUARES, EMPTY, GENERAL, PIECE_TYPES
+from janggi.position import encode_position
+from janggi.repetitions import RepetitionHistory
+from janggi.utils import BOARD_HEIGHT, BOARD_WIDTH, Color
+from janggi.zobrist import ZOBRIST_KEYS
+
+# Same content as ZOBRIST_KEYS, negative codes included through negative indexing
+ZOBRIST_TABLE = np.array(ZOBRIST_KEYS, dtype=np.uint64)
+POINTS_TABLE = np.array(POINTS, dtype=np.float32)
+
+
+def get_color_index(colors):
+    # Row of the scores of each color: 0 for blue, 1 for red
+    return (np.asarray(colors) < 0).astype(np.int64)
+
+
+class MultiBoard:
+    # N positions played in lockstep, with the piece codes of all the boards stacked in one (N, 90) int8 array.
+    # Colors are given as arrays of 1 (blue) and -1 (red), moves as arrays of action ids.
+
+    def __init__(self, boards):
+        # boards is a list of Board, which are copied
+        self.n_boards = len(boards)
+        self.grids = np.stack([np.frombuffer(board.to_bytes(Color.BLUE, 0), dtype=np.int8, count=N_SQUARES)
+                               for board in boards])
+        self.zobrist_hashes = np.array([board.zobrist_hash for board in boards], dtype=np.uint64)
+        self.scores = np.array([[board.get_score(Color.BLUE) for board in boards],
+                                [board.get_score(Color.RED) for board in boards]], dtype=np.float32)
+        self.start_blue = [board.start_blue for board in boards]
+        self.start_red = [board.start_red for board in boards]
+        # Whether each board has played a move, and whether its last move was a capture
+        self.has_played = np.zeros(self.n_boards, dtype=bool)
+        self.last_is_capture = np.zeros(self.n_boards, dtype=bool)
+        self._histories = [RepetitionHistory(board.zobrist_hash) for board in boards]
+        # One entry per batched move: indexes of the boards, squares, captured codes and previous flags
+        self._undo_stack = []
+
+    @classmethod
+    def from_formations(cls, n_boards, start_blue="yang", start_red="yang"):
+        return MultiBoard([Board(start_blue, start_red) for _ in range(n_boards)])
+
+    def get_board(self, index):
+        # Board with the position of one board, without its history
+        return Board.from_bytes(encode_position(self.grids[index].tobytes(), Color.BLUE, 0, self.start_blue[index],
+                                                self.start_red[index]))
+
+    def _get_indexes(self, indexes):
+        if indexes is None:
+            return np.arange(self.n_boards)
+        return np.asarray(indexes, dtype=np.int64)
+
+    def apply_actions(self, action_ids, indexes=None):
+        # Plays action_ids[i] on the board indexes[i], on all the boards by default
+        indexes = self._get_indexes(indexes)
+        action_ids = np.asarray(action_ids, dtype=np.int64)
+        moving = action_ids != PASS_ACTION_ID
+        boards = indexes[moving]
+        squares_from = ACTION_SQUARES_FROM[action_ids[moving]]
+        squares_to = ACTION_SQUARES_TO[action_ids[moving]]
+        values = self.grids[boards, squares_from]
+        eaten = self.grids[boards, squares_to]
+        self._undo_stack.append((indexes, boards, squares_from, squares_to, eaten,
+                                 self.has_played[indexes].copy(), self.last_is_capture[indexes].copy()))
+        self.grids[boards, squares_to] = values
+        self.grids[boards, squares_from] = EMPTY
+        self.zobrist_hashes[boards] ^= ZOBRIST_TABLE[values, squares_from] ^ ZOBRIST_TABLE[values, squares_to] \
+            ^ ZOBRIST_TABLE[eaten, squares_to]
+        self.scores[get_color_index(eaten), boards] -= POINTS_TABLE[np.abs(eaten)]
+        self.has_played[indexes] = True
+        self.last_is_capture[indexes] = False
+        self.last_is_capture[boards] = eaten != EMPTY
+        is_capture = self.last_is_capture
+        for index in indexes.tolist():
+            self._histories[index].push(int(self.zobrist_hashes[index]), bool(is_capture[index]))
+
+    def reverse_actions(self):
+        # Undoes the last call to apply_actions
+        indexes, boards, squares_from, squares_to, eaten, has_played, last_is_capture = self._undo_stack.pop()
+        values = self.grids[boards, squares_to]
+        self.grids[boards, squares_from] = values
+        self.grids[boards, squares_to] = eaten
+        self.zobrist_hashes[boards] ^= ZOBRIST_TABLE[values, squares_from] ^ ZOBRIST_TABLE[values, squares_to] \
+            ^ ZOBRIST_TABLE[eaten, squares_to]
+        self.scores[get_color_index(eaten), boards] += POINTS_TABLE[np.abs(eaten)]
+        self.has_played[indexes] = has_played
+        self.last_is_capture[indexes] = last_is_capture
+        for index in indexes.tolist():
+            self._histories[index].pop()
+
+    def get_action_ids(self, colors, indexes=None):
+        # Legal action ids of each board, as in Board.get_action_ids
+        indexes = self._get_indexes(indexes)
+        colors = np.broadcast_to(np.asarray(colors), indexes.shape)
+        all_action_ids = []
+        for index, color in zip(indexes.tolist(), colors.tolist()):
+            grid = array("b", self.grids[index].tobytes())
+            color = Color(color)
+            pieces = [[] for _ in range(len(PIECE_TYPES) + 1)]
+            sign = color.value
+            for square in np.flatnonzero(self.grids[index] * sign > 0).tolist():
+                pieces[abs(grid[square])].append(square)
+            moves = get_legal_moves(grid, pieces, color, int(self.zobrist_hashes[index]),
+                                    self._histories[index].get_repeated_hashes())
+            action_ids = array("H", [SQUARES_TO_ACTION_ID[square_from * N_SQUARES + square_to]
+                                     for square_from, square_to in moves])
+            if not action_ids:
+                action_ids.append(PASS_ACTION_ID)
+            all_action_ids.append(action_ids)
+        return all_action_ids
+
+    def get_actions(self, colors, indexes=None):
+        return [[INTERNED_ACTIONS[action_id] for action_id in action_ids]
+                for action_ids in self.get_action_ids(colors, indexes)]
+
+    def get_scores(self, colors):
+        return self.scores[get_color_index(colors), np.arange(self.n_boards)]
+
+    def is_finished(self, colors):
+        # Same rules as Board.is_finished with the last move played on each board
+        scores = self.get_scores(colors)
+        has_generals = (self.grids == GENERAL).any(axis=1) & (self.grids == -GENERAL).any(axis=1)
+        return (scores == 0) | ((scores < 20) & self.has_played & ~self.last_is_capture) | ~has_generals
+
+    def get_features(self, colors, n_rounds, data_augmentation=False):
+        # (N, 16, 10, 9) input of the network, each board seen from the player given in colors
+        colors = np.asarray(colors).reshape(-1, 1, 1)
+        grids = self.grids.reshape(-1, BOARD_HEIGHT, BOARD_WIDTH)
+        grids = np.where(colors > 0, grids, -grids[:, ::-1, ::-1])
+        if data_augmentation:
+            grids = grids[:, :, ::-1]
+        features = np.zeros((self.n_boards, 7 * 2 + 2, BOARD_HEIGHT, BOARD_WIDTH), dtype=np.float32)
+        np.equal(grids[:, None], PLANE_CODES, out=features[:, :7])
+        np.equal(grids[:, None], -PLANE_CODES, out=features[:, 7:14])
+        features[:, 7 * 2] = colors < 0
+        features[:, 7 * 2 + 1] = np.asarray(n_rounds, dtype=np.float32).reshape(-1, 1, 1)
+        return torch.from_numpy(features)
+
+    def __len__(self):
+        return self.n_boards
@@ -1,10 +1,10 @@
 import json
 import time
 
-from janggi.action import Action
-from janggi.board import Board
+from janggi.action import Action, ACTION_TO_UCI_USI
 from janggi.player import RandomPlayer
-from janggi.utils import Color
+from janggi.position import decode_position
+from janggi.utils import Color, get_board_class
 
 
 class Game:
@@ -19,11 +19,13 @@ class Game:
         self.board = board
         self.round = 0
         self.actions = []
+        # (total_N, visits by move) of the search before each action, when recorded during the game
+        self.statistics = []
 
     @classmethod
     def from_fen(cls, player_blue, player_red, fen):
         fen = fen.replace("--", "- -")
-        board = Board.from_fen(fen)
+        board = get_board_class().from_fen(fen)
         game = Game(player_blue, player_red, board)
         fen_split = fen.split(" ")
         if fen_split[1] == "w":
@@ -37,6 +39,17 @@ class Game:
         # fen_split[-2] contains number of half moves
         return game
 
+    @classmethod
+    def from_bytes(cls, player_blue, player_red, data):
+        board = get_board_class().from_bytes(data)
+        game = Game(player_blue, player_red, board)
+        _, game.current_player, game.round, _, _ = decode_position(data)
+        game.starting_fen = board.to_fen(game.current_player, game.round)
+        return game
+
+    def to_bytes(self):
+        return self.board.to_bytes(self.current_player, self.round)
+
     @classmethod
     def from_uci_usi(cls, player_blue, player_red, uci_usi):
         uci_usi = uci_usi.replace("--", "- -")
@@ -51,7 +64,7 @@ class Game:
 
     def to_uci_usi(self):
         if self.starting_fen is None:
-            board_temp = Board(self.board.start_blue, self.board.start_red)
+            board_temp = type(self.board)(self.board.start_blue, self.board.start_red)
             fen = board_temp.to_fen(Color.BLUE, 0)
         else:
             fen = self.starting_fen
@@ -76,7 +89,6 @@ class Game:
             new_action = self.get_next_action()
             self.apply_action(new_action)
             self.start_thinking()
-            # print(new_action, new_action.eaten)
             # print(self.current_player, self.board.get_score(self.current_player))
             # print(time.time() - begin_time)
             if print_board:
@@ -191,10 +203,23 @@ class Game:
             res.append("XXXX")
         return "\n".join(res) + "\n"
 
+    def record_statistics(self, mcts_node):
+        # Called before applying each action, so that to_json does not need the tree of the whole game
+        self.statistics.append(self._get_statistics(mcts_node))
+
+    @staticmethod
+    def _get_statistics(mcts_node):
+        visits = dict()
+        if mcts_node.action_ids is not None:
+            for action_id, value in zip(mcts_node.action_ids.tolist(), mcts_node.visits.tolist()):
+                visits[ACTION_TO_UCI_USI[action_id]] = value
+        return mcts_node.total_N, visits
+
     def to_json(self, mcts_node=None):
+        # The visits come from the recorded statistics, else from the tree of mcts_node
         result = dict()
         if self.starting_fen is None:
-            result["initial_fen"] = Board(self.board.start_blue, self.board.start_red).to_fen(Color.BLUE, 0)
+            result["initial_fen"] = type(self.board)(self.board.start_blue, self.board.start_red).to_fen(Color.BLUE, 0)
         else:
             result["initial_fen"] = self.starting_fen
         winner = self.get_winner()
@@ -204,24 +229,30 @@ class Game:
             result["winner"] = "RED"
         result["moves"] = []
         current_node = mcts_node
-        for action in self.actions:
+        for i, action in enumerate(self.actions):
             temp = dict()
             temp["played"] = action.to_uci_usi()
-            if current_node is not None:
-                temp["total_N"] = current_node.total_N
-                temp["N"] = dict()
-                for action_mcts, value in current_node.N.items():
-                    temp["N"][action_mcts.to_uci_usi()] = value
-                if action in current_node.next_nodes:
-                    current_node = current_node.next_nodes[action]
-                else:
-                    current_node = None
+            if i < len(self.statistics):
+                temp["total_N"], temp["N"] = self.statistics[i]
+            elif current_node is not None:
+                temp["total_N"], temp["N"] = self._get_statistics(current_node)
             else:
                 temp["total_N"] = 1
                 temp["N"] = {action.to_uci_usi(): 1}
+            # Also down the moves with statistics, so that the tree gives the visits of the moves after them
+            if current_node is not None:
+                current_node = current_node.get_child(action)
             result["moves"].append(temp)
         return json.dumps(result)
 
+    def clone(self, player_blue=None, player_red=None):
+        game = Game(player_blue or RandomPlayer(Color.BLUE), player_red or RandomPlayer(Color.RED), self.board.clone())
+        game.current_player = self.current_player
+        game.starting_fen = self.starting_fen
+        game.round = self.round
+        game.actions = list(self.actions)
+        game.statistics = list(self.statistics)
+        return game
+
     def fake_copy(self):
-        game_uci_usi = self.to_uci_usi()
-        return Game.from_uci_usi(RandomPlayer(Color.BLUE), RandomPlayer(Color.RED), game_uci_usi)
+        return self.clone()
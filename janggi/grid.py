@@ -0,0 +1,138 @@
+import numpy as np
+import torch
+
+from janggi.move_tables import N_SQUARES, EMPTY, SOLDIER, CANNON, GENERAL, CHARIOT, ELEPHANT, HORSE, GUARD, \
+    RAYS, DIAGONALS, HORSE_MOVES, ELEPHANT_MOVES, FORTRESS_MOVES, SOLDIER_MOVES, is_attacked, \
+    get_sensitive_squares
+from janggi.position import decode_position
+from janggi.utils import BOARD_HEIGHT, BOARD_WIDTH, Color
+from janggi.zobrist import ZOBRIST_KEYS
+
+# Move generation and features on flat int8 grids of piece codes, the representation of MultiBoard and of the
+# encoded positions (see janggi.position)
+
+# Material of each piece code
+POINTS = [0, 2, 7, 0, 13, 3, 5, 3]
+
+PLANE_CODES = np.arange(1, 8, dtype=np.int8).reshape(7, 1, 1)
+
+
+def compute_features(grid, color, n_round, data_augmentation=False):
+    # grid is a (10, 9) int8 array of piece codes, viewed from blue
+    if color == Color.RED:
+        grid = -grid[::-1, ::-1]
+    if data_augmentation:
+        grid = grid[:, ::-1]
+    features = np.zeros((7 * 2 + 2, BOARD_HEIGHT, BOARD_WIDTH), dtype=np.float32)
+    np.equal(grid, PLANE_CODES, out=features[:7])
+    np.equal(grid, -PLANE_CODES, out=features[7:14])
+    if color == Color.RED:
+        features[7 * 2, :, :] = 1
+    features[7 * 2 + 1, :, :] = n_round
+    return torch.from_numpy(features)
+
+
+def get_position_features(data, data_augmentation=False):
+    # Features of an encoded position (see janggi.position), read directly from the bytes
+    _, color, n_round, _, _ = decode_position(data)
+    grid = np.frombuffer(data, dtype=np.int8, count=N_SQUARES).reshape(BOARD_HEIGHT, BOARD_WIDTH)
+    return compute_features(grid, color, n_round, data_augmentation)
+
+
+def get_pseudo_moves(grid, pieces, color):
+    # pieces holds the squares of each piece type of color
+    sign = color.value
+    moves = []
+    for square in pieces[SOLDIER]:
+        for square_to in SOLDIER_MOVES[color][square]:
+            if grid[square_to] * sign <= 0:
+                moves.append((square, square_to))
+    for square in pieces[CHARIOT]:
+        for ray in RAYS[square]:
+            for square_to in ray:
+                value = grid[square_to]
+                if value == EMPTY:
+                    moves.append((square, square_to))
+                else:
+                    if value * sign < 0:
+                        moves.append((square, square_to))
+                    break
+        for square_next, square_after in DIAGONALS[square]:
+            value = grid[square_next]
+            if value * sign < 0:
+                moves.append((square, square_next))
+            elif value == EMPTY:
+                moves.append((square, square_next))
+                if square_after is not None and grid[square_after] * sign <= 0:
+                    moves.append((square, square_after))
+    for square in pieces[CANNON]:
+        for ray in RAYS[square]:
+            screen = False
+            for square_to in ray:
+                value = grid[square_to]
+                if value == EMPTY:
+                    if screen:
+                        moves.append((square, square_to))
+                elif value == CANNON or value == -CANNON:
+                    break
+                elif not screen:
+                    screen = True
+                else:
+                    if value * sign < 0:
+                        moves.append((square, square_to))
+                    break
+        for square_next, square_after in DIAGONALS[square]:
+            if square_after is not None and grid[square_next] != EMPTY and grid[square_after] * sign <= 0:
+                moves.append((square, square_after))
+    for square in pieces[HORSE]:
+        for leg, square_to in HORSE_MOVES[square]:
+            if grid[leg] == EMPTY and grid[square_to] * sign <= 0:
+                moves.append((square, square_to))
+    for square in pieces[ELEPHANT]:
+        for leg_first, leg_second, square_to in ELEPHANT_MOVES[square]:
+            if grid[leg_first] == EMPTY and grid[leg_second] == EMPTY and grid[square_to] * sign <= 0:
+                moves.append((square, square_to))
+    fortress_moves = FORTRESS_MOVES[color]
+    for piece_type in [GENERAL, GUARD]:
+        for square in pieces[piece_type]:
+            for square_to in fortress_moves[square]:
+                if grid[square_to] * sign <= 0:
+                    moves.append((square, square_to))
+    return moves
+
+
+def get_legal_moves(grid, pieces, color, zobrist_hash, repeated_hashes):
+    # Moves as (square from, square to), grid being modified and restored while probing. As in Board, only the
+    # moves of the general and the ones touching a sensitive square are probed, the others keep the check status.
+    other_color = Color(-color.value)
+    generals = pieces[GENERAL]
+    general = generals[0] if generals else None
+    if general is not None:
+        is_in_check = is_attacked(grid, general, other_color)
+        sensitive_squares = get_sensitive_squares(grid, general, other_color)
+    moves = []
+    for square_from, square_to in get_pseudo_moves(grid, pieces, color):
+        if repeated_hashes:
+            value = grid[square_from]
+            keys = ZOBRIST_KEYS[value]
+            next_hash = zobrist_hash ^ keys[square_from] ^ keys[square_to] ^ ZOBRIST_KEYS[grid[square_to]][square_to]
+            if next_hash in repeated_hashes:
+                continue
+        if general is None:
+            is_legal = True
+        elif square_from == general or sensitive_squares[square_from] or sensitive_squares[square_to]:
+            value = grid[square_from]
+            eaten = grid[square_to]
+            grid[square_to] = value
+            grid[square_from] = EMPTY
+            if square_from == general:
+                is_legal = not is_attacked(grid, square_to, other_color)
+            else:
+                is_legal = not is_attacked(grid, general, other_color)
+            grid[square_from] = value
+            grid[square_to] = eaten
+        else:
+            is_legal = not is_in_check
+        if is_legal:
+            moves.append((square_from, square_to))
+    return moves
@@ -0,0 +1,231 @@
+from janggi.utils import BOARD_HEIGHT, BOARD_WIDTH, Color
+
+N_SQUARES = BOARD_HEIGHT * BOARD_WIDTH
+
+# Piece codes, equal to Piece.get_index() + 1. Blue pieces are positive, red pieces are negative.
+EMPTY = 0
+SOLDIER = 1
+CANNON = 2
+GENERAL = 3
+CHARIOT = 4
+ELEPHANT = 5
+HORSE = 6
+GUARD = 7
+
+PIECE_TYPES = [SOLDIER, CANNON, GENERAL, CHARIOT, ELEPHANT, HORSE, GUARD]
+
+FORTRESS_CENTERS = [(1, 4), (8, 4)]
+
+
+def to_square(x, y):
+    return x * BOARD_WIDTH + y
+
+
+def is_in(x, y):
+    return 0 <= x < BOARD_HEIGHT and 0 <= y < BOARD_WIDTH
+
+
+def _build_rays():
+    rays = []
+    for x in range(BOARD_HEIGHT):
+        for y in range(BOARD_WIDTH):
+            rays.append([[to_square(x_to, y) for x_to in range(x + 1, BOARD_HEIGHT)],
+                         [to_square(x_to, y) for x_to in range(x - 1, -1, -1)],
+                         [to_square(x, y_to) for y_to in range(y + 1, BOARD_WIDTH)],
+                         [to_square(x, y_to) for y_to in range(y - 1, -1, -1)]])
+    return rays
+
+
+def _build_diagonals():
+    # For each square, list of (next, after_next) along a fortress diagonal. after_next is None from the center.
+    diagonals = [[] for _ in range(N_SQUARES)]
+    for center_x, center_y in FORTRESS_CENTERS:
+        center = to_square(center_x, center_y)
+        for x_diff in [-1, 1]:
+            for y_diff in [-1, 1]:
+                corner = to_square(center_x + x_diff, center_y + y_diff)
+                opposite = to_square(center_x - x_diff, center_y - y_diff)
+                diagonals[corner].append((center, opposite))
+                diagonals[center].append((corner, None))
+    return diagonals
+
+
+def _build_horse_moves():
+    moves = [[] for _ in range(N_SQUARES)]
+    for x in range(BOARD_HEIGHT):
+        for y in range(BOARD_WIDTH):
+            for fix_x, fix_y in [(-1, 1), (-1, -1), (1, 1), (1, -1)]:
+                if is_in(x + 2 * fix_x, y + fix_y):
+                    moves[to_square(x, y)].append((to_square(x + fix_x, y),
+                                                   to_square(x + 2 * fix_x, y + fix_y)))
+                if is_in(x + fix_x, y + 2 * fix_y):
+                    moves[to_square(x, y)].append((to_square(x, y + fix_y),
+                                                   to_square(x + fix_x, y + 2 * fix_y)))
+    return moves
+
+
+def _build_elephant_moves():
+    moves = [[] for _ in range(N_SQUARES)]
+    for x in range(BOARD_HEIGHT):
+        for y in range(BOARD_WIDTH):
+            for fix_x, fix_y in [(-1, 1), (-1, -1), (1, 1), (1, -1)]:
+                if is_in(x + 3 * fix_x, y + 2 * fix_y):
+                    moves[to_square(x, y)].append((to_square(x + fix_x, y),
+                                                   to_square(x + 2 * fix_x, y + fix_y),
+                                                   to_square(x + 3 * fix_x, y + 2 * fix_y)))
+                if is_in(x + 2 * fix_x, y + 3 * fix_y):
+                    moves[to_square(x, y)].append((to_square(x, y + fix_y),
+                                                   to_square(x + fix_x, y + 2 * fix_y),
+                                                   to_square(x + 2 * fix_x, y + 3 * fix_y)))
+    return moves
+
+
+def _build_fortress_moves(x_min, x_max, y_min, y_max):
+    moves = [[] for _ in range(N_SQUARES)]
+    mid_x = x_min + 1
+    mid_y = y_min + 1
+    for x in range(BOARD_HEIGHT):
+        for y in range(BOARD_WIDTH):
+            for x_diff in [-1, 0, 1]:
+                for y_diff in [-1, 0, 1]:
+                    if x_diff == 0 and y_diff == 0:
+                        continue
+                    if (x == mid_x or y == mid_y) and not (x == mid_x and y == mid_y):
+                        if x_diff != 0 and y_diff != 0:
+                            continue
+                    new_x = x + x_diff
+                    new_y = y + y_diff
+                    if x_min <= new_x <= x_max and y_min <= new_y <= y_max:
+                        moves[to_square(x, y)].append(to_square(new_x, new_y))
+    return moves
+
+
+def _build_soldier_moves(color):
+    moves = [[] for _ in range(N_SQUARES)]
+    for x in range(BOARD_HEIGHT):
+        for y in range(BOARD_WIDTH):
+            current = moves[to_square(x, y)]
+            if y - 1 >= 0:
+                current.append(to_square(x, y - 1))
+            if y + 1 < BOARD_WIDTH:
+                current.append(to_square(x, y + 1))
+            top = x + color.value
+            if not 0 <= top < BOARD_HEIGHT:
+                continue
+            current.append(to_square(top, y))
+            if color == Color.BLUE:
+                is_mid = x == 8 and y == 4
+                can_diagonal_right = is_mid or (x == 7 and y == 3)
+                can_diagonal_left = is_mid or (x == 7 and y == 5)
+            else:
+                is_mid = x == 1 and y == 4
+                can_diagonal_right = (x == 2 and y == 3) or is_mid
+                can_diagonal_left = (x == 2 and y == 5) or is_mid
+            if can_diagonal_right:
+                current.append(to_square(top, y + 1))
+            if can_diagonal_left:
+                current.append(to_square(top, y - 1))
+    return moves
+
+
+def _reverse_moves(moves):
+    # Index the moves by destination, keeping the other squares of the move
+    reverse = [[] for _ in range(N_SQUARES)]
+    for square, square_moves in enumerate(moves):
+        for move in square_moves:
+            if isinstance(move, tuple):
+                reverse[move[-1]].append(move[:-1] + (square,))
+            else:
+                reverse[move].append(square)
+    return reverse
+
+
+RAYS = _build_rays()
+DIAGONALS = _build_diagonals()
+HORSE_MOVES = _build_horse_moves()
+ELEPHANT_MOVES = _build_elephant_moves()
+FORTRESS_MOVES = {Color.BLUE: _build_fortress_moves(0, 2, 3, 5),
+                  Color.RED: _build_fortress_moves(7, 9, 3, 5)}
+SOLDIER_MOVES = {Color.BLUE: _build_soldier_moves(Color.BLUE),
+                 Color.RED: _build_soldier_moves(Color.RED)}
+HORSE_ATTACKS = _reverse_moves(HORSE_MOVES)
+ELEPHANT_ATTACKS = _reverse_moves(ELEPHANT_MOVES)
+SOLDIER_ATTACKS = {Color.BLUE: _reverse_moves(SOLDIER_MOVES[Color.BLUE]),
+                   Color.RED: _reverse_moves(SOLDIER_MOVES[Color.RED])}
+
+SQUARE_TO_XY = [(square // BOARD_WIDTH, square % BOARD_WIDTH) for square in range(N_SQUARES)]
+
+
+def is_attacked(grid, square, color):
+    # Whether the pieces of color can capture on square. Generals and guards never threaten.
+    sign = color.value
+    chariot = CHARIOT * sign
+    cannon = CANNON * sign
+    for ray in RAYS[square]:
+        screen = False
+        for square_from in ray:
+            value = grid[square_from]
+            if value == EMPTY:
+                continue
+            if not screen:
+                if value == chariot:
+                    return True
+                if value == CANNON or value == -CANNON:
+                    break
+                screen = True
+            else:
+                if value == cannon:
+                    return True
+                break
+    for square_next, square_after in DIAGONALS[square]:
+        value_next = grid[square_next]
+        if value_next == chariot:
+            return True
+        if square_after is not None:
+            value_after = grid[square_after]
+            if value_next == EMPTY and value_after == chariot:
+                return True
+            if value_next != EMPTY and value_after == cannon:
+                return True
+    horse = HORSE * sign
+    for leg, square_from in HORSE_ATTACKS[square]:
+        if grid[square_from] == horse and grid[leg] == EMPTY:
+            return True
+    elephant = ELEPHANT * sign
+    for leg_first, leg_second, square_from in ELEPHANT_ATTACKS[square]:
+        if grid[square_from] == elephant and grid[leg_first] == EMPTY and grid[leg_second] == EMPTY:
+            return True
+    soldier = SOLDIER * sign
+    for square_from in SOLDIER_ATTACKS[color][square]:
+        if grid[square_from] == soldier:
+            return True
+    return False
+
+
+def get_sensitive_squares(grid, square, color):
+    # Flags the squares whose occupancy can change whether color attacks square: the attackers, the horse and
+    # elephant legs, and along the lines everything up to the second piece, which covers pinned pieces and
+    # cannon screens. A move touching none of them cannot change the attack status.
+    sensitive = bytearray(N_SQUARES)
+    for ray in RAYS[square]:
+        n_pieces = 0
+        for square_from in ray:
+            sensitive[square_from] = 1
+            if grid[square_from] != EMPTY:
+                n_pieces += 1
+                if n_pieces == 2:
+                    break
+    for square_next, square_after in DIAGONALS[square]:
+        sensitive[square_next] = 1
+        if square_after is not None:
+            sensitive[square_after] = 1
+    for leg, square_from in HORSE_ATTACKS[square]:
+        sensitive[leg] = 1
+        sensitive[square_from] = 1
+    for leg_first, leg_second, square_from in ELEPHANT_ATTACKS[square]:
+        sensitive[leg_first] = 1
+        sensitive[leg_second] = 1
+        sensitive[square_from] = 1
+    for square_from in SOLDIER_ATTACKS[color][square]:
+        sensitive[square_from] = 1
+    return sensitive
@@ -82,6 +82,20 @@ parser.add_argument("--parallel_mcts", default=False, type=str2bool, required=Fa
                     help="Whether or not to run a parallel MCTS")
 parser.add_argument("--n_threads_mcts", default=1, type=int, required=False,
                     help="Number of threads when running MCTS in parallel. Needs --parallel_mcts True")
+parser.add_argument("--mcts_batch_size", default=1, type=int, required=False,
+                    help="Number of leaves collected with virtual losses and evaluated together by the network. "
+                         "1 evaluates the leaves one by one.")
+parser.add_argument("--transposition_table_size", default=0, type=int, required=False,
+                    help="Maximum number of positions in the transposition table of the MCTS, "
+                         "so that a position reached by different move orders is evaluated once. 0 disables it.")
+parser.add_argument("--mcts_max_nodes", default=0, type=int, required=False,
+                    help="Maximum number of nodes created by the MCTS of a game. When it is reached, the search "
+                         "goes on without expanding new nodes. 0 for no limit.")
+parser.add_argument("--mcts_async_tasks", default=16, type=int, required=False,
+                    help="Number of simulations of the asyncio MCTS waiting for a predictor at the same time.")
+
+parser.add_argument("--array_board", default=False, type=str2bool, required=False,
+                    help="Whether or not to use the array-backed board engine instead of the piece-based one.")
 
 parser.add_argument("--n_processus", default=1, type=int, required=False,
                     help="Number of processus")
@@ -94,12 +108,31 @@ parser.add_argument("--n_iterations", default=100, type=int, required=False,
 parser.add_argument("--n_episodes", default=2, type=int, required=False,
                     help="Number of episodes.")
 
+parser.add_argument("--n_parallel_games", default=64, type=int, required=False,
+                    help="Number of games played at the same time by a batched self-play worker.")
+
 parser.add_argument("--train_on_all", default=False, type=str2bool, required=False,
                     help="Train on all generated games, not only the n_last_games. Done by chunks of n_last_games.")
 
 parser.add_argument("--train_new_model", default=False, type=str2bool, required=False,
                     help="Train a new model from scratch.")
 
+parser.add_argument("--action_cache_size", default=50000, type=int, required=False,
+                    help="The maximum number of positions whose legal moves are cached in each process.")
+
+parser.add_argument("--evaluation_cache_size", default=20000, type=int, required=False,
+                    help="The maximum number of positions whose network evaluation is cached in each process. "
+                         "0 disables the cache.")
+
+parser.add_argument("--perft_depth", default=2, type=int, required=False,
+                    help="The depth of the perft counts.")
+parser.add_argument("--perft_fen_file", default="", type=str, required=False,
+                    help="Games in the raw training format from which to take more perft positions.")
+parser.add_argument("--perft_n_fens", default=100, type=int, required=False,
+                    help="The number of positions sampled from the games of --perft_fen_file.")
+parser.add_argument("--perft_cross_check", default=False, type=str2bool, required=False,
+                    help="Whether to compare the legal moves with Fairy-Stockfish (needs pyffish).")
+
 args = parser.parse_args()
 
 STOCKFISH_LOCATION = args.stockfish_location  # 'D:/Downloads/fairy-stockfish-largeboard_x86-64.exe'
@@ -143,11 +176,26 @@ LOG_PRINT_FREQ = args.log_frequency
 BATCH_SIZE = args.batch_size
 PARALLEL_MCTS = args.parallel_mcts
 N_THREADS_MCTS = args.n_threads_mcts
+MCTS_BATCH_SIZE = args.mcts_batch_size
+MCTS_ASYNC_TASKS = args.mcts_async_tasks
+TRANSPOSITION_TABLE_SIZE = args.transposition_table_size
+MCTS_MAX_NODES = args.mcts_max_nodes
+
+ARRAY_BOARD = args.array_board
 
 BASE_ROOT_FILES = args.root_file_inference
 N_ITERATIONS = args.n_iterations
 N_PROCESSUS = args.n_processus
 N_EPISODES = args.n_episodes
+N_PARALLEL_GAMES = args.n_parallel_games
 
 TRAIN_ON_ALL = args.train_on_all
 TRAIN_NEW_MODEL = args.train_new_model
+
+ACTION_CACHE_SIZE = args.action_cache_size
+EVALUATION_CACHE_SIZE = args.evaluation_cache_size
+
+PERFT_DEPTH = args.perft_depth
+PERFT_FEN_FILE = args.perft_fen_file
+PERFT_N_FENS = args.perft_n_fens
+PERFT_CROSS_CHECK = args.perft_cross_check
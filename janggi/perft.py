@@ -0,0 +1,183 @@
+import random
+import time
+
+from janggi.action import Action
+from janggi.move_tables import N_SQUARES, GENERAL
+from janggi.position import decode_position
+from janggi.utils import Color, BOARD_WIDTH, get_board_class
+
+FORMATIONS = ["won", "sang", "yang", "gwee"]
+
+# Number of leaves at depth 1, 2 and 3 from each starting formation, blue to play.
+# A pass counts as a move when there is no legal move, as in get_actions.
+# The counts of PERFT_FORMATIONS and PERFT_FENS were computed with the piece-based Board of the first version of
+# the engine, before the move tables and the incremental updates. They agree with Fairy-Stockfish (pyffish 0.0.90,
+# see cross_check) except below the positions where the generals face each other, which Fairy-Stockfish treats as
+# bikjang and this engine does not: it finds 298 to 318 more leaves at depth 3 from the formations.
+PERFT_FORMATIONS = {
+    ("won", "won"): [31, 961, 30353],
+    ("won", "sang"): [31, 961, 30353],
+    ("won", "yang"): [31, 961, 30353],
+    ("won", "gwee"): [31, 961, 30353],
+    ("sang", "won"): [31, 961, 30506],
+    ("sang", "sang"): [31, 961, 30506],
+    ("sang", "yang"): [31, 961, 30506],
+    ("sang", "gwee"): [31, 961, 30506],
+    ("yang", "won"): [31, 961, 30659],
+    ("yang", "sang"): [31, 961, 30659],
+    ("yang", "yang"): [31, 961, 30659],
+    ("yang", "gwee"): [31, 961, 30659],
+    ("gwee", "won"): [31, 961, 30506],
+    ("gwee", "sang"): [31, 961, 30506],
+    ("gwee", "yang"): [31, 961, 30506],
+    ("gwee", "gwee"): [31, 961, 30506],
+}
+
+# Middle game positions, from a played game and from random games, and the number of leaves at depth 1 and 2.
+# The training games (data/game_data.txt and the pychess games) are not in the repository: perft.py samples more
+# positions from them with sample_fens and compares their moves with Fairy-Stockfish.
+PERFT_FENS = [
+    ("1bnaa1bn1/R8/5k1cr/1p2p1B1p/2p6/9/1PP2P2P/4CCN2/1N2K4/2BA1A2R w - - 0 1", [61, 293]),
+    ("1nb1ak3/3a5/r3b4/p1p2p1p1/7B1/PP5n1/P6PP/6CC1/3ARA2N/3Kc4 w - - 0 34", [24, 910]),
+    ("1n2ka3/3a2nb1/9/r5r1b/p1P1pp2P/6Pc1/PR3CP2/3A2CN1/3K4R/4A2cB w - - 0 38", [47, 2256]),
+    ("1nb4Cn/3a1a3/3k5/1ppp5/PPP3Ppp/9/1R7/N2KAB3/9/1R2A4 w - - 0 40", [42, 839]),
+    ("Cb3a1n1/r4a3/2rk5/3pc2Cb/pn3p1P1/1PPc1P1R1/2R3N2/2N6/3KA4/1B2A1B2 b - - 0 43", [40, 1912]),
+    ("rbna1anbr/9/1c1k3c1/pp3p2p/7p1/9/P1P1P1P1P/1CCN1K3/9/RB1A1ANBR w - - 0 6", [42, 1581]),
+    ("r1ba1anbr/5k3/nc5c1/pp1p4p/6p2/9/P1P1P1P1P/1C1KC4/R4A3/1BNA2NBR w - - 0 6", [41, 1165]),
+    ("rb1a1k3/1n3n3/4a1R2/2pp3p1/2p2R3/1C7/P2P1PP2/NC1K3c1/8r/2B1AABN1 b - - 0 36", [46, 1801]),
+    ("rnb6/3ank3/1c3a1cr/3p1b2p/p3pP3/P3P2CR/R1P3pP1/1C3K2N/9/1BNA1AB2 w - - 0 17", [43, 1375]),
+    ("3a2bn1/r3a4/r2kb4/pC6p/1n1pp1p1P/PP2c4/5P3/C8/2c2KN2/1NB1AAB2 b - - 0 39", [34, 625]),
+    ("1nbakab2/9/r1r5n/c8/3pC3p/p5p1P/2PP4R/1c1K1A1C1/2N2N3/1R1A2B2 b - - 0 37", [39, 1376]),
+    ("rnb3nbr/3aa4/3k3c1/p3pp2p/2p6/1C7/B1PP3PP/7C1/4K4/RN1A1ANBR b - - 0 10", [29, 977]),
+    ("3kaab1r/4r4/1c2b1nc1/5pn1p/1pp4P1/9/1P6P/9/RN1AK4/2BB1AN1R w - - 0 27", [37, 1534]),
+    ("rbna5/3kn1r2/3c1a3/p8/4bp1Cp/5Pp1P/1P5P1/3CKA3/1B7/1NB2A1NR b - - 0 23", [35, 992]),
+    ("3ka1nb1/4a1n2/4b3r/p1p4pp/1c2p2R1/5P1c1/P1P1P2P1/1C2K2C1/5A3/RNB1ANrB1 b - - 0 29", [47, 1668]),
+    ("2naa1nb1/9/3kC2c1/1p1b4r/1p2p1p1p/r3PP3/B1P3P2/3KA3N/R8/1NCA2B1c b - - 0 30", [51, 2370]),
+]
+
+
+def perft(board, color, depth):
+    if depth == 0:
+        return 1
+    actions = board.get_actions(color)
+    if depth == 1:
+        return len(actions)
+    other_color = Color(-color.value)
+    nodes = 0
+    for action in actions:
+        board.apply_action(action)
+        nodes += perft(board, other_color, depth - 1)
+        board.reverse_action(action)
+    return nodes
+
+
+def get_fen_color(fen):
+    if fen.split(" ")[1] == "w":
+        return Color.BLUE
+    return Color.RED
+
+
+def run_perft(board, color, depth):
+    # Returns the number of leaves and the number of nodes per second
+    begin_time = time.time()
+    nodes = perft(board, color, depth)
+    duration = time.time() - begin_time
+    return nodes, nodes / max(duration, 1e-9)
+
+
+def check_perft(depth, board_class=None, print_info=False):
+    # Compares the counts of the engine with the references. Returns the mismatches.
+    board_class = board_class or get_board_class()
+    mismatches = []
+    total_nodes = 0
+    begin_time = time.time()
+    positions = []
+    for (start_blue, start_red), counts in PERFT_FORMATIONS.items():
+        positions.append((start_blue + " " + start_red, board_class(start_blue, start_red), Color.BLUE, counts))
+    for fen, counts in PERFT_FENS:
+        positions.append((fen, board_class.from_fen(fen), get_fen_color(fen), counts))
+    for name, board, color, counts in positions:
+        if depth > len(counts):
+            continue
+        nodes, nodes_per_second = run_perft(board, color, depth)
+        total_nodes += nodes
+        if nodes != counts[depth - 1]:
+            mismatches.append((name, depth, nodes, counts[depth - 1]))
+        if print_info:
+            print(name, depth, nodes, int(nodes_per_second), sep="\t")
+    if print_info:
+        print("Total", total_nodes, int(total_nodes / max(time.time() - begin_time, 1e-9)), sep="\t")
+    return mismatches
+
+
+def are_generals_facing(board):
+    # Whether the two generals are on the same file with nothing between them
+    codes = decode_position(board.to_bytes(Color.BLUE, 0))[0]
+    generals = [square for square in range(N_SQUARES) if codes[square] == GENERAL or codes[square] == -GENERAL]
+    if len(generals) != 2 or generals[0] % BOARD_WIDTH != generals[1] % BOARD_WIDTH:
+        return False
+    return all(codes[square] == 0 for square in range(generals[0] + BOARD_WIDTH, generals[1], BOARD_WIDTH))
+
+
+def cross_check(board, board_fish, color, depth):
+    # Walks the tree of both engines together and returns the FENs where the legal moves differ.
+    # Passes are ignored, as Fairy-Stockfish allows them in every position. The positions where the generals face
+    # each other are not compared, nor the moves after them: Fairy-Stockfish applies the bikjang rule there.
+    if are_generals_facing(board):
+        return []
+    moves = {action for action in board.get_actions(color) if not action.is_pass()}
+    moves_fish = {action for action in board_fish.get_actions(color) if not action.is_pass()}
+    if moves != moves_fish:
+        return [board.to_fen(color, 0)]
+    if depth <= 1:
+        return []
+    other_color = Color(-color.value)
+    mismatches = []
+    for action in moves:
+        board.apply_action(action)
+        board_fish.apply_action(action)
+        mismatches += cross_check(board, board_fish, other_color, depth - 1)
+        board_fish.reverse_action(action)
+        board.reverse_action(action)
+    return mismatches
+
+
+def read_raw_fens(line_iterator, every=10):
+    # Reads games in the raw format of the training data (see Game.dumps) and returns a FEN every few moves
+    fens = []
+    board = None
+    color = Color.BLUE
+    n_round = 0
+    lines = []
+    for line in line_iterator:
+        line = line.strip()
+        if line == "":
+            board = None
+            lines = []
+            continue
+        lines.append(line)
+        if board is None:
+            if "/" in line:
+                board = get_board_class().from_fen(line)
+                color = get_fen_color(line)
+            elif len(lines) == 2:
+                board = get_board_class()(lines[0], lines[1])
+                color = Color.BLUE
+            n_round = 0
+            continue
+        if line == "XXXX":
+            action = None
+        else:
+            action = Action(int(line[0]), int(line[1]), int(line[2]), int(line[3]))
+        board.apply_action(action)
+        color = Color(-color.value)
+        n_round += 1
+        if n_round % every == 0:
+            fens.append(board.to_fen(color, n_round))
+    return fens
+
+
+def sample_fens(line_iterator, n_fens, every=10, seed=0):
+    # n_fens positions taken at random among the ones of read_raw_fens, the same ones for a given seed
+    fens = read_raw_fens(line_iterator, every)
+    return random.Random(seed).sample(fens, min(n_fens, len(fens)))
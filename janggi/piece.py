@@ -1,7 +1,8 @@
 # From https://stackoverflow.com/questions/287871/how-to-print-colored-text-in-python
 import janggi
 from janggi.utils import BOARD_HEIGHT, BOARD_WIDTH, Color
-from janggi.action import Action
+from janggi.action import INTERNED_ACTIONS, SQUARES_TO_ACTION_ID
+from janggi.move_tables import N_SQUARES, SOLDIER_MOVES, FORTRESS_MOVES, ELEPHANT_MOVES, HORSE_MOVES, to_square
 
 
 class bcolors:
@@ -24,10 +25,25 @@ class Piece:
         self.color = color
         self.board = board
         self.is_alive = True
+        # Signed code used by the array board and the position hash
+        self.code = (self.get_index() + 1) * color.value
 
     def get_actions(self):
         raise NotImplementedError
 
+    def _get_action(self, x_to, y_to):
+        # Shared instance from the action catalogue
+        return INTERNED_ACTIONS[SQUARES_TO_ACTION_ID[(self.x * BOARD_WIDTH + self.y) * N_SQUARES
+                                                     + x_to * BOARD_WIDTH + y_to]]
+
+    def _get_step_actions(self, squares_to):
+        # Keeps the destinations which are empty or occupied by an opponent
+        codes = self.board._codes
+        sign = self.color.value
+        offset = to_square(self.x, self.y) * N_SQUARES
+        return [INTERNED_ACTIONS[SQUARES_TO_ACTION_ID[offset + square_to]]
+                for square_to in squares_to if codes[square_to] * sign <= 0]
+
     def get_colored_str(self, value):
         if self.color == janggi.board.Color.BLUE:
             return bcolors.OKBLUE + str(value) + bcolors.ENDC
@@ -71,39 +87,7 @@ class Soldier(Piece):
             return "s"
 
     def get_actions(self):
-        actions = []
-        left = self.y - 1
-        if 0 <= left:
-            value_left = self.board.get(self.x, left)
-            if value_left is None or value_left.color != self.color:
-                actions.append(Action(self.x, self.y, self.x, left))
-        right = self.y + 1
-        if right < BOARD_WIDTH:
-            value_right = self.board.get(self.x, right)
-            if value_right is None or value_right.color != self.color:
-                actions.append(Action(self.x, self.y, self.x, right))
-        top = self.x + self.color.value
-        if 0 <= top < BOARD_HEIGHT:
-            value_top = self.board.get(top, self.y)
-            if value_top is None or value_top.color != self.color:
-                actions.append(Action(self.x, self.y, top, self.y))
-            if self.color == Color.BLUE:
-                is_mid = self.x == 8 and self.y == 4
-                can_diagonal_right = is_mid or (self.x == 7 and self.y == 3)
-                can_diagonal_left = is_mid or (self.x == 7 and self.y == 5)
-            else:
-                is_mid = self.x == 1 and self.y == 4
-                can_diagonal_right = (self.x == 2 and self.y == 3) or is_mid
-                can_diagonal_left = (self.x == 2 and self.y == 5) or is_mid
-            if can_diagonal_right:
-                value_top_right = self.board.get(top, right)
-                if value_top_right is None or value_top_right.color != self.color:
-                    actions.append(Action(self.x, self.y, top, right))
-            if can_diagonal_left:
-                value_top_left = self.board.get(top, left)
-                if value_top_left is None or value_top_left.color != self.color:
-                    actions.append(Action(self.x, self.y, top, left))
-        return actions
+        return self._get_step_actions(SOLDIER_MOVES[self.color][to_square(self.x, self.y)])
 
     def is_potentially_threatening(self, x_threat, y_threat):
         x_diff = abs(x_threat - self.x)
@@ -158,7 +142,7 @@ class Cannon(Piece):
                                   value.color != self.color
                 arrival_is_legal = (arrival_is_free or can_eat_arrival)
                 if arrival_is_legal:
-                    actions.append(Action(self.x, self.y, diff_center_x, diff_center_y))
+                    actions.append(self._get_action(diff_center_x, diff_center_y))
 
     def _get_actions_one_direction(self, actions, x_tos, y_tos):
         encounter_piece_jump = False
@@ -167,13 +151,13 @@ class Cannon(Piece):
                 value = self.board.get(x_to, y_to)
                 if value is None:
                     if encounter_piece_jump:
-                        actions.append(Action(self.x, self.y, x_to, y_to))
+                        actions.append(self._get_action(x_to, y_to))
                 elif value.get_index() == self.get_index():
                     return
                 elif not encounter_piece_jump:
                     encounter_piece_jump = True
                 elif value.color != self.color:
-                    actions.append(Action(self.x, self.y, x_to, y_to))
+                    actions.append(self._get_action(x_to, y_to))
                     return
                 else:
                     return
@@ -209,34 +193,7 @@ class General(Piece):
             return "k"
 
     def get_actions(self):
-        actions = []
-        if self.color == Color.BLUE:
-            self._get_action_per_fortress(actions, 0, 2, 3, 5)
-        else:
-            self._get_action_per_fortress(actions, 7, 9, 3, 5)
-        return actions
-
-    def _get_action_per_fortress(self, actions, x_min, x_max, y_min, y_max):
-        mid_x = x_min + 1
-        mid_y = y_min + 1
-        for x_diff in [-1, 0, 1]:
-            for y_diff in [-1, 0, 1]:
-                if x_diff == 0 and y_diff == 0:
-                    continue
-                if (self.x == mid_x or self.y == mid_y) and not (self.x == mid_x and self.y == mid_y):
-                    if x_diff != 0 and y_diff != 0:
-                        continue
-                new_x = self.x + x_diff
-                new_y = self.y + y_diff
-                is_in_fortress = x_min <= new_x <= x_max and y_min <= new_y <= y_max
-                if not is_in_fortress:
-                    continue
-                destination_is_legal = (self.board.get(new_x, new_y) is None or
-                                        self.board.get(new_x, new_y).color != self.color)
-                # will_be_check = any([action.x_to == new_x and action.y_to == new_y for action in
-                #                      self.board.get_actions(Color(-self.color.value), exclude_general=True)])
-                if destination_is_legal:  # and not will_be_check:
-                    actions.append(Action(self.x, self.y, new_x, new_y))
+        return self._get_step_actions(FORTRESS_MOVES[self.color][to_square(self.x, self.y)])
 
     def is_potentially_threatening(self, x_threat, y_threat):
         return False
@@ -276,9 +233,9 @@ class Chariot(Piece):
         for x_to in x_tos:
             value = self.board.get(x_to, y_to)
             if value is None:
-                actions.append(Action(self.x, self.y, x_to, y_to))
+                actions.append(self._get_action(x_to, y_to))
             elif value.color != self.color:
-                actions.append(Action(self.x, self.y, x_to, y_to))
+                actions.append(self._get_action(x_to, y_to))
                 return
             else:
                 return
@@ -287,9 +244,9 @@ class Chariot(Piece):
         for y_to in y_tos:
             value = self.board.get(x_to, y_to)
             if value is None:
-                actions.append(Action(self.x, self.y, x_to, y_to))
+                actions.append(self._get_action(x_to, y_to))
             elif value.color != self.color:
-                actions.append(Action(self.x, self.y, x_to, y_to))
+                actions.append(self._get_action(x_to, y_to))
                 return
             else:
                 return
@@ -310,7 +267,7 @@ class Chariot(Piece):
         new_y = center_y + y_diff
         value = self.board.get(new_x, new_y)
         if value is None or value.color != self.color:
-            actions.append(Action(self.x, self.y, new_x, new_y))
+            actions.append(self._get_action(new_x, new_y))
 
     def _get_diagonal_actions_sub(self, actions, center_x, center_y, x_diff, y_diff):
         is_in_diagonal_fortress = (self.x - x_diff == center_x and self.y - y_diff == center_y)
@@ -318,9 +275,9 @@ class Chariot(Piece):
             return
         center_fortress_is_occupied = self.board.get(center_x, center_y) is not None
         if center_fortress_is_occupied and self.board.get(center_x, center_y).color != self.color:
-            actions.append(Action(self.x, self.y, center_x, center_y))
+            actions.append(self._get_action(center_x, center_y))
         elif not center_fortress_is_occupied:
-            actions.append(Action(self.x, self.y, center_x, center_y))
+            actions.append(self._get_action(center_x, center_y))
             diff_center_x = center_x - x_diff
             diff_center_y = center_y - y_diff
             arrival_is_free = self.board.get(diff_center_x, diff_center_y) is None
@@ -328,7 +285,7 @@ class Chariot(Piece):
                               self.board.get(diff_center_x, diff_center_y).color != self.color
             arrival_is_legal = (arrival_is_free or can_eat_arrival)
             if arrival_is_legal:
-                actions.append(Action(self.x, self.y, diff_center_x, diff_center_y))
+                actions.append(self._get_action(diff_center_x, diff_center_y))
 
     def is_potentially_threatening(self, x_threat, y_threat):
         if self.x == x_threat or self.y == y_threat:
@@ -364,37 +321,15 @@ class Elephant(Piece):
             return "e"
 
     def get_actions(self):
+        codes = self.board._codes
+        sign = self.color.value
         actions = []
-        self._get_actions_sub(actions, -1, 1)
-        self._get_actions_sub(actions, -1, -1)
-        self._get_actions_sub(actions, 1, 1)
-        self._get_actions_sub(actions, 1, -1)
+        square = to_square(self.x, self.y)
+        for leg_first, leg_second, square_to in ELEPHANT_MOVES[square]:
+            if codes[square_to] * sign <= 0 and codes[leg_first] == 0 and codes[leg_second] == 0:
+                actions.append(INTERNED_ACTIONS[SQUARES_TO_ACTION_ID[square * N_SQUARES + square_to]])
         return actions
 
-    def _get_actions_sub(self, actions, fix_x, fix_y):
-        short_x = self.x + fix_x
-        long_x = self.x + 2 * fix_x
-        very_long_x = self.x + 3 * fix_x
-        short_y = self.y + fix_y
-        long_y = self.y + 2 * fix_y
-        very_long_y = self.y + 3 * fix_y
-
-        third_jump_ok = self.board.is_in(very_long_x, long_y) and (
-                self.board.get(very_long_x, long_y) is None or
-                self.board.get(very_long_x, long_y).color != self.color)
-        second_jump_ok = third_jump_ok and self.board.get(long_x, short_y) is None
-        first_jump_ok = second_jump_ok and self.board.get(short_x, self.y) is None
-        if first_jump_ok:
-            actions.append(Action(self.x, self.y, very_long_x, long_y))
-
-        third_jump_ok = self.board.is_in(long_x, very_long_y) and (
-                self.board.get(long_x, very_long_y) is None or
-                self.board.get(long_x, very_long_y).color != self.color)
-        second_jump_ok = third_jump_ok and self.board.get(short_x, long_y) is None
-        first_jump_ok = second_jump_ok and self.board.get(self.x, short_y) is None
-        if first_jump_ok:
-            actions.append(Action(self.x, self.y, long_x, very_long_y))
-
     def is_potentially_threatening(self, x_threat, y_threat):
         x_diff = abs(self.x - x_threat)
         y_diff = abs(self.y - y_threat)
@@ -425,32 +360,15 @@ class Horse(Piece):
             return "h"
 
     def get_actions(self):
+        codes = self.board._codes
+        sign = self.color.value
         actions = []
-        self._get_actions_sub(actions, -1, 1)
-        self._get_actions_sub(actions, -1, -1)
-        self._get_actions_sub(actions, 1, 1)
-        self._get_actions_sub(actions, 1, -1)
+        square = to_square(self.x, self.y)
+        for leg, square_to in HORSE_MOVES[square]:
+            if codes[square_to] * sign <= 0 and codes[leg] == 0:
+                actions.append(INTERNED_ACTIONS[SQUARES_TO_ACTION_ID[square * N_SQUARES + square_to]])
         return actions
 
-    def _get_actions_sub(self, actions, fix_x, fix_y):
-        short_x = self.x + fix_x
-        long_x = self.x + 2 * fix_x
-        short_y = self.y + fix_y
-        long_y = self.y + 2 * fix_y
-
-        if self.board.is_in(long_x, short_y):
-            value_long_short = self.board.get(long_x, short_y)
-            second_jump_ok = value_long_short is None or value_long_short.color != self.color
-            first_jump_ok = second_jump_ok and self.board.get(short_x, self.y) is None
-            if first_jump_ok:
-                actions.append(Action(self.x, self.y, long_x, short_y))
-        if self.board.is_in(short_x, long_y):
-            value_short_long = self.board.get(short_x, long_y)
-            second_jump_ok = value_short_long is None or value_short_long.color != self.color
-            first_jump_ok = second_jump_ok and self.board.get(self.x, short_y) is None
-            if first_jump_ok:
-                actions.append(Action(self.x, self.y, short_x, long_y))
-
     def is_potentially_threatening(self, x_threat, y_threat):
         x_diff = abs(self.x - x_threat)
         y_diff = abs(self.y - y_threat)
@@ -481,32 +399,7 @@ class Guard(Piece):
             return "g"
 
     def get_actions(self):
-        actions = []
-        if self.color == Color.BLUE:
-            self._get_action_per_fortress(actions, 0, 2, 3, 5)
-        else:
-            self._get_action_per_fortress(actions, 7, 9, 3, 5)
-        return actions
-
-    def _get_action_per_fortress(self, actions, x_min, x_max, y_min, y_max):
-        mid_x = x_min + 1
-        mid_y = y_min + 1
-        for x_diff in [-1, 0, 1]:
-            for y_diff in [-1, 0, 1]:
-                if x_diff == 0 and y_diff == 0:
-                    continue
-                if (self.x == mid_x or self.y == mid_y) and not (self.x == mid_x and self.y == mid_y):
-                    if x_diff != 0 and y_diff != 0:
-                        continue
-                new_x = self.x + x_diff
-                new_y = self.y + y_diff
-                is_in_fortress = x_min <= new_x <= x_max and y_min <= new_y <= y_max
-                if not is_in_fortress:
-                    continue
-                destination_is_legal = (self.board.get(new_x, new_y) is None or
-                                        self.board.get(new_x, new_y).color != self.color)
-                if destination_is_legal:  # and not will_be_check:
-                    actions.append(Action(self.x, self.y, new_x, new_y))
+        return self._get_step_actions(FORTRESS_MOVES[self.color][to_square(self.x, self.y)])
 
     def is_potentially_threatening(self, x_threat, y_threat):
         return False
@@ -0,0 +1,25 @@
+import struct
+
+from janggi.move_tables import N_SQUARES
+from janggi.utils import Color
+
+FORMATIONS = ["won", "sang", "yang", "gwee"]
+
+# After the 90 piece codes (int8, square = x * 9 + y): side to move, round and starting formations of blue and red
+POSITION_HEADER = struct.Struct("<bHBB")
+POSITION_SIZE = N_SQUARES + POSITION_HEADER.size
+
+
+def encode_position(codes, color, n_round, start_blue, start_red):
+    # codes is a bytes-like object of N_SQUARES signed piece codes
+    return bytes(codes) + POSITION_HEADER.pack(color.value, n_round,
+                                               FORMATIONS.index(start_blue), FORMATIONS.index(start_red))
+
+
+def decode_position(data):
+    # Returns the piece codes as a memoryview on data (no copy), the color, the round and the formations
+    if len(data) != POSITION_SIZE:
+        raise ValueError("A position is encoded on %d bytes, got %d" % (POSITION_SIZE, len(data)))
+    codes = memoryview(data)[:N_SQUARES].cast("b")
+    color, n_round, start_blue, start_red = POSITION_HEADER.unpack_from(data, N_SQUARES)
+    return codes, Color(color), n_round, FORMATIONS[start_blue], FORMATIONS[start_red]
@@ -0,0 +1,54 @@
+from array import array
+from collections import Counter
+
+from janggi.parameters import MAX_REPETITIONS
+
+NO_REPEATED_HASHES = frozenset()
+
+
+class RepetitionHistory:
+    # Stack of the hashes of the positions played, with the indexes where a capture happened.
+    # A capture removes a piece for good, so only the positions since the last capture can repeat.
+
+    def __init__(self, zobrist_hash):
+        self._hashes = array("Q", [zobrist_hash])
+        self._capture_indexes = array("I")
+
+    def copy(self):
+        history = RepetitionHistory.__new__(RepetitionHistory)
+        history._hashes = array("Q", self._hashes)
+        history._capture_indexes = array("I", self._capture_indexes)
+        return history
+
+    def push(self, zobrist_hash, is_capture):
+        if is_capture:
+            self._capture_indexes.append(len(self._hashes))
+        self._hashes.append(zobrist_hash)
+
+    def pop(self):
+        self._hashes.pop()
+        if self._capture_indexes and self._capture_indexes[-1] == len(self._hashes):
+            self._capture_indexes.pop()
+
+    def _get_window(self):
+        if self._capture_indexes:
+            return self._hashes[self._capture_indexes[-1]:]
+        return self._hashes
+
+    def count(self, zobrist_hash):
+        return self._get_window().count(zobrist_hash)
+
+    def has_repetitions(self):
+        # Whether a position was seen twice since the last capture, the current one included
+        window = self._get_window()
+        return len(window) != len(set(window))
+
+    def get_repeated_hashes(self):
+        # Hashes seen MAX_REPETITIONS - 1 times: a move leading to one of them is illegal
+        window = self._get_window()
+        if len(window) - len(set(window)) < MAX_REPETITIONS - 2:
+            return NO_REPEATED_HASHES
+        return {zobrist_hash for zobrist_hash, count in Counter(window).items() if count >= MAX_REPETITIONS - 1}
+
+    def __len__(self):
+        return len(self._hashes)
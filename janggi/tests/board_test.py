@@ -1,16 +1,41 @@
+import random
 import unittest
 
 import numpy as np
 
 from ia.random_mcts_player import RandomMCTSPlayer
 from janggi.action import Action
-from janggi.board import Board, ActionCacheNode
+from janggi.action_cache import ACTION_CACHE
+from janggi.board import Board
+from janggi.grid import get_position_features
+from janggi.parameters import MAX_REPETITIONS
 from janggi.game import Game
 from janggi.player import RandomPlayer
+from janggi.position import POSITION_SIZE
 from janggi.utils import BOARD_HEIGHT, BOARD_WIDTH, Color
 from janggi.piece import Soldier, Cannon, General, Chariot, Elephant, Horse, Guard
 
 
+def get_reference_actions(board, color):
+    # Brute force: play every pseudo-legal move and look for any enemy move reaching the general
+    if color == Color.BLUE:
+        pieces, other_pieces = board._blue_pieces, board._red_pieces
+    else:
+        pieces, other_pieces = board._red_pieces, board._blue_pieces
+    actions = []
+    for piece in [piece for piece in pieces if piece.is_alive]:
+        for action in piece.get_actions():
+            board.apply_action(action)
+            if board.count_repetitions() < MAX_REPETITIONS:
+                general = board._blue_general if color == Color.BLUE else board._red_general
+                if not any(other_action.x_to == general.x and other_action.y_to == general.y
+                           for other_piece in other_pieces if other_piece.is_alive
+                           for other_action in other_piece.get_actions()):
+                    actions.append((action.x_from, action.y_from, action.x_to, action.y_to))
+            board.reverse_action(action)
+    return sorted(actions)
+
+
 class BoardTest(unittest.TestCase):
 
     def setUp(self) -> None:
@@ -78,7 +103,6 @@ class BoardTest(unittest.TestCase):
         self.assertEqual(len(self.board.get(8, 4).get_actions()), 6)
         self.board.set(1, 4, None)
         self.board.set(2, 3, General(2, 3, Color.BLUE, self.board))
-        self.board._current_action_cache_node = ActionCacheNode(None)
         self.assertEqual(len(self.board.get(2, 3).get_actions()), 3)
 
     def test_action_chariot(self):
@@ -128,7 +152,6 @@ class BoardTest(unittest.TestCase):
     def test_get_all_actions(self):
         self.assertEqual(len(self.board.get_actions(Color.BLUE)), 31)
         self.board.set(2, 3, Chariot(2, 3, Color.RED, self.board))
-        self.board._current_action_cache_node = ActionCacheNode(None)
         self.board._initialise_pieces_per_color()
         actions = self.board.get_actions(Color.BLUE)
         self.assertEqual(len(actions), 4)
@@ -137,6 +160,25 @@ class BoardTest(unittest.TestCase):
         self.assertEqual(self.board.get_score(Color.BLUE), 72)
         self.assertEqual(self.board.get_score(Color.RED), 73.5)
 
+    def test_score_after_captures(self):
+        random.seed(5)
+        color = Color.BLUE
+        actions = []
+        for _ in range(80):
+            action = random.choice(self.board.get_actions(color))
+            self.board.apply_action(action)
+            actions.append(action)
+            color = Color(-color.value)
+            for current_color, pieces in [(Color.BLUE, self.board._blue_pieces), (Color.RED, self.board._red_pieces)]:
+                expected = sum(piece.get_points() for piece in pieces if piece.is_alive)
+                if current_color == Color.RED:
+                    expected += 1.5
+                self.assertEqual(self.board.get_score(current_color), expected)
+        for action in actions[::-1]:
+            self.board.reverse_action(action)
+        self.assertEqual(self.board.get_score(Color.BLUE), 72)
+        self.assertEqual(self.board.get_score(Color.RED), 73.5)
+
     def test_get(self):
         self.assertEqual(self.board.get(0, 0).x, 0)
         self.assertEqual(self.board.get(0, 0).y, 0)
@@ -153,6 +195,25 @@ class BoardTest(unittest.TestCase):
         if self.board.start_red == self.board.start_blue:
             self.assertEqual(features[:14, :, :].tolist(), features_red[:14, :, :].tolist())
 
+    def test_features_after_moves(self):
+        random.seed(3)
+        color = Color.BLUE
+        for n_round in range(60):
+            for data_augmentation in [False, True]:
+                features = self.board.get_features(color, n_round, data_augmentation)
+                for x in range(BOARD_HEIGHT):
+                    for y in range(BOARD_WIDTH):
+                        new_y = BOARD_WIDTH - 1 - y if data_augmentation else y
+                        piece = self.board.get(x, new_y, color == Color.RED)
+                        expected = [0] * 14
+                        if piece is not None:
+                            expected[piece.get_index() + 7 * (piece.color != color)] = 1
+                        self.assertEqual(features[:14, x, y].tolist(), expected)
+                self.assertEqual(features[14, 0, 0], int(color == Color.RED))
+                self.assertEqual(features[15, 0, 0], n_round)
+            self.board.apply_action(random.choice(self.board.get_actions(color)))
+            color = Color(-color.value)
+
     def test_action_features(self, no_sum=False):
         for x in range(BOARD_HEIGHT):
             for y in range(BOARD_WIDTH):
@@ -177,7 +238,6 @@ class BoardTest(unittest.TestCase):
                                 f_temp = action.get_features(symmetry_x=True, symmetry_y=True)
                                 features_sym_x_y[f_temp] += 1
                         self.board.set(x, y, None)
-                        self._current_action_cache_node = ActionCacheNode(None)
         if not no_sum:
             self.assertTrue(not any([x == 0 for x in features]))
             self.assertTrue(not any([x == 0 for x in features_sym_y]))
@@ -200,7 +260,6 @@ class BoardTest(unittest.TestCase):
                     self.board.set(x, y, piece(x, y, color, self.board))
                     self.board.get(x, y).get_actions()
                     self.board.set(x, y, None)
-                    self._current_action_cache_node = ActionCacheNode(None)
 
     def _test_perf_chariot(self):
         for _ in range(1000):
@@ -238,6 +297,84 @@ class BoardTest(unittest.TestCase):
         self.board._initialise_pieces_per_color()
         self.assertEqual(len(self.board.get_actions(Color.BLUE)), 1)
 
+    def test_zobrist_hash(self):
+        initial_hash = self.board.zobrist_hash
+        self.assertEqual(Board.from_string(str(self.board)).zobrist_hash, initial_hash)
+        for action in self.board.get_actions(Color.BLUE):
+            self.board.apply_action(action)
+            self.assertNotEqual(self.board.zobrist_hash, initial_hash)
+            self.assertEqual(Board.from_string(str(self.board)).zobrist_hash, self.board.zobrist_hash)
+            self.board.reverse_action(action)
+            self.assertEqual(self.board.zobrist_hash, initial_hash)
+
+    def test_probing_leaves_board_untouched(self):
+        initial = str(self.board)
+        initial_hash = self.board.zobrist_hash
+        initial_repetitions = self.board.count_repetitions()
+        actions = self.board.get_actions(Color.BLUE)
+        self.assertEqual(str(self.board), initial)
+        self.assertEqual(self.board.zobrist_hash, initial_hash)
+        self.assertEqual(self.board.count_repetitions(), initial_repetitions)
+        hits = ACTION_CACHE.hits
+        self.assertEqual(self.board.get_actions(Color.BLUE), actions)
+        self.assertEqual(ACTION_CACHE.hits, hits + 1)
+
+    def test_cached_actions_respect_repetitions(self):
+        forth = [Action(1, 4, 2, 4), Action(8, 4, 7, 4)]
+        back = [Action(2, 4, 1, 4), Action(7, 4, 8, 4)]
+        for _ in range(MAX_REPETITIONS - 2):
+            for action in forth + back:
+                self.board.apply_action(action)
+        self.board.apply_action(forth[0])
+        self.board.apply_action(forth[1])
+        self.board.apply_action(back[0])
+        # Same position without the history: the cached moves include the move back
+        other_board = Board.from_string(str(self.board))
+        self.assertIn(back[1], other_board.get_actions(Color.RED))
+        self.assertNotIn(back[1], self.board.get_actions(Color.RED))
+        self.board.reverse_action(back[0])
+        self.board.reverse_action(forth[1])
+        self.board.apply_action(forth[1])
+        self.board.apply_action(back[0])
+        self.assertNotIn(back[1], self.board.get_actions(Color.RED))
+        self.board.reverse_action(back[0])
+        self.assertIn(back[0], self.board.get_actions(Color.BLUE))
+
+    def test_zobrist_transposition(self):
+        other_board = Board(self.board.start_blue, self.board.start_red)
+        first_order = [Action(3, 0, 4, 0), Action(6, 0, 5, 0), Action(3, 2, 4, 2), Action(6, 2, 5, 2)]
+        second_order = [Action(3, 2, 4, 2), Action(6, 2, 5, 2), Action(3, 0, 4, 0), Action(6, 0, 5, 0)]
+        for first_action, second_action in zip(first_order, second_order):
+            self.board.apply_action(first_action)
+            other_board.apply_action(second_action)
+        self.assertEqual(self.board.zobrist_hash, other_board.zobrist_hash)
+        self.assertEqual(self.board, other_board)
+
+    def test_same_actions_as_reference(self):
+        random.seed(42)
+        for _ in range(2):
+            board = Board(self.board.start_blue, self.board.start_red)
+            color = Color.BLUE
+            for _ in range(120):
+                actions = board.get_actions(color)
+                expected = get_reference_actions(board, color)
+                if not expected:
+                    self.assertEqual(actions, [Action(0, 0, 0, 0)])
+                else:
+                    self.assertEqual(sorted((action.x_from, action.y_from, action.x_to, action.y_to)
+                                            for action in actions), expected)
+                general = board._blue_general if color == Color.BLUE else board._red_general
+                other_pieces = board._red_pieces if color == Color.BLUE else board._blue_pieces
+                self.assertEqual(board.is_check(color), any(
+                    other_action.x_to == general.x and other_action.y_to == general.y
+                    for other_piece in other_pieces if other_piece.is_alive
+                    for other_action in other_piece.get_actions()))
+                action = random.choice(actions)
+                board.apply_action(action)
+                color = Color(-color.value)
+                if board.is_finished(color, action):
+                    break
+
     def test_read_strange(self):
         board = Board.from_fen("1bnaa1bn1/R8/5k1cr/1p2p1B1p/2p6/9/1PP2P2P/4CCN2/1N2K4/2BA1A2R w - - 0 1")
         self.assertNotEqual(board.get_actions(Color.RED), [Action(0, 0, 0, 0)])
@@ -338,6 +475,47 @@ class TestBoardGwee(BoardTest):
         self.assertEqual(game.current_player, Color.BLUE)
         self.assertEqual(game.round, 0)
 
+    def test_bytes(self):
+        game = Game(RandomPlayer(Color.BLUE), RandomPlayer(Color.RED),
+                    Board(self.board.start_blue, self.board.start_red))
+        game.run_game(40)
+        data = game.to_bytes()
+        self.assertEqual(len(data), POSITION_SIZE)
+        board = Board.from_bytes(data)
+        self.assertEqual(str(board), str(game.board))
+        self.assertEqual(board.zobrist_hash, game.board.zobrist_hash)
+        self.assertEqual(board.start_blue, self.board.start_blue)
+        self.assertEqual(board.get_score(Color.RED), game.board.get_score(Color.RED))
+        self.assertEqual(board.get_actions(game.current_player), game.get_current_actions())
+        self.assertEqual(get_position_features(data).tolist(),
+                         game.board.get_features(game.current_player, game.round).tolist())
+        game_copy = Game.from_bytes(RandomPlayer(Color.BLUE), RandomPlayer(Color.RED), data)
+        self.assertEqual(game_copy.current_player, game.current_player)
+        self.assertEqual(game_copy.round, game.round)
+        self.assertEqual(game_copy.to_bytes(), data)
+
+    def test_clone(self):
+        game = Game(RandomPlayer(Color.BLUE), RandomPlayer(Color.RED),
+                    Board(self.board.start_blue, self.board.start_red))
+        game.run_game(60)
+        game_copy = game.clone()
+        self.assertEqual(game_copy.to_uci_usi(), game.to_uci_usi())
+        self.assertEqual(game_copy.board.zobrist_hash, game.board.zobrist_hash)
+        self.assertEqual(game_copy.round, game.round)
+        self.assertEqual(game_copy.current_player, game.current_player)
+        self.assertEqual(game_copy.get_current_actions(), game.get_current_actions())
+        for color in [Color.BLUE, Color.RED]:
+            self.assertEqual(game_copy.board.get_score(color), game.board.get_score(color))
+            self.assertEqual(game_copy.board.get_features(color, 3).tolist(), game.board.get_features(color, 3).tolist())
+        # Going back to the beginning on the copy leaves the original unchanged
+        initial = str(game.board)
+        for action in game_copy.actions[::-1]:
+            game_copy.board.reverse_action(action)
+        self.assertEqual(str(game_copy.board), str(Board(self.board.start_blue, self.board.start_red)))
+        self.assertEqual(game_copy.board.get_score(Color.BLUE), 72)
+        self.assertEqual(str(game.board), initial)
+        self.assertEqual(len(game_copy.board.get_actions(Color.BLUE)), 31)
+
     def test_uci_usi(self):
         game = Game.from_uci_usi(
             RandomPlayer(Color.BLUE),
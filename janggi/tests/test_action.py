@@ -1,6 +1,11 @@
+import random
 import unittest
 
-from janggi.action import Action
+from janggi.action import Action, ACTIONS, N_ACTIONS, PASS_ACTION_ID, UCI_USI_TO_ACTION_ID, ACTION_TO_UCI_USI, \
+    get_action_policy_index, get_policy_indexes, SYMMETRY_X, SYMMETRY_Y
+from janggi.board import Board
+from janggi.board_array import ArrayBoard
+from janggi.utils import Color, get_symmetries
 
 
 class TestAction(unittest.TestCase):
@@ -24,3 +29,70 @@ class TestAction(unittest.TestCase):
         action = Action(0, 0, 0, 0)
         self.assertTrue(action.is_pass())
         print(action.get_features())
+
+    def test_immutable(self):
+        action = Action(3, 0, 4, 0)
+        with self.assertRaises(AttributeError):
+            action.x_to = 5
+        self.assertIs(Action.from_id(action.get_id()), Action.from_id(action.get_id()))
+
+    def test_shared_capture(self):
+        # The same capture applied on two boards, each one keeps its own captured piece
+        boards = [Board(), Board()]
+        capture = Action(4, 0, 5, 0)
+        for board in boards:
+            board.apply_action(Action(3, 0, 4, 0))
+            board.apply_action(Action(6, 0, 5, 0))
+            board.apply_action(capture)
+            self.assertEqual(board.get(5, 0).color, Color.BLUE)
+        for board in boards:
+            board.reverse_action(capture)
+            self.assertEqual(board.get(5, 0).color, Color.RED)
+            self.assertEqual(board.get(4, 0).color, Color.BLUE)
+        self.assertEqual(boards[0].get_score(Color.RED), 73.5)
+
+    def test_action_ids(self):
+        self.assertEqual(Action(0, 0, 0, 0).get_id(), PASS_ACTION_ID)
+        for action_id in range(N_ACTIONS):
+            action = Action.from_id(action_id)
+            self.assertEqual(action.get_id(), action_id)
+            self.assertEqual(UCI_USI_TO_ACTION_ID[action.to_uci_usi()], action_id)
+            self.assertEqual(ACTION_TO_UCI_USI[action_id], action.to_uci_usi())
+            for color in [Color.BLUE, Color.RED]:
+                for data_augmentation in [False, True]:
+                    policy = action.get_policy(color, data_augmentation)
+                    index = get_action_policy_index(action_id, color, data_augmentation)
+                    self.assertEqual(policy[index], 1)
+        self.assertEqual(len(set(ACTIONS)), N_ACTIONS)
+
+    def test_policy_indexes(self):
+        actions = [Action.from_id(action_id) for action_id in range(N_ACTIONS)]
+        for color in [Color.BLUE, Color.RED]:
+            for data_augmentation in [False, True]:
+                indexes = get_policy_indexes(actions, color, data_augmentation)
+                symmetry_x, symmetry_y = get_symmetries(color, data_augmentation)
+                for action, index in zip(actions, indexes):
+                    plane = action._compute_features()
+                    if symmetry_x:
+                        plane = SYMMETRY_X[plane]
+                    if symmetry_y:
+                        plane = SYMMETRY_Y[plane]
+                    self.assertEqual(index, (plane * 10 + action.get_x_from(symmetry_x)) * 9
+                                     + action.get_y_from(symmetry_y))
+        self.assertIsNone(Action(0, 0, 3, 3).get_features(True, True))
+        self.assertEqual(Action(0, 0, 3, 3).get_policy_index(), -1)
+        self.assertEqual(len(get_policy_indexes([], Color.BLUE)), 0)
+
+    def test_board_action_ids(self):
+        board = Board()
+        array_board = ArrayBoard()
+        color = Color.BLUE
+        for _ in range(50):
+            actions = board.get_actions(color)
+            action_ids = [action.get_id() for action in actions]
+            self.assertEqual(list(board.get_action_ids(color)), action_ids)
+            self.assertEqual(sorted(array_board.get_action_ids(color)), sorted(action_ids))
+            action = random.choice(actions)
+            board.apply_action(action)
+            array_board.apply_action(action)
+            color = Color(-color.value)
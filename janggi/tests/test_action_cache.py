@@ -0,0 +1,40 @@
+import unittest
+
+from janggi.action_cache import ActionCache
+from janggi.board import Board
+from janggi.utils import Color
+
+
+class TestActionCache(unittest.TestCase):
+
+    def test_lru(self):
+        cache = ActionCache(max_size=2)
+        cache.put(1, Color.BLUE, [1])
+        cache.put(2, Color.BLUE, [2])
+        self.assertEqual(cache.get(1, Color.BLUE), [1])
+        cache.put(3, Color.BLUE, [3])
+        self.assertIsNone(cache.get(2, Color.BLUE))
+        self.assertEqual(cache.get(1, Color.BLUE), [1])
+        self.assertEqual(cache.get(3, Color.BLUE), [3])
+        self.assertIsNone(cache.get(3, Color.RED))
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.evictions, 1)
+        self.assertEqual(cache.hits, 3)
+        self.assertEqual(cache.misses, 2)
+        self.assertAlmostEqual(cache.get_hit_rate(), 0.6)
+
+    def test_disabled(self):
+        cache = ActionCache(max_size=0)
+        cache.put(1, Color.BLUE, [1])
+        self.assertIsNone(cache.get(1, Color.BLUE))
+        self.assertEqual(len(cache), 0)
+
+    def test_board(self):
+        board = Board()
+        actions = board.get_actions(Color.BLUE)
+        other_board = Board()
+        self.assertIs(other_board.get_actions(Color.BLUE), actions)
+
+
+if __name__ == '__main__':
+    unittest.main()
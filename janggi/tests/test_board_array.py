@@ -0,0 +1,128 @@
+import random
+import unittest
+
+from janggi.action import Action
+from janggi.board import Board
+from janggi.board_array import ArrayBoard
+from janggi.game import Game
+from janggi.grid import get_position_features
+from janggi.move_tables import CHARIOT, CANNON
+from janggi.player import RandomPlayer
+from janggi.utils import Color
+
+
+def get_moves(actions):
+    return sorted([(action.x_from, action.y_from, action.x_to, action.y_to) for action in actions])
+
+
+class TestArrayBoard(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.board = ArrayBoard()
+
+    def test_initial(self):
+        for start_blue in ["won", "sang", "yang", "gwee"]:
+            for start_red in ["won", "sang", "yang", "gwee"]:
+                board = ArrayBoard(start_blue, start_red)
+                self.assertEqual(str(board), str(Board(start_blue, start_red)))
+                self.assertEqual(len(board.get_actions(Color.BLUE)), 31)
+
+    def test_score(self):
+        self.assertEqual(self.board.get_score(Color.BLUE), 72)
+        self.assertEqual(self.board.get_score(Color.RED), 73.5)
+
+    def test_get_all_actions(self):
+        self.board.set(2, 3, -CHARIOT)
+        actions = self.board.get_actions(Color.BLUE)
+        self.assertEqual(len(actions), 4)
+
+    def test_cannon_screen(self):
+        board = ArrayBoard.from_string("""
+            ...K.....
+            ....S....
+            .........
+            .........
+            ...c.....
+            .........
+            .........
+            .........
+            ....k....
+            .........""")
+        self.assertFalse(board.is_check(Color.BLUE))
+        board.set(2, 3, CANNON)
+        self.assertFalse(board.is_check(Color.BLUE))
+        board.set(2, 3, CHARIOT)
+        self.assertTrue(board.is_check(Color.BLUE))
+
+    def test_fen(self):
+        fen = "1bnaa1bn1/R8/5k1cr/1p2p1B1p/2p6/9/1PP2P2P/4CCN2/1N2K4/2BA1A2R w - - 0 1"
+        board = ArrayBoard.from_fen(fen)
+        self.assertEqual(board.to_fen(Color.BLUE, 0), Board.from_fen(fen).to_fen(Color.BLUE, 0))
+        self.assertEqual(get_moves(board.get_actions(Color.RED)), get_moves(Board.from_fen(fen).get_actions(Color.RED)))
+
+    def test_bytes(self):
+        board = Board.from_fen("1bnaa1bn1/R8/5k1cr/1p2p1B1p/2p6/9/1PP2P2P/4CCN2/1N2K4/2BA1A2R w - - 0 1")
+        data = board.to_bytes(Color.RED, 31)
+        array_board = ArrayBoard.from_bytes(data)
+        self.assertEqual(str(array_board), str(board))
+        self.assertEqual(array_board.zobrist_hash, board.zobrist_hash)
+        self.assertEqual(array_board.to_bytes(Color.RED, 31), data)
+        self.assertEqual(get_moves(array_board.get_actions(Color.RED)), get_moves(board.get_actions(Color.RED)))
+        self.assertEqual(array_board.get_features(Color.RED, 31).tolist(), get_position_features(data).tolist())
+
+    def test_reverse(self):
+        initial = str(self.board)
+        actions = []
+        color = Color.BLUE
+        for _ in range(30):
+            action = random.choice(self.board.get_actions(color))
+            self.board.apply_action(action)
+            actions.append(action)
+            color = Color(-color.value)
+        for action in actions[::-1]:
+            self.board.reverse_action(action)
+        self.assertEqual(str(self.board), initial)
+        self.assertEqual(self.board.get_score(Color.BLUE), 72)
+
+    def test_same_as_board(self):
+        for _ in range(5):
+            start_blue = random.choice(["won", "sang", "yang", "gwee"])
+            start_red = random.choice(["won", "sang", "yang", "gwee"])
+            board = Board(start_blue, start_red)
+            array_board = ArrayBoard(start_blue, start_red)
+            color = Color.BLUE
+            for n_round in range(100):
+                actions = board.get_actions(color)
+                self.assertEqual(get_moves(actions), get_moves(array_board.get_actions(color)))
+                self.assertEqual(board.is_check(color), array_board.is_check(color))
+                self.assertEqual(board.get_score(color), array_board.get_score(color))
+                self.assertEqual(board.get_features(color, n_round).tolist(),
+                                 array_board.get_features(color, n_round).tolist())
+                self.assertEqual(board.get_features(color, n_round, data_augmentation=True).tolist(),
+                                 array_board.get_features(color, n_round, data_augmentation=True).tolist())
+                action = random.choice(actions)
+                board.apply_action(action)
+                array_board.apply_action(action)
+                self.assertEqual(str(board), str(array_board))
+                self.assertEqual(board.zobrist_hash, array_board.zobrist_hash)
+                color = Color(-color.value)
+                if board.is_finished(color, action):
+                    self.assertTrue(array_board.is_finished(color, action))
+                    break
+                self.assertFalse(array_board.is_finished(color, action))
+
+    def test_game(self):
+        game = Game(RandomPlayer(Color.BLUE), RandomPlayer(Color.RED), self.board)
+        game.run_game(100)
+        game_copy = game.fake_copy()
+        self.assertEqual(str(game_copy.board), str(game.board))
+        for action in game_copy.actions[::-1]:
+            game_copy.board.reverse_action(action)
+        self.assertEqual(str(game_copy.board), str(ArrayBoard()))
+        self.assertEqual(game_copy.board.count_repetitions(game.board.zobrist_hash), 0)
+        self.assertGreater(game.board.count_repetitions(), 0)
+        self.assertNotIn(Action(0, 0, 0, 0), game.get_current_actions()[1:])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import random
+import unittest
+
+import numpy as np
+
+from janggi.action import Action
+from janggi.board import Board
+from janggi.board_multi import MultiBoard
+from janggi.utils import Color
+
+
+class TestMultiBoard(unittest.TestCase):
+
+    def setUp(self) -> None:
+        random.seed(42)
+        self.boards = [Board(start_blue, start_red)
+                       for start_blue in ["won", "sang", "yang", "gwee"]
+                       for start_red in ["won", "gwee"]]
+        self.multi_board = MultiBoard(self.boards)
+
+    def _check_same(self, colors, n_round):
+        # The moves are the same, but the pieces may be visited in another order
+        self.assertEqual([sorted(action_ids) for action_ids in self.multi_board.get_action_ids(colors)],
+                         [sorted(board.get_action_ids(Color(color))) for board, color in zip(self.boards, colors)])
+        self.assertEqual(self.multi_board.zobrist_hashes.tolist(), [board.zobrist_hash for board in self.boards])
+        self.assertEqual(self.multi_board.get_scores(colors).tolist(),
+                         [board.get_score(Color(color)) for board, color in zip(self.boards, colors)])
+        features = self.multi_board.get_features(colors, [n_round] * len(self.boards), data_augmentation=True)
+        self.assertEqual(tuple(features.shape), (len(self.boards), 16, 10, 9))
+        for board, color, board_features in zip(self.boards, colors, features):
+            self.assertTrue(np.array_equal(board_features.numpy(),
+                                           board.get_features(Color(color), n_round, data_augmentation=True).numpy()))
+
+    def test_same_as_board(self):
+        initial_grids = self.multi_board.grids.copy()
+        colors = [Color.BLUE.value] * len(self.boards)
+        for n_round in range(60):
+            self._check_same(colors, n_round)
+            action_ids = [random.choice(board.get_action_ids(Color(color)))
+                          for board, color in zip(self.boards, colors)]
+            self.multi_board.apply_actions(action_ids)
+            for board, action_id in zip(self.boards, action_ids):
+                board.apply_action(Action.from_id(action_id))
+            colors = [-color for color in colors]
+            self.assertEqual(self.multi_board.is_finished(colors).tolist(),
+                             [board.is_finished(Color(color), Action.from_id(action_id))
+                              for board, color, action_id in zip(self.boards, colors, action_ids)])
+        for _ in range(60):
+            self.multi_board.reverse_actions()
+        self.assertTrue(np.array_equal(self.multi_board.grids, initial_grids))
+        self.assertEqual(self.multi_board.get_scores(colors).tolist(),
+                         [Board().get_score(Color(color)) for color in colors])
+        self.assertFalse(self.multi_board.has_played.any())
+
+    def test_subset(self):
+        indexes = [1, 4]
+        action_ids = [action_ids[0] for action_ids in self.multi_board.get_action_ids(Color.BLUE.value, indexes)]
+        self.multi_board.apply_actions(action_ids, indexes)
+        for index, action_id in zip(indexes, action_ids):
+            self.boards[index].apply_action(Action.from_id(action_id))
+        colors = [Color.RED.value if index in indexes else Color.BLUE.value for index in range(len(self.boards))]
+        self._check_same(colors, 1)
+        self.assertEqual(str(self.multi_board.get_board(4)), str(self.boards[4]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import unittest
+
+from janggi.board import Board
+from janggi.board_array import ArrayBoard
+from janggi.game import Game
+from janggi.perft import perft, check_perft, cross_check, read_raw_fens, sample_fens, are_generals_facing, \
+    PERFT_FENS, get_fen_color
+from janggi.player import RandomPlayer
+from janggi.utils import Color
+
+try:
+    import pyffish
+except ImportError:
+    pyffish = None
+
+
+class StubFishBoard:
+    # Stands for BoardFish: the moves of a Board, without the first one in the position of fen
+
+    def __init__(self, board, fen):
+        self.board = board
+        self.fen = fen
+
+    def get_actions(self, color):
+        actions = self.board.get_actions(color)
+        if self.board.to_fen(color, 0) == self.fen:
+            return actions[1:]
+        return actions
+
+    def apply_action(self, action):
+        self.board.apply_action(action)
+
+    def reverse_action(self, action):
+        self.board.reverse_action(action)
+
+
+class TestPerft(unittest.TestCase):
+
+    def test_board(self):
+        for depth in range(1, 4):
+            self.assertEqual(check_perft(depth, Board), [])
+
+    def test_array_board(self):
+        for depth in range(1, 4):
+            self.assertEqual(check_perft(depth, ArrayBoard), [])
+
+    def test_board_unchanged(self):
+        fen = PERFT_FENS[1][0]
+        board = Board.from_fen(fen)
+        initial = str(board)
+        initial_hash = board.zobrist_hash
+        perft(board, get_fen_color(fen), 2)
+        self.assertEqual(str(board), initial)
+        self.assertEqual(board.zobrist_hash, initial_hash)
+
+    def test_read_raw_fens(self):
+        game = Game(RandomPlayer(Color.BLUE), RandomPlayer(Color.RED), Board())
+        game.run_game(30)
+        fens = read_raw_fens(game.dumps().splitlines(), every=10)
+        self.assertGreaterEqual(len(fens), len(game.actions) // 10)
+        board = Board()
+        for action in game.actions[:10]:
+            board.apply_action(action)
+        self.assertEqual(fens[0], board.to_fen(Color.BLUE, 10))
+
+    def test_sample_fens(self):
+        game = Game(RandomPlayer(Color.BLUE), RandomPlayer(Color.RED), Board())
+        game.run_game(60)
+        lines = game.dumps().splitlines()
+        fens = read_raw_fens(lines, every=5)
+        sampled_fens = sample_fens(lines, 3, every=5)
+        self.assertEqual(len(sampled_fens), 3)
+        self.assertTrue(set(sampled_fens) <= set(fens))
+        self.assertEqual(sample_fens(lines, 3, every=5), sampled_fens)
+        self.assertEqual(sorted(sample_fens(lines, 1000, every=5)), sorted(fens))
+
+    def test_cross_check_stub(self):
+        self.assertEqual(cross_check(Board(), StubFishBoard(Board(), None), Color.BLUE, 2), [])
+        fen = Board().to_fen(Color.BLUE, 0)
+        self.assertEqual(cross_check(Board(), StubFishBoard(Board(), fen), Color.BLUE, 2), [fen])
+        board = Board()
+        action = board.get_actions(Color.BLUE)[0]
+        board.apply_action(action)
+        fen = board.to_fen(Color.RED, 0)
+        self.assertEqual(cross_check(Board(), StubFishBoard(Board(), fen), Color.BLUE, 2), [fen])
+        self.assertEqual(cross_check(Board(), StubFishBoard(Board(), fen), Color.BLUE, 1), [])
+
+    def test_generals_facing(self):
+        fen = "rbna1anbr/9/1c3k1c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/5K3/RBNA1ANBR w - - 0 1"
+        self.assertFalse(are_generals_facing(Board()))
+        self.assertTrue(are_generals_facing(Board.from_fen(fen)))
+        # The moves are not compared there, as Fairy-Stockfish applies the bikjang rule
+        self.assertEqual(cross_check(Board.from_fen(fen), StubFishBoard(Board.from_fen(fen), fen), Color.BLUE, 2), [])
+
+    @unittest.skipIf(pyffish is None, "pyffish is not installed")
+    def test_cross_check(self):
+        from janggi.board_fish import BoardFish
+        self.assertEqual(cross_check(Board(), BoardFish(), Color.BLUE, 2), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
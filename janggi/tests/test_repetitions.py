@@ -0,0 +1,43 @@
+import unittest
+
+from janggi.parameters import MAX_REPETITIONS
+from janggi.repetitions import RepetitionHistory
+
+
+class TestRepetitionHistory(unittest.TestCase):
+
+    def test_count(self):
+        history = RepetitionHistory(1)
+        for _ in range(MAX_REPETITIONS - 2):
+            history.push(2, False)
+            history.push(1, False)
+        self.assertEqual(history.count(1), MAX_REPETITIONS - 1)
+        self.assertEqual(history.get_repeated_hashes(), {1})
+        history.pop()
+        self.assertEqual(history.count(1), MAX_REPETITIONS - 2)
+        self.assertNotIn(1, history.get_repeated_hashes())
+
+    def test_capture_resets_window(self):
+        history = RepetitionHistory(1)
+        history.push(2, False)
+        history.push(1, False)
+        history.push(3, True)
+        history.push(1, False)
+        self.assertEqual(history.count(1), 1)
+        self.assertEqual(history.count(2), 0)
+        history.pop()
+        history.pop()
+        self.assertEqual(history.count(1), 2)
+        self.assertEqual(len(history), 3)
+
+    def test_copy(self):
+        history = RepetitionHistory(1)
+        history.push(2, True)
+        history_copy = history.copy()
+        history_copy.pop()
+        self.assertEqual(history.count(1), 0)
+        self.assertEqual(history_copy.count(1), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,7 +5,7 @@ from time import sleep
 
 import torch
 
-from janggi.parameters import STOCKFISH_LOCATION
+from janggi.parameters import STOCKFISH_LOCATION, ARRAY_BOARD
 
 BOARD_HEIGHT = 10
 BOARD_WIDTH = 9
@@ -35,11 +35,18 @@ def get_symmetries(current_player, data_augmentation=False):
     return symmetry_x, symmetry_y
 
 
-def get_random_board():
+def get_board_class():
+    if ARRAY_BOARD:
+        from janggi.board_array import ArrayBoard
+        return ArrayBoard
     from janggi.board import Board
+    return Board
+
+
+def get_random_board():
     start_blue = random.choice(["won", "sang", "yang", "gwee"])
     start_red = random.choice(["won", "sang", "yang", "gwee"])
-    board = Board(start_blue=start_blue, start_red=start_red)
+    board = get_board_class()(start_blue=start_blue, start_red=start_red)
     return board
 
 
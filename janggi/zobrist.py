@@ -0,0 +1,21 @@
+import random
+
+from janggi.utils import BOARD_HEIGHT, BOARD_WIDTH
+
+ZOBRIST_SEED = 20201225
+
+_random = random.Random(ZOBRIST_SEED)
+
+# ZOBRIST_KEYS[code][square], where code is the signed piece code (index + 1, negative for red).
+# Negative codes land at the end of the list, and code 0 (empty) has only zero keys.
+ZOBRIST_KEYS = [[0] * (BOARD_HEIGHT * BOARD_WIDTH) for _ in range(15)]
+for _code in list(range(1, 8)) + list(range(-7, 0)):
+    ZOBRIST_KEYS[_code] = [_random.getrandbits(64) for _ in range(BOARD_HEIGHT * BOARD_WIDTH)]
+
+
+def get_zobrist_hash(codes):
+    # codes is an iterable of the 90 piece codes, square by square
+    res = 0
+    for square, code in enumerate(codes):
+        res ^= ZOBRIST_KEYS[code][square]
+    return res
@@ -0,0 +1,27 @@
+from janggi.parameters import PERFT_DEPTH, PERFT_FEN_FILE, PERFT_N_FENS, PERFT_CROSS_CHECK
+from janggi.perft import check_perft, sample_fens, run_perft, get_fen_color, cross_check, FORMATIONS
+from janggi.utils import Color, get_board_class
+
+if __name__ == "__main__":
+    for depth in range(1, PERFT_DEPTH + 1):
+        mismatches = check_perft(depth, print_info=True)
+        for mismatch in mismatches:
+            print("Mismatch", *mismatch, sep="\t")
+    fens = []
+    if PERFT_FEN_FILE:
+        with open(PERFT_FEN_FILE) as f:
+            fens = sample_fens(f, PERFT_N_FENS)
+        for fen in fens:
+            nodes, nodes_per_second = run_perft(get_board_class().from_fen(fen), get_fen_color(fen), PERFT_DEPTH)
+            print(fen, PERFT_DEPTH, nodes, int(nodes_per_second), sep="\t")
+    if PERFT_CROSS_CHECK:
+        from janggi.board_fish import BoardFish
+        for start_blue in FORMATIONS:
+            for start_red in FORMATIONS:
+                for fen in cross_check(get_board_class()(start_blue, start_red), BoardFish(start_blue, start_red),
+                                       Color.BLUE, PERFT_DEPTH):
+                    print("Different moves", fen, sep="\t")
+        for fen in fens:
+            for different_fen in cross_check(get_board_class().from_fen(fen), BoardFish.from_fen(fen),
+                                             get_fen_color(fen), PERFT_DEPTH):
+                print("Different moves", different_fen, sep="\t")